@@ -0,0 +1,105 @@
+#!/usr/bin/python3
+
+from lib.cdr import calls_file, read_records
+from lib.phoneconfig import DEFAULT_PHONE
+
+import argparse
+from collections import Counter
+from configparser import ConfigParser
+from datetime import datetime, timedelta
+from pathlib import Path
+from sys import exit
+
+
+def parse_since(value: str) -> int:
+    """today, yesterday, Anzahl Tage (z.B. 7d) oder Datum (YYYY-MM-DD)"""
+    midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    if value == "today":
+        return int(midnight.timestamp())
+    if value == "yesterday":
+        return int((midnight - timedelta(days=1)).timestamp())
+    if value.endswith("d"):
+        return int((datetime.now() - timedelta(days=int(value.removesuffix("d")))).timestamp())
+    return int(datetime.strptime(value, "%Y-%m-%d").timestamp())
+
+
+def format_time(timestamp: int | None) -> str:
+    return datetime.fromtimestamp(timestamp).strftime("%d.%m. %H:%M:%S") if timestamp is not None else "-"
+
+
+def print_record(record) -> None:
+    duration = f"{record.end - record.answer}s" if record.answer is not None and record.end is not None else "-"
+    contact = f" ({record.contact})" if record.contact is not None else ""
+    status = record.reason or ("verpasst" if record.missed else "")
+    print(f"{format_time(record.start)}  {record.direction:<3}  {record.number + contact:<28} {duration:>6}  {status}")
+
+
+argparser = argparse.ArgumentParser(
+    prog='cdr.py',
+    description='Anrufliste von PiPhone auswerten. Liest die Datei zeilenweise, auch große Listen benötigen kaum Speicher.'
+)
+argparser.add_argument('-c', '--config', type=Path, default=Path("/boot/piphone/config.ini"),
+                       help='Pfad zur Konfigurationsdatei, für [Storage] data_dir (Standard: %(default)s)')
+argparser.add_argument('-f', '--file', type=Path, help='Anrufliste direkt angeben (statt data_dir/calls.jsonl)')
+argparser.add_argument('-p', '--phone', default=DEFAULT_PHONE,
+                       help='Telefon, falls mehrere in [Phones] konfiguriert sind (Standard: %(default)s)')
+argparser.add_argument('-s', '--since', type=parse_since,
+                       help='Nur Anrufe ab: today, yesterday, Anzahl Tage (z.B. 7d) oder Datum (YYYY-MM-DD)')
+argparser.add_argument('command', choices=('list', 'missed', 'rejected', 'top', 'setup'), nargs='?', default='list',
+                       help='list: alle Anrufe, missed: verpasste Anrufe, rejected: abgewiesene Anrufe '
+                            '(Nicht stören, Whitelist, Hörer abgehoben), top: häufigste Anrufer, '
+                            'setup: durchschnittliche Verbindungsdauer')
+argparser.add_argument('-n', '--limit', type=int, default=10, help='Anzahl Einträge für top (Standard: %(default)s)')
+args = argparser.parse_args()
+
+if args.file is not None:
+    path = args.file
+else:
+    config = ConfigParser()
+    config.read(args.config)
+    data_dir = config.get(f'{args.phone}.Storage', 'data_dir', fallback=config.get('Storage', 'data_dir', fallback='/var/lib/piphone'))
+    path = calls_file(Path(data_dir), args.phone)
+
+if not path.exists():
+    print(f"Anrufliste {path} nicht gefunden.")
+    exit(1)
+
+records = read_records(path, since=args.since)
+
+match args.command:
+    case 'list':
+        for record in records:
+            print_record(record)
+
+    case 'missed':
+        for record in records:
+            if record.missed:
+                print_record(record)
+
+    case 'rejected':
+        for record in records:
+            if record.rejected:
+                print_record(record)
+
+    case 'top':
+        callers = Counter()
+        contacts = {}
+        for record in records:
+            if record.direction == "in":
+                callers[record.number] += 1
+                if record.contact is not None:
+                    contacts[record.number] = record.contact
+        for number, count in callers.most_common(args.limit):
+            contact = f" ({contacts[number]})" if number in contacts else ""
+            print(f"{count:>5}  {number}{contact}")
+
+    case 'setup':
+        totals = {}
+        for record in records:
+            if record.setup_ms is not None:
+                count, total = totals.get(record.direction, (0, 0))
+                totals[record.direction] = (count + 1, total + record.setup_ms)
+        if len(totals) == 0:
+            print("Keine verbundenen Anrufe.")
+        for direction, (count, total) in sorted(totals.items()):
+            print(f"{direction:<3}  Ø {total / count:.0f} ms bei {count} Anrufen")
@@ -1,5 +1,10 @@
+import asyncio
+from os import close, pidfd_open
 from subprocess import Popen, DEVNULL
 from threading import Lock
+from time import perf_counter
+
+from lib.metrics import PhoneMetrics
 
 
 class Audio:
@@ -11,54 +16,121 @@ class Audio:
     - sox (`play`) kann alle Formate und außerdem repeat (für Klingelton), ist aber ebenfalls etwas langsamer
     """
 
+    # Ausgabegeräte (ALSA), je Telefon konfigurierbar in [Audio]
+    speaker_device: str
+    earpiece_device: str
+
     # Locking nötig, da sich sonst zwei nahezu gleichzeitige Prozesse in den Weg kommen können
     _earpiece_lock: Lock
     _speaker_lock: Lock
 
-    # Laufende Wiedergabeprozesse
+    # Laufende Wiedergabeprozesse und deren Datei/Wiederholung (für reopen_* nach Hotplug)
     _earpiece_tone_subprocess: Popen | None = None
     _speaker_tone_subprocess: Popen | None = None
+    _earpiece_tone: tuple[str, bool] | None = None
+    _speaker_tone: tuple[str, bool] | None = None
+
+    # Metriken (optional)
+    metrics: PhoneMetrics | None = None
+
+    def __init__(self, speaker_device: str = "i2s", earpiece_device: str = "usb", metrics: PhoneMetrics | None = None):
+        self.speaker_device = speaker_device
+        self.earpiece_device = earpiece_device
+        self.metrics = metrics
+        self._earpiece_lock = Lock()
+        self._speaker_lock = Lock()
+
+    def _play(self, path: str, device: str, repeat: bool = False, offset: float = 0) -> Popen:
+        started = perf_counter()
 
-    @staticmethod
-    def _play(path: str, device: str, repeat: bool = False) -> Popen:
         # Simple, etwas effizientere Variante mit aplay
-        if not repeat and path.endswith(".wav"):
-            return Popen(['aplay', '-q', '-D', device, path])
+        if not repeat and offset == 0 and path.endswith(".wav"):
+            process = Popen(['aplay', '-q', '-D', device, path])
         else:
             cmd = ['/usr/bin/play', '-q', path, '-t', 'alsa']
+            if offset > 0:
+                # Ab Sekunde `offset` (z.B. Schlafmusik nach Neustart), hinter dem Ende endet sox sofort
+                cmd = [*cmd, 'trim', f'{offset:.1f}']
             if repeat:
                 # Datei um eine Sekunde verlängern (=1s Pause zwischen den Wiederholungen) und 99x wiederholen (das sollte reichen...)
                 cmd = [*cmd, *['pad', '0', '1', 'repeat', '99']]
 
-            return Popen(cmd, env={'AUDIODEV': device}, stderr=DEVNULL)
+            process = Popen(cmd, env={'AUDIODEV': device}, stderr=DEVNULL)
 
-    @staticmethod
-    def play_speaker(path: str, repeat: bool = False) -> Popen:
-        Audio._speaker_lock.acquire()
-        Audio.stop_speaker()
-        Audio._speaker_tone_subprocess = Audio._play(path, device="i2s", repeat=repeat)
-        Audio._speaker_lock.release()
-        return Audio._speaker_tone_subprocess
+        if self.metrics is not None:
+            self.metrics.audio_spawns.inc(device=device, player=process.args[0].rsplit('/', 1)[-1])
+            self.metrics.audio_spawn_seconds.observe(perf_counter() - started, device=device)
 
-    @staticmethod
-    def stop_speaker() -> None:
-        if Audio._speaker_tone_subprocess is not None:
-            Audio._speaker_tone_subprocess.kill()
-            Audio._speaker_tone_subprocess = None
+        return process
+
+    def play_speaker(self, path: str, repeat: bool = False, offset: float = 0) -> Popen:
+        with self._speaker_lock:
+            self.stop_speaker()
+            self._speaker_tone_subprocess = self._play(path, device=self.speaker_device, repeat=repeat, offset=offset)
+            self._speaker_tone = (path, repeat)
+            return self._speaker_tone_subprocess
+
+    def stop_speaker(self) -> None:
+        if self._speaker_tone_subprocess is not None:
+            self._stop(self._speaker_tone_subprocess)
+            self._speaker_tone_subprocess = None
+
+    def play_earpiece(self, path: str, repeat: bool = False) -> Popen:
+        with self._earpiece_lock:
+            self.stop_earpiece()
+            self._earpiece_tone_subprocess = self._play(path, device=self.earpiece_device, repeat=repeat)
+            self._earpiece_tone = (path, repeat)
+            return self._earpiece_tone_subprocess
+
+    def stop_earpiece(self) -> None:
+        if self._earpiece_tone_subprocess is not None:
+            self._stop(self._earpiece_tone_subprocess)
+            self._earpiece_tone_subprocess = None
+
+    def reopen_speaker(self) -> Popen | None:
+        """Soundkarte neu erkannt: Wiedergabe, die mit der alten Karte abgebrochen ist, neu starten"""
+        if self._speaker_tone_subprocess is None or self._speaker_tone_subprocess.poll() == 0:
+            return None
+        return self.play_speaker(*self._speaker_tone)
+
+    def reopen_earpiece(self) -> Popen | None:
+        """Soundkarte neu erkannt: Wiedergabe, die mit der alten Karte abgebrochen ist, neu starten"""
+        if self._earpiece_tone_subprocess is None or self._earpiece_tone_subprocess.poll() == 0:
+            return None
+        return self.play_earpiece(*self._earpiece_tone)
+
+    def pids(self) -> list[int]:
+        """Laufende Wiedergabeprozesse (Hörer und Lautsprecher)"""
+        return [
+            process.pid for process in (self._earpiece_tone_subprocess, self._speaker_tone_subprocess)
+            if process is not None and process.poll() is None
+        ]
 
     @staticmethod
-    def play_earpiece(path: str, repeat: bool = False) -> Popen:
-        Audio._earpiece_lock.acquire()
-        Audio.stop_speaker()
-        Audio._earpiece_tone_subprocess = Audio._play(path, device="usb", repeat=repeat)
-        Audio._earpiece_lock.release()
-        return Audio._earpiece_tone_subprocess
+    def _stop(process: Popen) -> None:
+        """Wiedergabe beenden und Prozess einsammeln (sonst bleibt bis zur nächsten Wiedergabe ein Zombie zurück)"""
+        if process.poll() is None:
+            process.kill()
+            process.wait()
 
     @staticmethod
-    def stop_earpiece() -> None:
-        if Audio._earpiece_tone_subprocess is not None:
-            Audio._earpiece_tone_subprocess.kill()
-            Audio._earpiece_tone_subprocess = None
+    async def wait(process: Popen) -> int:
+        """Auf Ende der Wiedergabe warten, ohne Event-Loop oder einen Thread zu blockieren (pidfd)"""
+        if process.poll() is not None:
+            return process.returncode
+
+        try:
+            pidfd = pidfd_open(process.pid)
+        except ProcessLookupError:
+            return process.wait()
+
+        loop = asyncio.get_running_loop()
+        exited = loop.create_future()
+        loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+        try:
+            await exited
+        finally:
+            loop.remove_reader(pidfd)
+            close(pidfd)
 
-Audio._earpiece_lock = Lock()
-Audio._speaker_lock = Lock()
+        return process.wait()
@@ -0,0 +1,64 @@
+from os import sysconf
+from time import perf_counter
+
+from lib.eventlog import get_logger
+
+log = get_logger('boot')
+
+
+class BootTiming:
+    """Dauer der einzelnen Startphasen erfassen und als Aufschlüsselung bis zur Bereitschaft ausgeben"""
+
+    _started: float
+    phases: dict[str, float]
+
+    def __init__(self, started: float | None = None):
+        self._started = started if started is not None else perf_counter()
+        self.phases = {}
+
+    def mark(self, phase: str, since: float) -> None:
+        self.phases[phase] = perf_counter() - since
+
+    async def measure(self, phase: str, awaitable) -> object:
+        """Phase (Coroutine) ausführen und Dauer erfassen"""
+        since = perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.mark(phase, since)
+
+    @staticmethod
+    def process_age() -> float | None:
+        """Sekunden seit Prozessstart (inkl. Interpreterstart, vor dem ersten Python-Import)"""
+        try:
+            with open('/proc/self/stat') as stat:
+                start_ticks = int(stat.read().rsplit(')', 1)[1].split()[19])
+            with open('/proc/uptime') as uptime:
+                return float(uptime.read().split()[0]) - start_ticks / sysconf('SC_CLK_TCK')
+        except (OSError, ValueError, IndexError):
+            return None
+
+    @staticmethod
+    def system_uptime() -> float | None:
+        try:
+            with open('/proc/uptime') as uptime:
+                return float(uptime.read().split()[0])
+        except (OSError, ValueError):
+            return None
+
+    def report(self, with_uptime: bool = True) -> str:
+        phases = ", ".join(f"{phase} {duration * 1000:.0f}ms" for phase, duration in self.phases.items())
+        total = perf_counter() - self._started
+        summary = f"Bereit nach {total * 1000:.0f}ms ({phases})"
+        if not with_uptime:
+            return summary
+
+        process_age = self.process_age()
+        if process_age is not None:
+            summary += f", {process_age:.2f}s seit Prozessstart"
+
+        uptime = self.system_uptime()
+        if uptime is not None:
+            summary += f", {uptime:.1f}s seit Systemstart"
+
+        return summary
@@ -0,0 +1,111 @@
+from asyncio import AbstractEventLoop, TimerHandle
+from collections import deque
+from enum import Enum
+from threading import active_count
+from time import perf_counter_ns
+
+from lib.eventlog import get_logger
+from lib.metrics import PhoneMetrics
+from lib.wakeups import WakeupCounter
+
+
+log = get_logger('callstate')
+
+
+class CallState(Enum):
+    """Zustände des Telefons aus Sicht des Gesprächsablaufs"""
+    IDLE = "idle"        # Hörer aufgelegt, kein Anruf
+    RINGING = "ringing"  # Eingehender Anruf, es klingelt
+    DIALING = "dialing"  # Hörer abgehoben, Wählvorgang läuft
+    ACTION = "action"    # Kurzbefehl wird ausgeführt
+    IN_CALL = "in_call"  # Gespräch (ein- oder ausgehend) aktiv
+    BUSY = "busy"        # Hörer abgehoben, Besetztton (Timeout, Gesprächsende, ungültige Nummer)
+    VOICEMAIL = "voicemail"  # Anrufbeantworter hat angenommen und zeichnet auf
+
+
+class CallStateMachine:
+    """
+    Zustandsautomat für den Gesprächsablauf. Gehört ausschließlich der Event-Loop:
+    - Ereignisse aus anderen Threads (Gabelkontakt, Nummernschalter, linphonec) werden per
+      `call_soon_threadsafe` in die Loop übergeben und nur dort verarbeitet
+    - Timeouts laufen über `loop.call_later` statt über je einen eigenen `threading.Timer`-Thread
+    - Messwerte: Latenz zwischen Ereignis und Verarbeitung in der Loop, Anzahl Threads,
+      Aufwachvorgänge je Quelle
+    """
+
+    loop: AbstractEventLoop
+    state: CallState = CallState.IDLE
+
+    # Messwerte
+    latencies_ns: deque[int]  # Die letzten N Übergabelatenzen
+    max_latency_ns: int = 0
+    events_handled: int = 0
+    transitions: int = 0
+    max_threads: int = 0
+    wakeups: WakeupCounter
+    metrics: PhoneMetrics | None
+    listeners: list[callable]  # Werden bei jedem Zustandswechsel mit (alter, neuer Zustand) aufgerufen
+
+    def __init__(self, loop: AbstractEventLoop, metrics: PhoneMetrics | None = None, history: int = 256):
+        self.loop = loop
+        self.metrics = metrics
+        self.latencies_ns = deque(maxlen=history)
+        self.max_threads = active_count()
+        self.wakeups = WakeupCounter()
+        self.listeners = []
+
+    def threadsafe(self, handler: callable, source: str | None = None) -> callable:
+        """Handler so verpacken, dass er aus beliebigen Threads aufgerufen werden kann, aber in der Loop läuft"""
+        source = source or handler.__name__
+
+        def post(*args) -> None:
+            self.loop.call_soon_threadsafe(self._dispatch, perf_counter_ns(), source, handler, args)
+        return post
+
+    def _dispatch(self, posted_ns: int, source: str, handler: callable, args: tuple) -> None:
+        """Übergebenes Ereignis in der Loop ausführen und Latenz erfassen"""
+        self.wakeups.count(source)
+        latency = perf_counter_ns() - posted_ns
+        self.latencies_ns.append(latency)
+        self.max_latency_ns = max(self.max_latency_ns, latency)
+        self.events_handled += 1
+        self.max_threads = max(self.max_threads, active_count())
+        if self.metrics is not None:
+            self.metrics.event_latency_seconds.observe(latency / 1e9)
+        handler(*args)
+
+    def call_later(self, delay: float, handler: callable, *args) -> TimerHandle:
+        """Timeout in der Loop planen (ersetzt threading.Timer, kein eigener Thread)"""
+        return self.loop.call_later(delay, self._fire, f"timer:{handler.__name__}", handler, args)
+
+    def _fire(self, source: str, handler: callable, args: tuple) -> None:
+        self.wakeups.count(source)
+        handler(*args)
+
+    def transition(self, new_state: CallState) -> None:
+        """Zustandswechsel durchführen (nur aus der Loop aufrufen)"""
+        if new_state is self.state:
+            return
+
+        if log.debug_enabled:
+            log.debug("Zustand: {} -> {} ({})", self.state.name, new_state.name, self.report())
+
+        old_state = self.state
+        self.state = new_state
+        self.transitions += 1
+        if self.metrics is not None:
+            self.metrics.transitions.inc(state=new_state.value)
+        for listener in self.listeners:
+            listener(old_state, new_state)
+
+    def is_in(self, *states: CallState) -> bool:
+        return self.state in states
+
+    def report(self) -> str:
+        """Kurzer Bericht: Latenz der Ereignisübergabe und Anzahl Threads"""
+        if len(self.latencies_ns) == 0:
+            return f"{active_count()} Threads"
+
+        average = sum(self.latencies_ns) / len(self.latencies_ns)
+        return (f"Latenz Ø {average / 1e6:.2f} ms, max. {self.max_latency_ns / 1e6:.2f} ms "
+                f"bei {self.events_handled} Ereignissen, {active_count()} Threads (max. {self.max_threads})")
@@ -0,0 +1,180 @@
+import json
+from asyncio import AbstractEventLoop, TimerHandle
+from os import close, fsync, open as os_open, write, O_APPEND, O_CREAT, O_WRONLY
+from pathlib import Path
+from time import time
+from typing import Iterator
+
+from lib.eventlog import get_logger
+from lib.phoneconfig import DEFAULT_PHONE
+
+log = get_logger('cdr')
+
+# Zeilen werden bei Gesprächsende angehängt und sind daher nur ungefähr nach `e` sortiert: überlappende Anrufe
+# (mehrere Telefone, Anklopfen) und Zeitkorrekturen (NTP nach dem Start) vertauschen die Reihenfolge. Eine Zeile
+# endet höchstens so viele Sekunden früher als eine vor ihr angehängte; größere Sprünge der Uhr zurück können
+# bei `since` ältere Einträge vor dem Sprung verbergen.
+MAX_DISORDER = 86400
+
+
+class CallRecord:
+    """Ein Anruf (ein- oder ausgehend), Zeitpunkte als Unix-Zeitstempel in Sekunden"""
+
+    # Vom Telefon selbst abgewiesene eingehende Anrufe (kein verpasster Anruf)
+    REJECT_REASONS: tuple[str, ...] = ('offhook', 'dnd', 'whitelist')
+
+    # Kurze Schlüssel halten die Datei klein: Attribut -> Schlüssel in der Datei
+    KEYS: dict[str, str] = {
+        'direction': 'd', 'number': 'n', 'contact': 'c', 'start': 's', 'answer': 'a', 'end': 'e',
+        'reason': 'r', 'setup_ms': 'l'
+    }
+
+    direction: str  # "in" oder "out"
+    number: str
+    contact: str | None = None  # Kurzwahl aus [Numbers]
+    start: int
+    answer: int | None = None
+    end: int | None = None
+    reason: str | None = None  # Abweisungsgrund: offhook, dnd, whitelist, offline; voicemail = Anrufbeantworter
+    setup_ms: int | None = None  # Wahl bzw. Annahme bis Gespräch verbunden
+
+    def __init__(self, direction: str, number: str, contact: str | None = None, start: int | None = None):
+        self.direction = direction
+        self.number = number
+        self.contact = contact
+        self.start = start if start is not None else int(time())
+
+    @property
+    def rejected(self) -> bool:
+        return self.direction == "in" and self.reason in self.REJECT_REASONS
+
+    @property
+    def missed(self) -> bool:
+        """Nicht angenommen (auch Anrufbeantworter), ohne vom Telefon abgewiesene Anrufe"""
+        return self.direction == "in" and self.answer is None and not self.rejected
+
+    def to_line(self) -> str:
+        """Eine Zeile JSON ohne Leerzeichen, leere Felder entfallen"""
+        fields = {key: value for attr, key in self.KEYS.items() if (value := getattr(self, attr)) is not None}
+        return json.dumps(fields, separators=(',', ':'), ensure_ascii=False) + "\n"
+
+    @classmethod
+    def from_dict(cls, fields: dict) -> 'CallRecord':
+        record = cls(fields['d'], fields['n'], start=fields['s'])
+        for attr, key in cls.KEYS.items():
+            if key in fields:
+                setattr(record, attr, fields[key])
+        return record
+
+
+class CallLog:
+    """
+    Anrufliste als Append-only-Datei (JSON Lines, ein Anruf pro Zeile, geschrieben bei Gesprächsende).
+    - Einträge werden gesammelt und erst nach `flush_delay` Sekunden mit einem Schreibvorgang + fsync angehängt,
+      das schont die SD-Karte; ohne neue Anrufe wird nie geschrieben
+    - Eine bei Stromausfall abgeschnittene letzte Zeile wird beim Lesen übersprungen
+    """
+
+    loop: AbstractEventLoop
+    path: Path
+    flush_delay: float
+    _pending: list[str]
+    _flush_timer: TimerHandle | None = None
+
+    def __init__(self, loop: AbstractEventLoop, path: Path, flush_delay: float = 30):
+        self.loop = loop
+        self.path = path
+        self.flush_delay = flush_delay
+        self._pending = []
+
+    def begin(self, direction: str, number: str, contact: str | None = None) -> CallRecord:
+        return CallRecord(direction, number, contact)
+
+    def answered(self, record: CallRecord, setup_seconds: float | None = None) -> None:
+        record.answer = int(time())
+        if setup_seconds is not None:
+            record.setup_ms = round(setup_seconds * 1000)
+
+    def finish(self, record: CallRecord, reason: str | None = None) -> None:
+        """Anruf abschließen und zum Schreiben vormerken"""
+        record.end = int(time())
+        if reason is not None:
+            record.reason = reason
+        self._pending.append(record.to_line())
+
+        if self._flush_timer is None:
+            self._flush_timer = self.loop.call_later(self.flush_delay, self.flush)
+
+    def flush(self) -> None:
+        """Vorgemerkte Anrufe mit einem Schreibvorgang anhängen"""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if len(self._pending) == 0:
+            return
+
+        data = "".join(self._pending).encode('utf-8')
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os_open(self.path, O_WRONLY | O_APPEND | O_CREAT, 0o644)
+            try:
+                write(fd, data)
+                fsync(fd)
+            finally:
+                close(fd)
+        except OSError as e:
+            # Vorgemerkte Anrufe behalten, beim nächsten Anruf erneut versuchen
+            log.warning("Kann Anrufliste nicht schreiben: {}", e)
+            return
+
+        log.debug("{} Anruf(e) in Anrufliste geschrieben", len(self._pending))
+        self._pending.clear()
+
+
+def calls_file(data_dir: Path, phone: str = DEFAULT_PHONE) -> Path:
+    """Anrufliste eines Telefons (bei mehreren Telefonen je Telefon eine Datei)"""
+    return data_dir / ("calls.jsonl" if phone == DEFAULT_PHONE else f"calls-{phone}.jsonl")
+
+
+def _seek_since(file, since: int) -> None:
+    """
+    Binäre Suche nach dem ersten Anruf, der ab `since - MAX_DISORDER` endete. Davor angehängte Anrufe enden
+    früher als `since`, ab dort filtert read_records() linear.
+    """
+    since -= MAX_DISORDER
+    file.seek(0, 2)
+    low, high = 0, file.tell()
+    while low < high:
+        middle = (low + high) // 2
+        file.seek(middle)
+        if middle > 0:
+            file.readline()  # Angeschnittene Zeile überspringen
+        line = file.readline()
+        try:
+            end = json.loads(line)['e']
+        except (ValueError, KeyError):
+            end = since  # Unlesbare Zeile oder Dateiende: links weitersuchen
+        if end < since:
+            low = middle + 1
+        else:
+            high = middle
+
+    file.seek(low)
+    if low > 0:
+        file.readline()
+
+
+def read_records(path: Path, since: int | None = None) -> Iterator[CallRecord]:
+    """Anrufe zeilenweise lesen (ohne die ganze Datei zu laden), optional erst ab Gesprächsende `since`"""
+    with open(path, 'rb') as file:
+        if since is not None:
+            _seek_since(file, since)
+        for line in file:
+            if not line.endswith(b"\n"):
+                break  # Unvollständige letzte Zeile (Schreibvorgang unterbrochen)
+            try:
+                record = CallRecord.from_dict(json.loads(line))
+            except (ValueError, KeyError, TypeError):
+                continue
+            if since is None or record.end is None or record.end >= since:
+                yield record
@@ -0,0 +1,216 @@
+import asyncio
+import json
+import math
+from os import chmod
+from pathlib import Path
+from time import time
+
+from lib.eventlog import get_logger
+from lib.metrics import Registry
+from lib.phone import PiPhone
+
+log = get_logger('control')
+
+
+class ControlClient:
+    """Verbundener Client: Ausgaben laufen über eine begrenzte Warteschlange und einen eigenen Sende-Task"""
+
+    writer: asyncio.StreamWriter
+    queue: asyncio.Queue
+    subscribed: bool = False
+    closed: bool = False
+
+    def __init__(self, writer: asyncio.StreamWriter, queue_size: int):
+        self.writer = writer
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def send(self, message: bytes) -> bool:
+        """Nachricht einreihen, blockiert nie. Volle Warteschlange (Client liest nicht): Verbindung trennen"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            log.warning("Steuerung: Client liest nicht schnell genug, trenne Verbindung.")
+            self.close()
+            return False
+        return True
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self.writer.transport.abort()
+
+
+class ControlServer:
+    """
+    Steuerung und Abfrage über einen Unix-Socket, ein JSON-Objekt pro Zeile (z.B. für Hausautomation).
+    Anfrage:  {"id": 1, "cmd": "state", "phone": "buero"}
+    Antwort:  {"id": 1, "ok": true, "result": {...}} bzw. {"id": 1, "ok": false, "error": "..."}
+    Befehle:  phones, state, subscribe, unsubscribe, dial (number), answer, hangup, action (action), metrics,
+              profile (seconds), soundcards, intercom
+    Nach subscribe folgen Ereignisse: {"event": "state", "phone": "buero", "t": 1700000000.0, ...}
+    `phone` kann entfallen, wenn nur ein Telefon konfiguriert ist.
+    Befehle laufen direkt in der Event-Loop und warten nie auf Clients; langsame Clients werden getrennt.
+    """
+
+    QUEUE_SIZE: int = 256  # Ausstehende Nachrichten je Client
+    MAX_LINE: int = 4096  # Maximale Länge einer Anfrage
+
+    phones: dict[str, PiPhone]
+    registry: Registry
+    profiler: callable  # Liefert den Profiler (erst bei der ersten Messung geladen), None = nicht verfügbar
+    profile_seconds: float
+    clients: set[ControlClient]
+    _server: asyncio.AbstractServer | None = None
+
+    def __init__(
+            self,
+            phones: list[PiPhone],
+            registry: Registry,
+            profiler: callable = None,
+            profile_seconds: float = 10
+    ):
+        self.phones = {phone.name: phone for phone in phones}
+        self.registry = registry
+        self.profiler = profiler
+        self.profile_seconds = profile_seconds
+        self.clients = set()
+        for phone in phones:
+            phone.subscribers.append(self._broadcast)
+
+    async def start(self, path: str, mode: int = 0o660) -> None:
+        socket_path = Path(path)
+        socket_path.parent.mkdir(parents=True, exist_ok=True)
+        socket_path.unlink(missing_ok=True)
+        self._server = await asyncio.start_unix_server(self._handle, path=socket_path, limit=self.MAX_LINE)
+        chmod(socket_path, mode)
+        log.info("Steuerung verfügbar unter {}", socket_path)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        client = ControlClient(writer, self.QUEUE_SIZE)
+        self.clients.add(client)
+        sender = asyncio.create_task(self._send(client))
+        try:
+            while not client.closed and (line := await reader.readline()):
+                if line.strip() == b"":
+                    continue
+                client.send(self._encode(self._execute(client, line)))
+                # Gepufferte Anfragen nicht am Stück abarbeiten: Ereignisse der Telefone haben Vorrang
+                await asyncio.sleep(0)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError) as e:
+            log.debug("Steuerung: Verbindung beendet: {!r}", e)
+        finally:
+            self.clients.discard(client)
+            sender.cancel()
+            client.close()
+
+    @staticmethod
+    async def _send(client: ControlClient) -> None:
+        while True:
+            message = await client.queue.get()
+            client.writer.write(message)
+            await client.writer.drain()
+
+    @staticmethod
+    def _encode(message: dict) -> bytes:
+        return json.dumps(message, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b"\n"
+
+    def _broadcast(self, phone: str, event: str, fields: dict) -> None:
+        """Ereignis eines Telefons an alle Abonnenten (Callback aus PiPhone.publish)"""
+        subscribers = [client for client in self.clients if client.subscribed]
+        if len(subscribers) == 0:
+            return
+        message = self._encode({'event': event, 'phone': phone, 't': round(time(), 3), **fields})
+        for client in subscribers:
+            client.send(message)
+
+    def _phone(self, request: dict) -> PiPhone:
+        name = request.get('phone')
+        if name is None:
+            if len(self.phones) == 1:
+                return next(iter(self.phones.values()))
+            raise ValueError(f"Telefon angeben: {', '.join(self.phones)}")
+        if not isinstance(name, str):
+            raise ValueError("phone muss ein Text sein")
+        try:
+            return self.phones[name]
+        except KeyError:
+            raise ValueError(f"Unbekanntes Telefon: {name}")
+
+    def _execute(self, client: ControlClient, line: bytes) -> dict:
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Anfrage muss ein JSON-Objekt sein")
+            request_id = request.get('id')
+
+            match request.get('cmd'):
+                case 'phones':
+                    result = list(self.phones)
+                case 'state':
+                    if request.get('phone') is None and len(self.phones) > 1:
+                        result = [phone.snapshot() for phone in self.phones.values()]
+                    else:
+                        result = self._phone(request).snapshot()
+                case 'subscribe':
+                    client.subscribed = True
+                    result = [phone.snapshot() for phone in self.phones.values()]
+                case 'unsubscribe':
+                    client.subscribed = False
+                    result = None
+                case 'dial':
+                    self._phone(request).remote_dial(str(request['number']))
+                    result = None
+                case 'answer':
+                    self._phone(request).remote_answer()
+                    result = None
+                case 'hangup':
+                    self._phone(request).remote_hangup()
+                    result = None
+                case 'action':
+                    self._phone(request).remote_action(str(request['action']))
+                    result = None
+                case 'metrics':
+                    result = self.registry.render()
+                case 'profile':
+                    if self.profiler is None:
+                        raise ValueError("Profil nicht verfügbar")
+                    seconds = request.get('seconds')
+                    if seconds is None:
+                        seconds = self.profile_seconds
+                    number = isinstance(seconds, (int, float)) and not isinstance(seconds, bool)
+                    if not number or not math.isfinite(seconds) or seconds <= 0:
+                        raise ValueError("seconds muss eine positive Zahl sein")
+                    seconds = float(seconds)
+                    result = {'report': str(self.profiler().start(seconds)), 'seconds': seconds}
+                case 'soundcards':
+                    devices = self._phone(request).sound_devices
+                    if devices is None:
+                        raise ValueError("Soundkarten nicht verfügbar")
+                    result = [card.describe() for card in devices.cards.values()]
+                case 'intercom':
+                    intercom = self._phone(request).intercom
+                    if intercom is None:
+                        raise ValueError("Gegensprechanlage nicht aktiviert")
+                    result = intercom.describe()
+                case command:
+                    raise ValueError(f"Unbekannter Befehl: {command}")
+
+        except KeyError as e:
+            return {'id': request_id, 'ok': False, 'error': f"Parameter fehlt: {e}"}
+        except ValueError as e:
+            return {'id': request_id, 'ok': False, 'error': str(e)}
+        except Exception as e:
+            # Fehlerhafte Anfrage oder Fehler im Telefon: nur diese Anfrage scheitert, die Verbindung bleibt bestehen
+            log.error("Steuerung: Anfrage {} fehlgeschlagen: {!r}", line[:200], e)
+            return {'id': request_id, 'ok': False, 'error': f"Interner Fehler: {e!r}"}
+
+        return {'id': request_id, 'ok': True, 'result': result}
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+        for client in list(self.clients):
+            client.close()
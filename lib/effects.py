@@ -0,0 +1,81 @@
+from math import ceil
+
+from lib.pwm import PwmOutput
+
+
+class Ramp:
+    """
+    Helligkeitsverlauf (z.B. Sonnenaufgang) in der Event-Loop, ohne eigenen Thread.
+    Die wahrgenommene Helligkeit steigt linear, der Duty folgt der Gammakurve (duty = ziel * anteil^gamma):
+    das Auge reagiert auf kleine Duty-Werte am stärksten, ein linearer Duty-Verlauf wirkt daher sprunghaft.
+    """
+
+    MAX_STEPS: int = 256  # Wahrgenommene Helligkeitsstufen
+    MIN_INTERVAL: float = 0.5  # Kürzester Abstand zweier Schritte in Sekunden
+
+    call_later: callable
+    output: PwmOutput
+    duration: float
+    start_duty: float
+    target_duty: float
+    gamma: float
+    on_done: callable = None
+    steps: int
+    step: int = 0
+    _timer = None
+
+    def __init__(
+            self,
+            call_later: callable,
+            output: PwmOutput,
+            duration: float,
+            target_duty: float,
+            start_duty: float = 0,
+            gamma: float = 2.2,
+            on_done: callable = None
+    ):
+        self.call_later = call_later
+        self.output = output
+        self.duration = duration
+        self.start_duty = start_duty
+        self.target_duty = target_duty
+        self.gamma = gamma
+        self.on_done = on_done
+        self.steps = max(1, min(self.MAX_STEPS, ceil(duration / self.MIN_INTERVAL)))
+
+    def duty(self, fraction: float) -> float:
+        """Duty für den Anteil 0..1 der wahrgenommenen Helligkeit zwischen Start- und Zielwert"""
+        low = (self.start_duty / 100) ** (1 / self.gamma)
+        high = (self.target_duty / 100) ** (1 / self.gamma)
+        return 100 * (low + (high - low) * fraction) ** self.gamma
+
+    def start(self) -> 'Ramp':
+        self.step = 0
+        self._apply()
+        self._timer = self.call_later(self.duration / self.steps, self._tick)
+        return self
+
+    def _apply(self) -> None:
+        duty = round(self.duty(self.step / self.steps), 2)
+        if duty != round(self.output.duty, 2):
+            self.output.set(duty)
+
+    def _tick(self) -> None:
+        self.step += 1
+        self._apply()
+
+        if self.step < self.steps:
+            self._timer = self.call_later(self.duration / self.steps, self._tick)
+        else:
+            self._timer = None
+            if self.on_done is not None:
+                self.on_done()
+
+    @property
+    def running(self) -> bool:
+        return self._timer is not None
+
+    def cancel(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
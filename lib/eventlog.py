@@ -0,0 +1,193 @@
+import json
+import sys
+from asyncio import AbstractEventLoop
+from collections import deque
+from itertools import count
+from pathlib import Path
+from threading import get_ident, Lock
+from time import time_ns, strftime
+
+# Stufen (wie logging)
+DEBUG: int = 10
+INFO: int = 20
+WARNING: int = 30
+ERROR: int = 40
+LEVEL_NAMES: dict[int, str] = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+LEVELS: dict[str, int] = {name.lower(): level for level, name in LEVEL_NAMES.items()}
+
+
+class EventLog:
+    """
+    Strukturiertes Ereignisprotokoll mit vorab angelegtem Ringpuffer.
+    - Einträge sind Tupel (Zeit, Stufe, Quelle, Vorlage, Argumente); formatiert wird erst bei der Ausgabe
+    - Einträge unterhalb von `level` kosten nur einen Vergleich
+    - Ausgabe ins Journal (stdout) gesammelt und asynchron in der Event-Loop, nicht im aufrufenden Thread;
+      höchstens `size` Einträge warten auf die Ausgabe, ältere werden verworfen und gezählt
+    - `dump()` schreibt die letzten Einträge als JSON Lines für die Fehleranalyse (Absturz, SIGUSR2)
+    """
+
+    size: int
+    level: int = INFO  # Mindeststufe für Ringpuffer
+    output_level: int = INFO  # Mindeststufe für Ausgabe ins Journal
+    dump_dir: Path = Path("/run/piphone")
+
+    _ring: list[tuple | None]
+    _seq: count
+    _written: int = 0
+    dropped: int = 0  # Nicht ausgegebene Einträge (Journal-Ausgabe zu langsam)
+    _pending: deque[tuple]
+    _dropped_pending: int = 0  # Seit der letzten Ausgabe verworfen
+    _flush_scheduled: bool = False
+    _lock: Lock  # Schützt _pending, _dropped_pending und _flush_scheduled
+    _loop: AbstractEventLoop | None = None
+    _loop_thread: int | None = None
+
+    def __init__(self, size: int = 5000):
+        self._lock = Lock()
+        self.configure(size=size)
+
+    def configure(self, size: int | None = None, level: int | None = None, output_level: int | None = None,
+                  dump_dir: Path | None = None) -> None:
+        if size is not None:
+            self.size = size
+            self._ring = [None] * size
+            self._seq = count()
+            self._written = 0
+            with self._lock:
+                self._pending = deque()
+                self._dropped_pending = 0
+        if output_level is not None:
+            self.output_level = output_level
+        if level is not None:
+            self.level = level
+        self.level = min(self.level, self.output_level)
+        if dump_dir is not None:
+            self.dump_dir = dump_dir
+
+    def attach(self, loop: AbstractEventLoop) -> None:
+        """Ab jetzt asynchron über die Event-Loop ausgeben (vorher synchron)"""
+        self._loop = loop
+        self._loop_thread = get_ident()
+
+    def detach(self) -> None:
+        """Wieder synchron ausgeben (z.B. beim Beenden, wenn die Loop nicht mehr läuft)"""
+        self._loop = None
+        self._flush()
+
+    def enabled(self, level: int) -> bool:
+        return level >= self.level
+
+    def record(self, level: int, source: str, template: str, args: tuple) -> None:
+        if level < self.level:
+            return
+
+        entry = (time_ns(), level, source, template, args)
+        seq = next(self._seq)  # atomar, auch aus mehreren Threads
+        self._ring[seq % self.size] = entry
+        self._written = seq + 1
+
+        if level < self.output_level:
+            return
+
+        with self._lock:
+            if len(self._pending) >= self.size:
+                self._pending.popleft()
+                self._dropped_pending += 1
+                self.dropped += 1
+            self._pending.append(entry)
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+
+        if self._loop is None:
+            self._flush()
+        elif get_ident() == self._loop_thread:
+            self._loop.call_soon(self._flush)
+        else:
+            self._loop.call_soon_threadsafe(self._flush)
+
+    @staticmethod
+    def format(entry: tuple) -> str:
+        _, level, source, template, args = entry
+        message = template.format(*args) if args else template
+        if level >= WARNING:
+            return f"[{LEVEL_NAMES[level]}] {message}"
+        return message
+
+    def _flush(self) -> None:
+        """Gesammelte Einträge mit einem einzigen Schreibvorgang ausgeben"""
+        with self._lock:
+            pending, self._pending = self._pending, deque()
+            dropped, self._dropped_pending = self._dropped_pending, 0
+            self._flush_scheduled = False
+        lines = [f"[WARNING] {dropped} Meldungen verworfen (Ausgabe zu langsam)"] if dropped else []
+        lines += [self.format(entry) for entry in pending]
+        if lines:
+            sys.stdout.write("\n".join(lines) + "\n")
+            sys.stdout.flush()
+
+    def entries(self) -> list[tuple]:
+        """Inhalt des Ringpuffers, älteste zuerst"""
+        written = self._written
+        start = max(0, written - self.size)
+        return [entry for i in range(start, written) if (entry := self._ring[i % self.size]) is not None]
+
+    def dump(self, reason: str) -> Path | None:
+        """Ringpuffer als JSON Lines auf die Platte schreiben"""
+        path = self.dump_dir / f"events-{strftime('%Y%m%d-%H%M%S')}.jsonl"
+        try:
+            self.dump_dir.mkdir(parents=True, exist_ok=True)
+            with open(path, "w") as file:
+                file.write(json.dumps({"reason": reason, "t": time_ns()}) + "\n")
+                for entry in self.entries():
+                    t, level, source, template, args = entry
+                    message = template.format(*args) if args else template
+                    file.write(json.dumps(
+                        {"t": t, "lvl": LEVEL_NAMES[level], "src": source, "msg": message},
+                        ensure_ascii=False
+                    ) + "\n")
+        except (OSError, ValueError, IndexError, KeyError) as e:
+            sys.stdout.write(f"Kann Ereignisprotokoll nicht sichern: {e}\n")
+            return None
+
+        self.record(INFO, "eventlog", "Ereignisprotokoll gesichert: {}", (path,))
+        return path
+
+
+class Logger:
+    """Protokoll einer Quelle (Modul), schreibt in das gemeinsame EventLog"""
+
+    source: str
+    sink: EventLog
+    prefix: str  # Wird jeder Meldung vorangestellt, z.B. Name des Telefons
+
+    def __init__(self, source: str, sink: EventLog, prefix: str = ""):
+        self.source = source
+        self.sink = sink
+        self.prefix = prefix
+
+    @property
+    def debug_enabled(self) -> bool:
+        """Für heiße Pfade: teure Argumente nur berechnen, wenn DEBUG aktiv ist"""
+        return self.sink.level <= DEBUG
+
+    def debug(self, template: str, *args) -> None:
+        if self.sink.level <= DEBUG:
+            self.sink.record(DEBUG, self.source, self.prefix + template, args)
+
+    def info(self, template: str, *args) -> None:
+        self.sink.record(INFO, self.source, self.prefix + template, args)
+
+    def warning(self, template: str, *args) -> None:
+        self.sink.record(WARNING, self.source, self.prefix + template, args)
+
+    def error(self, template: str, *args) -> None:
+        self.sink.record(ERROR, self.source, self.prefix + template, args)
+
+
+# Gemeinsames Protokoll für den gesamten Prozess
+events = EventLog()
+
+
+def get_logger(source: str, prefix: str = "") -> Logger:
+    return Logger(source, events, prefix)
@@ -0,0 +1,142 @@
+from asyncio import TimerHandle
+from time import monotonic_ns
+
+from RPi import GPIO
+
+from lib.callstate import CallStateMachine
+from lib.eventlog import get_logger
+
+log = get_logger('hookswitch')
+
+
+class HookSwitch:
+    """
+    Gabelkontakt, entprellt anhand der Zeitstempel der Flanken (statt `bouncetime` und erneutem Lesen des Pins):
+    - Jede Flanke wird mit Zeitstempel aus dem GPIO-Thread in die Event-Loop übergeben
+    - Ein neuer Pegel gilt als bestätigt, sobald nach der letzten Flanke `debounce_ms` lang keine weitere folgt;
+      die Latenz ist damit Prelldauer + `debounce_ms` statt fester 100ms, die letzte Flanke geht nie verloren
+    - Kurzes Auflegen (`flash_min_ms` bis `flash_max_ms`, gemessen zwischen den ersten Flanken) ist ein Flash
+      (Hook-Flash, wie die R-Taste), längeres Auflegen ein Auflegen, noch kürzere Unterbrechungen werden verworfen.
+      Flash wird nur erkannt, solange `flash_enabled()` zutrifft (z.B. im Gespräch), sonst wird sofort aufgelegt.
+    Ereignisse an `on_event`: OFF_HOOK, ON_HOOK, FLASH
+    """
+
+    OFF_HOOK = "off_hook"
+    ON_HOOK = "on_hook"
+    FLASH = "flash"
+
+    # Konfiguration
+    pin: int
+    state: CallStateMachine
+    on_event: callable
+    flash_enabled: callable
+    debounce_ns: int
+    flash_min_ns: int
+    flash_max_ns: int
+
+    # Zustand
+    on_hook: bool  # Bestätigter Zustand: Hörer liegt auf (während eines möglichen Flash noch False)
+    _level: int  # Zuletzt bestätigter Pegel (1 = aufgelegt, Pull-up)
+    _first_edge_ns: int | None = None  # Erste Flanke des laufenden Pegelwechsels
+    _last_edge_ns: int = 0
+    _released_ns: int = 0  # Hörer aufgelegt, Flash möglich
+    _confirm_timer: TimerHandle | None = None
+    _flash_timer: TimerHandle | None = None
+
+    # Statistik
+    edges: int = 0  # Flanken insgesamt (inkl. Prellen)
+    glitches: int = 0  # Verworfene Pegelwechsel (Prellen ohne Zustandswechsel, zu kurzes Auflegen)
+    flashes: int = 0
+    last_latency_ns: int = 0  # Erste Flanke bis Ereignis
+
+    def __init__(
+            self,
+            pin: int,
+            state: CallStateMachine,
+            on_event: callable,
+            flash_enabled: callable = lambda: False,
+            debounce_ms: float = 20,
+            flash_min_ms: float = 80,
+            flash_max_ms: float = 600
+    ):
+        self.pin = pin
+        self.state = state
+        self.on_event = on_event
+        self.flash_enabled = flash_enabled
+        self.debounce_ns = int(debounce_ms * 1e6)
+        self.flash_min_ns = int(flash_min_ms * 1e6)
+        self.flash_max_ns = int(flash_max_ms * 1e6)
+
+        # GPIO.setmode(GPIO.BCM)  # Voraussetzung - Bereits in main() (piphone.py) erledigt
+        GPIO.setup(pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        self._level = GPIO.input(pin)
+        self.on_hook = bool(self._level)
+
+        post = state.threadsafe(self.edge, source='gabel')
+        GPIO.add_event_detect(pin, GPIO.BOTH, callback=lambda channel: post(monotonic_ns()))
+
+    def edge(self, timestamp_ns: int) -> None:
+        """Flanke (in der Loop): Bestätigung bis `debounce_ms` nach dieser Flanke verschieben"""
+        self.edges += 1
+        if self._first_edge_ns is None:
+            self._first_edge_ns = timestamp_ns
+        self._last_edge_ns = max(self._last_edge_ns, timestamp_ns)
+
+        if self._confirm_timer is not None:
+            self._confirm_timer.cancel()
+        # Übergabelatenz der Loop abziehen: bestätigt wird relativ zum Zeitpunkt der Flanke
+        delay = self._last_edge_ns + self.debounce_ns - monotonic_ns()
+        self._confirm_timer = self.state.call_later(max(0, delay) / 1e9, self._confirm)
+
+    def _confirm(self) -> None:
+        """Seit `debounce_ms` keine Flanke: Pegel übernehmen"""
+        self._confirm_timer = None
+        changed_ns = self._first_edge_ns
+        self._first_edge_ns = None
+
+        level = GPIO.input(self.pin)
+        if level == self._level:
+            self.glitches += 1
+            return
+        self._level = level
+
+        if level:
+            # Hörer aufgelegt
+            if self.on_hook:
+                return
+            if self.flash_enabled():
+                # Auflegen erst melden, wenn der Hörer nicht innerhalb von flash_max_ms wieder abgehoben wird
+                self._released_ns = changed_ns
+                delay = changed_ns + self.flash_max_ns - monotonic_ns()
+                self._flash_timer = self.state.call_later(max(0, delay) / 1e9, self._released)
+            else:
+                self._report(self.ON_HOOK, changed_ns)
+            return
+
+        # Hörer abgehoben
+        if self._flash_timer is not None:
+            self._flash_timer.cancel()
+            self._flash_timer = None
+            duration_ns = changed_ns - self._released_ns
+            if duration_ns < self.flash_min_ns:
+                log.debug("Gabel {:.0f}ms unterbrochen, ignoriere.", duration_ns / 1e6)
+                self.glitches += 1
+                return
+            log.debug("Flash erkannt ({:.0f}ms aufgelegt).", duration_ns / 1e6)
+            self.flashes += 1
+            self._report(self.FLASH, changed_ns)
+            return
+
+        if self.on_hook:
+            self._report(self.OFF_HOOK, changed_ns)
+
+    def _released(self) -> None:
+        """Timer: Hörer liegt länger als flash_max_ms auf"""
+        self._flash_timer = None
+        self._report(self.ON_HOOK, self._released_ns)
+
+    def _report(self, event: str, changed_ns: int) -> None:
+        if event != self.FLASH:
+            self.on_hook = event == self.ON_HOOK
+        self.last_latency_ns = monotonic_ns() - changed_ns
+        self.on_event(event)
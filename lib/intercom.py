@@ -0,0 +1,575 @@
+import json
+import socket
+import struct
+from asyncio import AbstractEventLoop, TimerHandle
+from os import read, set_blocking, urandom, write
+from subprocess import Popen, PIPE, DEVNULL
+from time import monotonic, perf_counter
+
+from lib.eventlog import get_logger
+from lib.metrics import PhoneMetrics
+
+log = get_logger('intercom')
+
+RTP_VERSION = 2
+RTP_PAYLOAD_TYPE = 96  # Dynamisch: L16 mono mit `rate` Hz (RFC 3551), Netzwerk-Byte-Reihenfolge
+RTP_HEADER = struct.Struct('!BBHII')
+
+
+class Peer:
+    """Anderes Telefon im LAN, bekannt aus seiner Ankündigung oder Einladung"""
+
+    node: str  # Zufällige Kennung der Instanz (unterscheidet Telefone mit gleicher Adresse)
+    name: str
+    extension: str
+    address: tuple[str, int]  # Verbindungsaufbau (Absender der Ankündigung)
+    seen: float  # Zuletzt gehört (monotonic)
+    lifetime: float  # Gilt ohne neue Ankündigung so lange
+
+    def __init__(self, node: str, name: str, extension: str, address: tuple[str, int], lifetime: float):
+        self.node = node
+        self.name = name
+        self.extension = extension
+        self.address = address
+        self.lifetime = lifetime
+        self.seen = monotonic()
+
+    def expired(self, now: float) -> bool:
+        return now - self.seen > self.lifetime
+
+    def describe(self) -> dict:
+        return {
+            'name': self.name, 'extension': self.extension, 'host': self.address[0], 'port': self.address[1],
+            'age': round(monotonic() - self.seen, 1)
+        }
+
+
+class IntercomCall:
+    """Interner Anruf: Verbindungsaufbau per UDP, danach Audio per RTP direkt zwischen den Telefonen"""
+
+    id: str
+    direction: str  # "in" oder "out"
+    peer: Peer
+    connected: bool = False
+    remote_rtp: tuple[str, int] | None = None
+
+    # Audio: RTP-Socket und Aufnahme/Wiedergabe über die Hörer-Soundkarte
+    rtp: socket.socket
+    capture: Popen | None = None
+    playback: Popen | None = None
+    buffer: bytearray
+    ssrc: int
+    sequence: int = 0
+    timestamp: int = 0
+    last_sequence: int | None = None
+    last_packet: float = 0  # Zuletzt empfangenes RTP-Paket (monotonic)
+
+    # Messwerte
+    started: float  # Einladung gesendet bzw. empfangen (perf_counter)
+    setup_seconds: float | None = None  # Einladung bis Gegenstelle klingelt
+    audio_seconds: float | None = None  # Verbunden bis erstes RTP-Paket empfangen
+    connected_at: float | None = None
+    packets_sent: int = 0
+    packets_received: int = 0
+    packets_lost: int = 0
+    frames_dropped: int = 0  # Wiedergabe kommt nicht hinterher: verworfen statt Latenz aufzubauen
+
+    timer: TimerHandle | None = None  # Klingeln begrenzen bzw. Gegenstelle im Gespräch überwachen
+
+    def __init__(self, call_id: str, direction: str, peer: Peer, rtp: socket.socket):
+        self.id = call_id
+        self.direction = direction
+        self.peer = peer
+        self.rtp = rtp
+        self.buffer = bytearray()
+        self.ssrc = int.from_bytes(urandom(4))
+        self.sequence = int.from_bytes(urandom(2))
+        self.timestamp = int.from_bytes(urandom(4))
+        self.started = perf_counter()
+
+
+class Intercom:
+    """
+    Gegensprechanlage im LAN, ohne SIP-Server: Telefone kündigen sich per Multicast an (Name und interne
+    Durchwahl) und rufen sich direkt an. Verbindungsaufbau mit wenigen JSON-Nachrichten per UDP
+    (invite, ringing, answer, ack, bye; wiederholt, bis die Gegenstelle antwortet), danach L16-Audio in
+    20-ms-Paketen per RTP direkt zwischen den Telefonen, aufgenommen und abgespielt mit arecord/aplay.
+    Läuft vollständig in der Event-Loop (Sockets und Pipes per add_reader, keine Threads).
+    Schnittstelle wie Linphone: `calls`, call/answer/hangup und die Callbacks on_incoming_call, on_connected,
+    on_hang_up (Anruf-IDs sind hier Zeichenketten).
+    """
+
+    RETRANSMIT: float = 0.2  # Nachricht wiederholen, bis die Gegenstelle antwortet
+    RETRIES: int = 10
+    RTP_TIMEOUT: float = 5  # Gespräch beenden, wenn so lange kein Audio von der Gegenstelle kommt
+    FRAME_MS: int = 20
+
+    loop: AbstractEventLoop
+    name: str
+    extension: str
+    node: str
+
+    # Konfiguration
+    group: tuple[str, int]  # Multicast-Gruppe und Port der Ankündigungen
+    port: int  # Verbindungsaufbau (0 = beliebig, wird mit der Ankündigung bekannt)
+    interface: str  # Adresse der Schnittstelle, leer = Standardroute
+    announce_interval: float
+    rate: int
+    rtp_port: int
+    ring_timeout: float
+    device: str  # ALSA-Gerät für Aufnahme und Wiedergabe (Hörer)
+    capture: list[str] | None = None  # Aufnahmebefehl (Standard: arecord), gibt Rohdaten S16_BE mono aus
+    playback: list[str] | None = None  # Wiedergabebefehl (Standard: aplay), liest Rohdaten S16_BE mono
+
+    on_incoming_call: callable  # (Durchwahl, Anruf-ID)
+    on_connected: callable  # (Anruf-ID)
+    on_hang_up: callable  # (Anruf-ID)
+    metrics: PhoneMetrics | None = None
+
+    # Zustand
+    peers: dict[str, Peer]  # Durchwahl -> Telefon
+    calls: dict[str, IntercomCall]  # Laufende Anrufe (klingelnd oder verbunden)
+    wakeups: int = 0  # Empfangene Nachrichten und Pakete
+    _sock: socket.socket | None = None  # Verbindungsaufbau, sendet auch die Ankündigungen
+    _group_sock: socket.socket | None = None  # Empfängt Ankündigungen
+    _pending: dict[str, TimerHandle]  # Anruf-ID -> Wiederholung der letzten Nachricht
+    _announce_timer: TimerHandle | None = None
+    _next_call: int = 0
+
+    def __init__(
+            self,
+            loop: AbstractEventLoop, name: str, extension: str,
+            on_incoming_call: callable, on_connected: callable, on_hang_up: callable,
+            group: str = "239.255.42.42", group_port: int = 5071, port: int = 5070, interface: str = "",
+            announce_interval: float = 30, rate: int = 16000, rtp_port: int = 0, ring_timeout: float = 60,
+            device: str = "default", metrics: PhoneMetrics | None = None
+    ):
+        self.loop = loop
+        self.name = name
+        self.extension = extension
+        self.node = urandom(4).hex()
+        self.on_incoming_call = on_incoming_call
+        self.on_connected = on_connected
+        self.on_hang_up = on_hang_up
+        self.group = (group, group_port)
+        self.port = port
+        self.interface = interface
+        self.announce_interval = announce_interval
+        self.rate = rate
+        self.rtp_port = rtp_port
+        self.ring_timeout = ring_timeout
+        self.device = device
+        self.metrics = metrics
+        self.peers = {}
+        self.calls = {}
+        self._pending = {}
+
+    @property
+    def available(self) -> bool:
+        return self._sock is not None
+
+    @property
+    def frame_bytes(self) -> int:
+        return self.rate * self.FRAME_MS // 1000 * 2
+
+    def start(self) -> None:
+        """Sockets öffnen, andere Telefone abfragen und sich ankündigen (danach alle `announce_interval` Sekunden)"""
+        interface = socket.inet_aton(self.interface or "0.0.0.0")
+        try:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)  # Nur im LAN
+            self._sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, interface)
+            self._sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)  # Mehrere Telefone je Rechner
+            self._sock.bind((self.interface, self.port))
+            self._sock.setblocking(False)
+
+            # Mehrere Telefone (auch in einem Prozess) empfangen die Ankündigungen auf demselben Port
+            self._group_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._group_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._group_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            self._group_sock.bind(("", self.group[1]))
+            self._group_sock.setsockopt(
+                socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, socket.inet_aton(self.group[0]) + interface
+            )
+            self._group_sock.setblocking(False)
+        except OSError as e:
+            log.warning("Gegensprechanlage nicht verfügbar: {}", e)
+            self._close_sockets()
+            return
+
+        self.loop.add_reader(self._sock.fileno(), self._read, self._sock)
+        self.loop.add_reader(self._group_sock.fileno(), self._read, self._group_sock)
+        log.info("Gegensprechanlage: Durchwahl {} auf Port {}", self.extension, self._sock.getsockname()[1])
+        self._send_group({'type': 'query'})
+        self._announce()
+
+    def close(self) -> None:
+        """Laufende Anrufe beenden, Abmeldung senden, Sockets schließen"""
+        self.hangup_all()
+        for timer in (self._announce_timer, *self._pending.values()):
+            if timer is not None:
+                timer.cancel()
+        self._pending.clear()
+        if self._sock is not None:
+            self._send_group({'type': 'leave'})
+            self.loop.remove_reader(self._sock.fileno())
+            self.loop.remove_reader(self._group_sock.fileno())
+        self._close_sockets()
+
+    def _close_sockets(self) -> None:
+        for sock in (self._sock, self._group_sock):
+            if sock is not None:
+                sock.close()
+        self._sock = None
+        self._group_sock = None
+
+    # Telefone im LAN
+
+    def find(self, extension: str) -> Peer | None:
+        """Telefon zu einer internen Durchwahl, Einträge ohne aktuelle Ankündigung verfallen"""
+        peer = self.peers.get(extension)
+        if peer is not None and peer.expired(monotonic()):
+            log.info("Gegensprechanlage: {} ({}) nicht mehr erreichbar", peer.name, peer.extension)
+            del self.peers[extension]
+            return None
+        return peer
+
+    def current_peers(self) -> list[Peer]:
+        now = monotonic()
+        for extension in [extension for extension, peer in self.peers.items() if peer.expired(now)]:
+            del self.peers[extension]
+        return sorted(self.peers.values(), key=lambda peer: peer.extension)
+
+    def pids(self) -> list[int]:
+        """Laufende Audioprozesse (Aufnahme und Wiedergabe) aller Gespräche"""
+        return [
+            process.pid for call in self.calls.values() for process in (call.capture, call.playback)
+            if process is not None and process.poll() is None
+        ]
+
+    def describe(self) -> dict:
+        return {
+            'name': self.name, 'extension': self.extension, 'available': self.available,
+            'peers': [peer.describe() for peer in self.current_peers()],
+            'calls': [
+                {'id': call.id, 'direction': call.direction, 'extension': call.peer.extension,
+                 'connected': call.connected, 'sent': call.packets_sent, 'received': call.packets_received,
+                 'lost': call.packets_lost, 'dropped': call.frames_dropped}
+                for call in self.calls.values()
+            ],
+        }
+
+    def _announce(self) -> None:
+        """Timer: Ankündigung senden (einzige periodische Aufwachquelle, nur bei aktivierter Gegensprechanlage)"""
+        self._send_group({'type': 'announce'})
+        self._announce_timer = self.loop.call_later(self.announce_interval, self._announce)
+
+    def _send_group(self, message: dict) -> None:
+        self._send({
+            **message, 'node': self.node, 'name': self.name, 'ext': self.extension,
+            'interval': self.announce_interval
+        }, self.group)
+
+    def _learn(self, message: dict, address: tuple[str, int]) -> Peer:
+        """Telefon aus Ankündigung oder Einladung eintragen bzw. auffrischen"""
+        extension = str(message['ext'])
+        peer = self.peers.get(extension)
+        if peer is None or peer.node != message['node'] or peer.address != address:
+            if extension == self.extension:
+                log.warning("Gegensprechanlage: {} verwendet ebenfalls die Durchwahl {}", message['name'], extension)
+            elif peer is not None and peer.node != message['node'] and not peer.expired(monotonic()):
+                log.warning(
+                    "Gegensprechanlage: Durchwahl {} doppelt vergeben ({}, {})", extension, peer.name, message['name']
+                )
+            else:
+                log.info("Gegensprechanlage: {} erreichbar unter {}", message['name'], extension)
+            peer = Peer(message['node'], message['name'], extension, address, 3 * float(message.get('interval', 30)))
+            self.peers[extension] = peer
+        peer.seen = monotonic()
+        return peer
+
+    # Nachrichten
+
+    def _send(self, message: dict, address: tuple[str, int]) -> None:
+        if self._sock is None:
+            return
+        try:
+            self._sock.sendto(json.dumps(message, separators=(',', ':')).encode('utf-8'), address)
+        except OSError as e:
+            log.warning("Gegensprechanlage: Kann nicht an {} senden: {}", address[0], e)
+
+    def _send_reliably(self, call_id: str, message: dict, address: tuple[str, int], tries: int = RETRIES) -> None:
+        """Nachricht senden und wiederholen, bis eine Antwort zu diesem Anruf eintrifft; sonst Anruf beenden"""
+        self._send(message, address)
+        if tries > 1:
+            self._pending[call_id] = self.loop.call_later(
+                self.RETRANSMIT, self._send_reliably, call_id, message, address, tries - 1
+            )
+            return
+
+        self._pending.pop(call_id, None)
+        if call_id in self.calls:
+            log.warning("Gegensprechanlage: {} antwortet nicht", self.calls[call_id].peer.name)
+            self._end(call_id)
+
+    def _read(self, sock: socket.socket) -> None:
+        while True:
+            try:
+                data, address = sock.recvfrom(2048)
+            except BlockingIOError:
+                return
+            except OSError as e:
+                log.debug("Gegensprechanlage: Empfang fehlgeschlagen: {}", e)
+                return
+            self.wakeups += 1
+            try:
+                message = json.loads(data)
+                self._handle(message, address)
+            except (ValueError, KeyError, TypeError) as e:
+                log.debug("Gegensprechanlage: Ungültige Nachricht von {}: {!r}", address[0], e)
+
+    def _handle(self, message: dict, address: tuple[str, int]) -> None:
+        kind = message['type']
+
+        # Ankündigungen (Multicast)
+        if kind in ('announce', 'query', 'leave'):
+            if message['node'] == self.node:
+                return  # Eigene Nachricht (Multicast-Loopback)
+            if kind == 'leave':
+                peer = self.peers.get(str(message['ext']))
+                if peer is not None and peer.node == message['node']:
+                    log.info("Gegensprechanlage: {} abgemeldet", peer.name)
+                    del self.peers[peer.extension]
+                return
+            self._learn(message, address)
+            if kind == 'query':
+                self._send_group({'type': 'announce'})
+            return
+
+        # Verbindungsaufbau (Unicast): jede Nachricht zu einem Anruf beendet dessen Wiederholung
+        call_id = str(message['call'])
+        pending = self._pending.pop(call_id, None)
+        if pending is not None:
+            pending.cancel()
+        call = self.calls.get(call_id)
+
+        match kind:
+            case 'invite':
+                if call is None:
+                    call = self._new_call(call_id, 'in', self._learn(message, address))
+                    if call is None:
+                        self._send({'type': 'bye', 'call': call_id}, address)
+                        return
+                    call.remote_rtp = (address[0], int(message['rtp']))
+                    call.timer = self.loop.call_later(self.ring_timeout, self.hangup, call_id)
+                    self._send({'type': 'ringing', 'call': call_id}, address)
+                    self.on_incoming_call(call.peer.extension, call_id)
+                elif not call.connected:
+                    self._send({'type': 'ringing', 'call': call_id}, address)  # Wiederholte Einladung
+
+            case 'ringing':
+                if call is not None and call.setup_seconds is None:
+                    call.setup_seconds = perf_counter() - call.started
+                    if self.metrics is not None:
+                        self.metrics.intercom_setup_seconds.observe(call.setup_seconds)
+                    log.debug("Gegensprechanlage: {} klingelt nach {:.1f}ms", call.peer.name, call.setup_seconds * 1000)
+
+            case 'answer':
+                self._send({'type': 'ack', 'call': call_id}, address)
+                if call is not None and not call.connected:
+                    call.remote_rtp = (address[0], int(message['rtp']))
+                    self._connect(call)
+
+            case 'bye':
+                self._send({'type': 'ack', 'call': call_id}, address)
+                if call is not None:
+                    self._end(call_id)
+
+    # Anrufe (Schnittstelle wie Linphone)
+
+    def _new_call(self, call_id: str, direction: str, peer: Peer) -> IntercomCall | None:
+        rtp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            rtp.bind((self.interface, self.rtp_port))
+        except OSError as e:
+            log.warning("Gegensprechanlage: Kein RTP-Port verfügbar: {}", e)
+            rtp.close()
+            return None
+        rtp.setblocking(False)
+        call = IntercomCall(call_id, direction, peer, rtp)
+        self.calls[call_id] = call
+        return call
+
+    def call(self, extension: str) -> str:
+        """Telefon mit dieser Durchwahl anrufen, liefert die Anruf-ID (Ende des Anrufs über on_hang_up)"""
+        peer = self.find(extension)
+        self._next_call += 1
+        call_id = f"{self.node}-{self._next_call}"
+        call = self._new_call(call_id, 'out', peer) if peer is not None else None
+        if call is None:
+            self.loop.call_soon(self.on_hang_up, call_id)
+            return call_id
+
+        log.info("Gegensprechanlage: Rufe {} ({}) an", peer.name, extension)
+        call.timer = self.loop.call_later(self.ring_timeout, self.hangup, call_id)
+        self._send_reliably(call_id, {
+            'type': 'invite', 'call': call_id, 'node': self.node, 'name': self.name, 'ext': self.extension,
+            'interval': self.announce_interval, 'rtp': call.rtp.getsockname()[1]
+        }, peer.address)
+        return call_id
+
+    def answer(self, call_id: str | None = None) -> None:
+        """Klingelnden Anruf annehmen"""
+        call = self.calls.get(call_id) if call_id is not None else next(
+            (call for call in self.calls.values() if call.direction == 'in' and not call.connected), None
+        )
+        if call is None or call.connected:
+            return
+        self._send_reliably(call.id, {'type': 'answer', 'call': call.id, 'rtp': call.rtp.getsockname()[1]}, call.peer.address)
+        self._connect(call)
+
+    def hangup(self, call_id: str | None = None) -> None:
+        """Angegebenen bzw. zuletzt begonnenen Anruf beenden"""
+        if call_id is None:
+            call_id = next(reversed(self.calls), None)
+        call = self.calls.get(call_id)
+        if call is None:
+            return
+        self._send_reliably(call_id, {'type': 'bye', 'call': call_id}, call.peer.address, tries=3)
+        self._end(call_id)
+
+    def hangup_all(self) -> None:
+        for call_id in list(self.calls):
+            self.hangup(call_id)
+
+    def _connect(self, call: IntercomCall) -> None:
+        """Gespräch verbunden: Aufnahme und Wiedergabe starten, RTP senden und empfangen"""
+        call.connected = True
+        call.connected_at = perf_counter()
+        call.last_packet = monotonic()
+        if call.timer is not None:
+            call.timer.cancel()
+        call.timer = self.loop.call_later(self.RTP_TIMEOUT, self._check_audio, call.id)
+
+        raw = ['-t', 'raw', '-f', 'S16_BE', '-r', str(self.rate), '-c', '1']
+        try:
+            call.playback = Popen(
+                self.playback or ['aplay', '-q', '-D', self.device, *raw, '--buffer-time=80000'],
+                stdin=PIPE, stderr=DEVNULL
+            )
+            call.capture = Popen(
+                self.capture or ['arecord', '-q', '-D', self.device, *raw, f'--period-time={self.FRAME_MS * 1000}'],
+                stdout=PIPE, stderr=DEVNULL
+            )
+        except OSError as e:
+            log.warning("Gegensprechanlage: Kann Audio nicht starten: {}", e)
+        else:
+            # Nicht blockieren: Wiedergabe, die nicht hinterherkommt, verwirft Pakete statt Latenz aufzubauen
+            set_blocking(call.playback.stdin.fileno(), False)
+            set_blocking(call.capture.stdout.fileno(), False)
+            self.loop.add_reader(call.capture.stdout.fileno(), self._capture, call)
+        self.loop.add_reader(call.rtp.fileno(), self._receive, call)
+
+        log.info("Gegensprechanlage: Verbunden mit {}", call.peer.name)
+        self.on_connected(call.id)
+
+    def _capture(self, call: IntercomCall) -> None:
+        """Aufnahme lesen und in 20-ms-Paketen an die Gegenstelle senden"""
+        try:
+            data = read(call.capture.stdout.fileno(), 65536)
+        except BlockingIOError:
+            return
+        if not data:
+            self.loop.remove_reader(call.capture.stdout.fileno())  # Aufnahme beendet (z.B. Soundkarte entfernt)
+            return
+        self.wakeups += 1
+        call.buffer += data
+        frame = self.frame_bytes
+        while len(call.buffer) >= frame:
+            header = RTP_HEADER.pack(
+                RTP_VERSION << 6, (0x80 if call.packets_sent == 0 else 0) | RTP_PAYLOAD_TYPE,
+                call.sequence & 0xFFFF, call.timestamp & 0xFFFFFFFF, call.ssrc
+            )
+            try:
+                call.rtp.sendto(header + call.buffer[:frame], call.remote_rtp)
+                call.packets_sent += 1
+            except OSError:
+                pass
+            del call.buffer[:frame]
+            call.sequence += 1
+            call.timestamp += frame // 2
+
+    def _receive(self, call: IntercomCall) -> None:
+        """RTP-Pakete der Gegenstelle an die Wiedergabe übergeben (verspätete Pakete verwerfen)"""
+        while True:
+            try:
+                data, address = call.rtp.recvfrom(2048)
+            except BlockingIOError:
+                return
+            except OSError:
+                return
+            self.wakeups += 1
+            if address[0] != call.remote_rtp[0] or len(data) <= RTP_HEADER.size:
+                continue
+            first, payload_type, sequence, _, _ = RTP_HEADER.unpack_from(data)
+            if first >> 6 != RTP_VERSION or payload_type & 0x7F != RTP_PAYLOAD_TYPE:
+                continue
+
+            if call.last_sequence is not None:
+                gap = (sequence - call.last_sequence) & 0xFFFF
+                if gap == 0 or gap > 0x8000:
+                    continue  # Doppelt oder verspätet
+                call.packets_lost += gap - 1
+            elif call.connected_at is not None:
+                call.audio_seconds = perf_counter() - call.connected_at
+            call.last_sequence = sequence
+            call.last_packet = monotonic()
+            call.packets_received += 1
+
+            if call.playback is None or call.playback.poll() is not None:
+                continue
+            try:
+                # Ein Paket ist kleiner als PIPE_BUF: wird ganz oder gar nicht geschrieben
+                write(call.playback.stdin.fileno(), data[RTP_HEADER.size:])
+            except BlockingIOError:
+                call.frames_dropped += 1
+            except OSError:
+                pass
+
+    def _check_audio(self, call_id: str) -> None:
+        """Timer im Gespräch: ohne Audio der Gegenstelle (abgestürzt, Netz weg) das Gespräch beenden"""
+        call = self.calls.get(call_id)
+        if call is None:
+            return
+        silent = monotonic() - call.last_packet
+        if silent > self.RTP_TIMEOUT:
+            log.warning("Gegensprechanlage: Kein Audio von {} seit {:.0f}s, beende Gespräch", call.peer.name, silent)
+            self.hangup(call_id)
+            return
+        call.timer = self.loop.call_later(self.RTP_TIMEOUT - silent, self._check_audio, call_id)
+
+    def _end(self, call_id: str) -> None:
+        """Anruf lokal beenden: Audio stoppen, Sockets schließen, Ende melden (wie linphonec asynchron)"""
+        call = self.calls.pop(call_id)
+        if call.timer is not None:
+            call.timer.cancel()
+        if call.capture is not None:
+            self.loop.remove_reader(call.capture.stdout.fileno())
+            call.capture.kill()
+            call.capture.wait()
+            call.capture.stdout.close()
+        if call.playback is not None:
+            call.playback.kill()
+            call.playback.wait()
+            try:
+                call.playback.stdin.close()
+            except OSError:
+                pass
+        self.loop.remove_reader(call.rtp.fileno())
+        call.rtp.close()
+        if call.connected:
+            log.info(
+                "Gegensprechanlage: Gespräch mit {} beendet ({} Pakete gesendet, {} empfangen, {} verloren)",
+                call.peer.name, call.packets_sent, call.packets_received, call.packets_lost
+            )
+        self.loop.call_soon(self.on_hang_up, call_id)
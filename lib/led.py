@@ -1,18 +1,41 @@
-from RPi import GPIO
+from pathlib import Path
+
+from lib.effects import Ramp
+from lib.eventlog import get_logger
+from lib.pwm import PwmOutput, create_pwm
+
+log = get_logger('led')
+
 
 class Led:
+    """
+    Nacht- und Aufwachlicht. Nutzt Hardware-PWM (GPIO 12/13/18/19 mit aktiviertem PWM-Overlay),
+    sonst Software-PWM von RPi.GPIO.
+    """
+
+    FREQUENCY: int = 8000
+    BLINK_FREQUENCY: int = 1
+    INDICATOR_FREQUENCY: float = 0.5  # Nachricht wartet: kurzes Aufleuchten alle zwei Sekunden
+    INDICATOR_DUTY: int = 10
 
     verbose: bool
 
     # Nachtlicht
     night_light_pin: int | None = None
     night_light_duty: int
-    night_light_pwm: GPIO.PWM | None = None
+    night_light: PwmOutput | None = None
 
     # Aufwachlicht
     wake_light_pin: int | None = None
     wake_light_duty: int
-    wake_light_pwm: GPIO.PWM | None = None
+    wake_light: PwmOutput | None = None
+
+    # Laufende Helligkeitsverläufe
+    ramps: list[Ramp]
+
+    # Anzeige "Nachricht wartet" über das Aufwachlicht, solange dieses sonst aus ist
+    message_waiting: bool = False
+    _indicator: bool = False
 
     def __init__(
             self,
@@ -20,102 +43,120 @@ class Led:
             night_light_duty: int,
             wake_light_pin: int,
             wake_light_duty: int,
-            verbose: bool
+            verbose: bool,
+            pwm_backend: str = "auto",
+            pwm_root: Path = Path("/sys/class/pwm")
     ):
         self.verbose = verbose
+        self.ramps = []
 
         # Nachtlicht einrichten
         if night_light_pin > 0:
-            if self.verbose:
-                print(f"Initialisiere Nachtlicht mit Duty {night_light_duty}% an Pin {night_light_pin}.")
+            log.debug("Initialisiere Nachtlicht mit Duty {}% an Pin {}.", night_light_duty, night_light_pin)
 
             self.night_light_pin = night_light_pin
             self.night_light_duty = night_light_duty
-            GPIO.setup(night_light_pin, GPIO.OUT)
-            GPIO.output(night_light_pin, False)
+            self.night_light = create_pwm(night_light_pin, self.FREQUENCY, root=pwm_root, backend=pwm_backend)
+            self.night_light.off()
 
         # Aufwachlicht einrichten
-        if wake_light_pin > 0:
-            if self.verbose:
-                print(f"Initialisiere Aufwachlicht mit Duty {wake_light_duty}% an Pin {wake_light_pin}.")
+        if wake_light_pin is not None and wake_light_pin > 0:
+            log.debug("Initialisiere Aufwachlicht mit Duty {}% an Pin {}.", wake_light_duty, wake_light_pin)
 
             self.wake_light_pin = wake_light_pin
             self.wake_light_duty = wake_light_duty
-            GPIO.setup(wake_light_pin, GPIO.OUT)
-            GPIO.output(wake_light_pin, False)
+            self.wake_light = create_pwm(wake_light_pin, self.FREQUENCY, root=pwm_root, backend=pwm_backend)
+            self.wake_light.off()
+
+    def _stop_ramps(self, output: PwmOutput) -> None:
+        for ramp in [ramp for ramp in self.ramps if ramp.output is output]:
+            ramp.cancel()
+            self.ramps.remove(ramp)
 
     def night_light_on(self, duty_cycle: int | None = None):
-        if self.night_light_pin is None:
+        if self.night_light is None:
             return
 
-        if self.night_light_pwm is not None:
-            self.night_light_pwm.stop()
-            self.night_light_pwm = None
-
-        print(self.night_light_pin, self.night_light_pwm, self.verbose)
-        if self.verbose:
-            print(f"Schalte Nachtlicht mit Duty {duty_cycle or self.night_light_duty}% ein.")
-
-        if duty_cycle is not None or self.night_light_duty < 100:
-            self.night_light_pwm = GPIO.PWM(self.night_light_pin, frequency=8000)
-            self.night_light_pwm.start(duty_cycle or self.night_light_duty)
-        else:
-            GPIO.output(self.night_light_pin, True)
+        log.debug("Schalte Nachtlicht mit Duty {}% ein.", duty_cycle or self.night_light_duty)
+        self._stop_ramps(self.night_light)
+        self.night_light.set(duty_cycle or self.night_light_duty, self.FREQUENCY)
 
     def night_light_off(self):
-        if self.night_light_pin is None:
+        if self.night_light is None:
             return
 
-        if self.verbose:
-            print("Schalte Nachtlicht ab.")
-
-        if self.night_light_pwm is not None:
-            self.night_light_pwm.stop()
-            self.night_light_pwm = None
-
-        GPIO.output(self.night_light_pin, False)
+        log.debug("Schalte Nachtlicht ab.")
+        self._stop_ramps(self.night_light)
+        self.night_light.off()
 
     def wake_light_on(self, duty_cycle: int | None = None):
-        if self.wake_light_pin is None:
+        if self.wake_light is None:
             return
 
-        if self.wake_light_pwm is not None:
-            self.wake_light_pwm.stop()
-            self.wake_light_pwm = None
-
-        if self.verbose:
-            print(f"Schalte Aufwachlicht mit Duty {duty_cycle or self.night_light_duty}% ein.")
-
-        if duty_cycle is not None or self.wake_light_duty < 100:
-            self.wake_light_pwm = GPIO.PWM(self.wake_light_pin, frequency=8000)
-            self.wake_light_pwm.start(duty_cycle or self.wake_light_duty)
-        else:
-            GPIO.output(self.wake_light_pin, True)
+        log.debug("Schalte Aufwachlicht mit Duty {}% ein.", duty_cycle or self.wake_light_duty)
+        self._stop_ramps(self.wake_light)
+        self._indicator = False
+        self.wake_light.set(duty_cycle or self.wake_light_duty, self.FREQUENCY)
 
     def wake_light_blink(self):
         """Aufwachlicht Zeitweise als Signallicht einschalten"""
-        if self.wake_light_pin is None:
+        if self.wake_light is None:
             return
 
-        if self.wake_light_pwm is not None:
-            self.wake_light_pwm.stop()
-            self.wake_light_pwm = None
-
-        if self.verbose:
-            print(f"Schalte Aufwachlicht als Signalleuchte ein.")
-
-        self.wake_light_pwm = GPIO.PWM(self.wake_light_pin, frequency=1)
-        self.wake_light_pwm.start(50)
+        log.debug("Schalte Aufwachlicht als Signalleuchte ein.")
+        self._stop_ramps(self.wake_light)
+        self._indicator = False
+        self.wake_light.set(50, self.BLINK_FREQUENCY)
 
     def wake_light_off(self):
-        if self.wake_light_pin is None:
+        if self.wake_light is None:
             return
 
-        if self.verbose:
-            print("Schalte Aufwachlicht ab.")
+        self._stop_ramps(self.wake_light)
+        if self.message_waiting:
+            log.debug("Schalte Aufwachlicht auf Anzeige für wartende Nachrichten.")
+            self._indicator = True
+            self.wake_light.set(self.INDICATOR_DUTY, self.INDICATOR_FREQUENCY)
+            return
 
-        if self.wake_light_pwm is not None:
-            self.wake_light_pwm.stop()
-            self.wake_light_pwm = None
+        log.debug("Schalte Aufwachlicht ab.")
+        self._indicator = False
+        self.wake_light.off()
 
-        GPIO.output(self.wake_light_pin, False)
+    def set_message_waiting(self, waiting: bool):
+        """Anzeige für wartende Nachrichten; ein eingeschaltetes Aufwachlicht hat Vorrang"""
+        if waiting == self.message_waiting:
+            return
+        self.message_waiting = waiting
+        if self.wake_light is not None and (self._indicator or self.wake_light.duty == 0):
+            self.wake_light_off()
+
+    def sunrise(self, call_later: callable, duration: float, progress: float = 0) -> None:
+        """
+        Sonnenaufgang: Aufwachlicht von aus auf wake_light_duty und Nachtlicht auf volle Helligkeit,
+        gleichmäßig über `duration` Sekunden (Schritte über `call_later` der Event-Loop).
+        `progress` (0..1): bereits erreichter Anteil, z.B. nach Neustart mitten im Sonnenaufgang
+        """
+        log.debug("Starte Sonnenaufgang über {} Minuten.", round(duration / 60))
+
+        if self.wake_light is not None:
+            self._stop_ramps(self.wake_light)
+            self._indicator = False
+            if self.wake_light.frequency != self.FREQUENCY or progress > 0:
+                # Fortsetzen auf der Gammakurve des ununterbrochenen Verlaufs, nicht linear im Duty
+                duty = Ramp(call_later, self.wake_light, duration, self.wake_light_duty).duty(progress)
+                self.wake_light.set(duty, self.FREQUENCY)
+            self._ramp(call_later, self.wake_light, duration, self.wake_light_duty)
+
+        if self.night_light is not None:
+            self._stop_ramps(self.night_light)
+            if progress > 0:
+                ramp = Ramp(call_later, self.night_light, duration, 100, start_duty=self.night_light_duty)
+                self.night_light.set(ramp.duty(progress), self.FREQUENCY)
+            self._ramp(call_later, self.night_light, duration, 100)
+
+    def _ramp(self, call_later: callable, output: PwmOutput, duration: float, target_duty: float) -> None:
+        ramp = Ramp(call_later, output, duration, target_duty, start_duty=output.duty)
+        ramp.on_done = lambda: self.ramps.remove(ramp)
+        self.ramps.append(ramp)
+        ramp.start()
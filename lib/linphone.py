@@ -1,8 +1,11 @@
 from re import compile, Pattern
 from subprocess import Popen, PIPE, DEVNULL
-from time import sleep
 from threading import Thread
 
+from lib.eventlog import get_logger
+
+log = get_logger('linphone')
+
 
 class Linphone(Thread):
 
@@ -16,24 +19,32 @@ class Linphone(Thread):
     on_boot: callable
     on_incoming_call: callable
     on_hang_up: callable
+    on_exit: callable = None
+    on_connected: callable = None
+    on_soundcard: callable = None  # (Nummer, Name) je Zeile von `soundcard list`
     verbose: bool
 
     # Zustand
     call_active: bool = False
     line_received: bool = False
+    calls: list[int]  # IDs aller laufenden Anrufe (klingelnd, verbunden oder gehalten)
+    paused: set[int]  # Gehaltene Anrufe
 
     # Regex
-    re_call_incoming: Pattern = compile(r'Receiving new incoming call from .*sip:([*+\d]+)@.*, assigned id \d+')
-    re_call_connected: Pattern = compile(r'Call \d+.* connected')
-    re_call_terminated: Pattern = compile(r'Call \d+.* ended')
+    re_call_incoming: Pattern = compile(r'Receiving new incoming call from .*sip:([*+\d]+)@.*, assigned id (\d+)')
+    re_call_outgoing: Pattern = compile(r'Establishing call id to .*, assigned id (\d+)')
+    re_call_connected: Pattern = compile(r'Call (\d+).* connected')
+    re_call_terminated: Pattern = compile(r'Call (\d+).* ended')
+    re_soundcard: Pattern = compile(r'(\d+): (.+)')
 
     def __init__(
             self,
             hostname: str, username: str, password: str,
             on_boot: callable, on_incoming_call: callable, on_hang_up: callable,
-            verbose: bool
+            verbose: bool, on_exit: callable = None, on_connected: callable = None, on_soundcard: callable = None,
+            binary: str = "/usr/bin/linphonec", config_file: str = "", name: str = "linphone"
     ):
-        Thread.__init__(self)
+        Thread.__init__(self, name=name)
 
         # Konfiguration
         self._username = username
@@ -42,22 +53,24 @@ class Linphone(Thread):
         self.on_boot = on_boot
         self.on_incoming_call = on_incoming_call
         self.on_hang_up = on_hang_up
+        self.on_exit = on_exit
+        self.on_connected = on_connected
+        self.on_soundcard = on_soundcard
         self.verbose = verbose
+        self.calls = []
+        self.paused = set()
 
         # Starte linphonec und Thread zur Überwachung der Ausgabe
-        print("Starte linphonec.")
-        self.linphone = Popen("/usr/bin/linphonec", stdin=PIPE, stdout=PIPE, stderr=DEVNULL)
+        # Blockiert nicht: Registrierung und on_boot folgen im Thread, sobald linphonec die erste Zeile ausgibt
+        log.info("Starte linphonec.")
+        # Eigene linphonerc je Telefon (Soundkarte, SIP-Port), sonst ~/.linphonerc
+        cmd = [binary, '-c', config_file] if config_file != "" else [binary]
+        self.linphone = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=DEVNULL)
         self.start()
 
-        counter = 0
-        while self.is_running() and not self.line_received:
-            counter += 1
-            if self.verbose:
-                print(f"Warte auf linphonec... ({counter}00ms)", end='\r')
-            sleep(0.1)
-
-        if self.verbose:
-            print("linphonec gestartet, registriere Account.")
+    def _booted(self) -> None:
+        """Erste Ausgabe von linphonec: Account registrieren"""
+        log.debug("linphonec gestartet, registriere Account.")
         self._send_cmd(f"register sip:{self._username}@{self.hostname} {self.hostname} {self._password}")
         self.on_boot()
 
@@ -75,38 +88,62 @@ class Linphone(Thread):
                     .removeprefix('linphonec>').strip()
                     .removeprefix('linphonec>').strip())  # Präfix ist in seltenen Fällen doppelt vorhanden
 
-            if line != "":
+            if line != "" and not self.line_received:
                 self.line_received = True
+                self._booted()
 
             # Leere Zeilen oder sinnlose, nicht deaktivierbare Warnungen
             if line == '' or line.startswith("Warning: video is disabled"):
                 continue
 
-            if self.verbose:
-                print(f"<-- linphone: {line}")
+            log.debug("<-- linphone: {}", line)
 
             # Eingehender Anruf
             caller = self.re_call_incoming.match(line)
             if caller:
                 self.call_active = True
-                self.on_incoming_call(caller[1])
+                self.calls.append(int(caller[2]))
+                self.on_incoming_call(caller[1], int(caller[2]))
                 continue
 
-            # Verbindungsaufbau oder Verbindung hergestellt
-            if line.startswith('Establishing call id to') or self.re_call_connected.match(line):
+            # Verbindungsaufbau
+            outgoing = self.re_call_outgoing.match(line)
+            if outgoing:
                 self.call_active = True
+                self.calls.append(int(outgoing[1]))
                 continue
 
-            # Laufendes Gespräch beendet
-            if self.re_call_terminated.match(line):
-                self.call_active = False
-                self.on_hang_up()
+            # Verbindung hergestellt
+            connected = self.re_call_connected.match(line)
+            if connected:
+                self.call_active = True
+                if self.on_connected is not None:
+                    self.on_connected(int(connected[1]))
                 continue
 
-            if self.verbose:
-                print(f"--- linphone: Unbekannte Ausgabe, ignoriere: {line}")
+            # Gespräch beendet
+            terminated = self.re_call_terminated.match(line)
+            if terminated:
+                call_id = int(terminated[1])
+                if call_id in self.calls:
+                    self.calls.remove(call_id)
+                self.paused.discard(call_id)
+                self.call_active = len(self.calls) > 0
+                self.on_hang_up(call_id)
+                continue
 
-        print("linphonec wurde beendet!")
+            # Soundkarte (Ausgabe von `soundcard list`), z.B. "1: ALSA: USB Audio Device"
+            soundcard = self.re_soundcard.fullmatch(line)
+            if soundcard:
+                if self.on_soundcard is not None:
+                    self.on_soundcard(int(soundcard[1]), soundcard[2])
+                continue
+
+            log.debug("--- linphone: Unbekannte Ausgabe, ignoriere: {}", line)
+
+        log.warning("linphonec wurde beendet!")
+        if self.on_exit is not None:
+            self.on_exit()
 
     def terminate(self) -> None:
         self.linphone.terminate()
@@ -114,11 +151,10 @@ class Linphone(Thread):
 
     def _send_cmd(self, cmd: str) -> None:
         if not self.is_running():
-            print(f"Kann Befehl '{cmd}' nicht an linphonec senden: Client läuft nicht")
+            log.warning("Kann Befehl '{}' nicht an linphonec senden: Client läuft nicht", cmd)
             return
 
-        if self.verbose:
-            print(f"--> linphone: {cmd}")
+        log.debug("--> linphone: {}", cmd)
 
         self.linphone.stdin.write(f"{cmd}\n".encode('utf8'))
         self.linphone.stdin.flush()
@@ -128,11 +164,58 @@ class Linphone(Thread):
         self.call_active = True
         self._send_cmd(f"call sip:{number}@{self.hostname}")
 
-    def hangup(self) -> None:
-        """Aktuelles Gespräch beenden"""
+    def hangup(self, call_id: int | None = None) -> None:
+        """Aktuelles bzw. angegebenes Gespräch beenden"""
         if self.call_active:
-            self._send_cmd("terminate")
+            self._send_cmd("terminate" if call_id is None else f"terminate {call_id}")
 
-    def answer(self) -> None:
-        """Eingehenden Anruf annehmen"""
-        self._send_cmd("answer")
+    def hangup_all(self) -> None:
+        """Alle Gespräche beenden (auch gehaltene)"""
+        if self.call_active:
+            self._send_cmd("terminate all" if len(self.calls) > 1 else "terminate")
+
+    def answer(self, call_id: int | None = None) -> None:
+        """Eingehenden Anruf annehmen; ein laufendes Gespräch wird dabei gehalten"""
+        if call_id is None:
+            self._send_cmd("answer")
+            return
+        self._send_cmd(f"answer {call_id}")
+        self.paused.update(other for other in self.calls if other != call_id)
+
+    def answer_with_files(self, call_id: int | None, play_file: str, record_file: str) -> None:
+        """
+        Anruf mit Dateien statt Soundkarte annehmen (Anrufbeantworter): `play_file` (WAV, leer = Stille)
+        wird abgespielt, die Gegenseite nach `record_file` aufgezeichnet
+        """
+        self._send_cmd("soundcard use files")
+        if play_file != "":
+            self._send_cmd(f"play {play_file}")
+        self._send_cmd(f"record {record_file}")
+        self.answer(call_id)
+
+    def use_soundcard(self, index: int) -> None:
+        """Wieder Soundkarte statt Dateien verwenden (Nummer aus `soundcard list`)"""
+        self._send_cmd(f"soundcard use {index}")
+
+    def reload_soundcards(self) -> None:
+        """Soundkarten neu einlesen (nach Hotplug), die Liste folgt über `on_soundcard`"""
+        self._send_cmd("soundcard reload")
+        self._send_cmd("soundcard list")
+
+    def send_dtmf(self, digit: str) -> None:
+        """
+        Ziffer im laufenden Gespräch als DTMF senden: eine einzelne Ziffer als Eingabe sendet linphonec sofort,
+        per RFC 2833 oder SIP INFO je nach linphonerc (`[sip] use_rfc2833`, `use_info`)
+        """
+        self._send_cmd(digit)
+
+    def pause(self, call_id: int) -> None:
+        """Gespräch halten"""
+        self._send_cmd(f"pause {call_id}")
+        self.paused.add(call_id)
+
+    def resume(self, call_id: int) -> None:
+        """Gehaltenes Gespräch fortsetzen; ein anderes laufendes Gespräch wird dabei gehalten"""
+        self._send_cmd(f"resume {call_id}")
+        self.paused.update(other for other in self.calls if other != call_id)
+        self.paused.discard(call_id)
@@ -0,0 +1,380 @@
+import asyncio
+from bisect import bisect_left
+from os import getpid, listdir, replace, sysconf
+from pathlib import Path
+from threading import active_count
+from time import time
+
+from lib.eventlog import events, get_logger
+
+log = get_logger('metrics')
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if len(labels) == 0:
+        return ""
+    escaped = (
+        f'{key}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class Metric:
+    """Basisklasse: Name, Hilfetext, Typ und Werte je Label-Kombination"""
+
+    name: str
+    help: str
+    type: str
+    values: dict[tuple[tuple[str, str], ...], float]
+    getter: callable = None  # Wert erst beim Abruf ermitteln (kostet zur Laufzeit nichts)
+    const_labels: tuple[tuple[str, str], ...] = ()  # Feste Labels aller Werte, z.B. Name des Telefons
+
+    def __init__(self, name: str, help: str, getter: callable = None):
+        self.name = name
+        self.help = help
+        self.values = {}
+        self.getter = getter
+
+    def _samples(self) -> list[tuple[str, tuple, float]]:
+        if self.getter is not None:
+            value = self.getter()
+            if isinstance(value, dict):
+                # Getter liefert {Label-Wert: Wert}, z.B. Aufwachvorgänge je Quelle
+                return [(self.name, (*self.const_labels, ('source', key)), val) for key, val in value.items()]
+            return [(self.name, self.const_labels, value)]
+        return [(self.name, (*self.const_labels, *labels), value) for labels, value in self.values.items()]
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+    def render_samples(self) -> list[str]:
+        return [f"{name}{_format_labels(labels)} {value:g}" for name, labels, value in self._samples()]
+
+    def render(self) -> list[str]:
+        return self.header() + self.render_samples()
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        self.values[tuple(sorted(labels.items()))] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    buckets: tuple[float, ...]
+    _counts: dict[tuple, list[int]]
+    _sums: dict[tuple, float]
+
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...]):
+        super().__init__(name, help)
+        self.buckets = buckets
+        self._counts = {}
+        self._sums = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[key] = self._sums.get(key, 0) + value
+
+    def _samples(self) -> list[tuple[str, tuple, float]]:
+        samples = []
+        for labels, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), counts):
+                cumulative += count
+                le = "+Inf" if bound == float('inf') else f"{bound:g}"
+                samples.append((f"{self.name}_bucket", (*self.const_labels, *labels, ('le', le)), cumulative))
+            samples.append((f"{self.name}_sum", (*self.const_labels, *labels), self._sums[labels]))
+            samples.append((f"{self.name}_count", (*self.const_labels, *labels), cumulative))
+        return samples
+
+
+class Registry:
+    """Sammlung von Metriken, Ausgabe im Prometheus-Textformat"""
+
+    metrics: list[Metric]
+
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        # Gleichnamige Metriken mehrerer Telefone: HELP/TYPE nur einmal, Werte direkt darunter
+        groups: dict[str, list[Metric]] = {}
+        for metric in self.metrics:
+            groups.setdefault(metric.name, []).append(metric)
+
+        lines = []
+        for metrics in groups.values():
+            lines.extend(metrics[0].header())
+            for metric in metrics:
+                lines.extend(metric.render_samples())
+        return "\n".join(lines) + "\n"
+
+
+class ProcessStats:
+    """Prozesskennzahlen aus /proc (nur beim Abruf gelesen)"""
+
+    _clock_ticks: int = sysconf('SC_CLK_TCK')
+    _page_size: int = sysconf('SC_PAGE_SIZE')
+
+    @staticmethod
+    def _stat() -> list[str]:
+        with open('/proc/self/stat') as stat:
+            # Prozessname kann Leerzeichen enthalten, Felder erst nach der schließenden Klammer zählen
+            return stat.read().rsplit(')', 1)[1].split()
+
+    @classmethod
+    def cpu_seconds(cls) -> float:
+        fields = cls._stat()
+        return (int(fields[11]) + int(fields[12])) / cls._clock_ticks  # utime + stime
+
+    @classmethod
+    def rss_bytes(cls) -> int:
+        return int(cls._stat()[21]) * cls._page_size
+
+    @staticmethod
+    def threads() -> int:
+        return active_count()
+
+    @staticmethod
+    def os_threads() -> int:
+        return len(listdir('/proc/self/task'))
+
+    @staticmethod
+    def children() -> int:
+        """Anzahl direkter Kindprozesse (aplay, sox, linphonec, ...)"""
+        count = 0
+        for tid in listdir('/proc/self/task'):
+            try:
+                with open(f'/proc/self/task/{tid}/children') as children:
+                    count += len(children.read().split())
+            except OSError:
+                pass
+        return count
+
+    @staticmethod
+    def open_fds() -> int:
+        return len(listdir('/proc/self/fd'))
+
+    @classmethod
+    def thread_cpu_seconds(cls) -> dict[int, tuple[str, float]]:
+        """CPU-Zeit je Thread laut Kernel: Thread-ID -> (Name laut Kernel, Sekunden)"""
+        threads = {}
+        for tid in listdir('/proc/self/task'):
+            try:
+                with open(f'/proc/self/task/{tid}/stat') as stat:
+                    name, fields = stat.read().split(' (', 1)[1].rsplit(')', 1)
+            except OSError:
+                continue  # Thread inzwischen beendet
+            fields = fields.split()
+            threads[int(tid)] = (name, (int(fields[11]) + int(fields[12])) / cls._clock_ticks)
+        return threads
+
+    @classmethod
+    def register(cls, registry: Registry) -> None:
+        """Prozesskennzahlen einmal je Prozess (nicht je Telefon) registrieren"""
+        add = registry.add
+        add(Gauge('piphone_threads', 'Python-Threads', getter=cls.threads))
+        add(Gauge('piphone_os_threads', 'Threads laut Kernel (inkl. nativer Threads)', getter=cls.os_threads))
+        add(Gauge('piphone_child_processes', 'Kindprozesse', getter=cls.children))
+        add(Gauge('piphone_open_fds', 'Offene Dateideskriptoren', getter=cls.open_fds))
+        add(Gauge('process_resident_memory_bytes', 'Resident Set Size', getter=cls.rss_bytes))
+        add(Counter('process_cpu_seconds_total', 'CPU-Zeit (User + System)', getter=cls.cpu_seconds))
+        add(Counter(
+            'piphone_log_dropped_total', 'Verworfene Meldungen (Ausgabe ins Journal zu langsam)',
+            getter=lambda: events.dropped
+        ))
+
+
+class PhoneMetrics:
+    """Alle Metriken eines Telefons, mit Label `phone` in einem gemeinsamen Registry"""
+
+    registry: Registry
+    phone: str
+
+    # Gabel und Nummernschalter
+    hook_events: Counter
+    dialed_digits: Counter
+    dial_decode_errors: Counter
+    dtmf_digits: Counter
+    dtmf_latency_seconds: Histogram
+
+    # Anrufe
+    calls: Counter
+    calls_rejected: Counter
+    call_setup_seconds: Histogram
+
+    # Anrufbeantworter
+    voicemail_messages: Counter
+    voicemail_dropped_bytes: Counter
+
+    # linphonec und Netzwerk
+    linphonec_starts: Counter
+    wifi_flaps: Counter
+    wifi_connected: Gauge
+
+    # Audio
+    audio_spawns: Counter
+    audio_spawn_seconds: Histogram
+    audio_device_present: Gauge
+    audio_hotplugs: Counter
+    soundcard_switch_seconds: Histogram
+
+    # Gegensprechanlage
+    intercom_peers: Gauge
+    intercom_setup_seconds: Histogram
+
+    # Zustandsautomat
+    transitions: Counter
+    event_latency_seconds: Histogram
+
+    def __init__(self, registry: Registry, phone: str):
+        self.registry = registry
+        self.phone = phone
+
+        add = self._add
+        self.hook_events = add(Counter('piphone_hook_events_total', 'Gabelkontakt-Ereignisse'))
+        self.dialed_digits = add(Counter('piphone_dialed_digits_total', 'Gewählte Ziffern'))
+        self.dial_decode_errors = add(Counter('piphone_dial_decode_errors_total', 'Nicht dekodierbare Ziffern (0 oder mehr als 10 Impulse)'))
+        self.dtmf_digits = add(Counter('piphone_dtmf_digits_total', 'Im Gespräch gewählte Ziffern (DTMF)'))
+        self.dtmf_latency_seconds = add(Histogram(
+            'piphone_dtmf_latency_seconds', 'Letzter Impuls einer Ziffer bis DTMF an linphonec gesendet',
+            buckets=(0.01, 0.02, 0.03, 0.05, 0.075, 0.1, 0.25)
+        ))
+
+        self.calls = add(Counter('piphone_calls_total', 'Anrufe nach Richtung'))
+        self.calls_rejected = add(Counter('piphone_calls_rejected_total', 'Abgewiesene Anrufe nach Grund'))
+        self.call_setup_seconds = add(Histogram(
+            'piphone_call_setup_seconds', 'Zeit bis Gespräch verbunden',
+            buckets=(0.25, 0.5, 1, 2, 5, 10, 30)
+        ))
+
+        self.voicemail_messages = add(Counter('piphone_voicemail_messages_total', 'Aufgezeichnete Nachrichten'))
+        self.voicemail_dropped_bytes = add(Counter(
+            'piphone_voicemail_dropped_bytes_total', 'Verworfene Audiodaten (Encoder zu langsam)'
+        ))
+
+        self.linphonec_starts = add(Counter('piphone_linphonec_starts_total', 'Starts von linphonec'))
+        self.wifi_flaps = add(Counter('piphone_wifi_disconnects_total', 'Verbindungsabbrüche WLAN'))
+        self.wifi_connected = add(Gauge('piphone_wifi_connected', 'WLAN-Verbindung verfügbar'))
+
+        self.audio_spawns = add(Counter('piphone_audio_spawns_total', 'Gestartete Wiedergabeprozesse'))
+        self.audio_spawn_seconds = add(Histogram(
+            'piphone_audio_spawn_seconds', 'Dauer bis Wiedergabeprozess gestartet ist',
+            buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+        ))
+        self.audio_device_present = add(Gauge('piphone_audio_device_present', 'Überwachte Soundkarte vorhanden'))
+        self.audio_hotplugs = add(Counter('piphone_audio_hotplugs_total', 'Entfernte oder erkannte Soundkarten'))
+        self.soundcard_switch_seconds = add(Histogram(
+            'piphone_soundcard_switch_seconds', 'Scan nach Hotplug bis linphonec auf die Soundkarte gewechselt hat',
+            buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+        ))
+
+        self.intercom_peers = add(Gauge('piphone_intercom_peers', 'Erreichbare Telefone im LAN (Gegensprechanlage)'))
+        self.intercom_setup_seconds = add(Histogram(
+            'piphone_intercom_setup_seconds', 'Interner Anruf: Einladung gesendet bis Gegenstelle klingelt',
+            buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+        ))
+
+        self.transitions = add(Counter('piphone_state_transitions_total', 'Zustandswechsel nach Zielzustand'))
+        self.event_latency_seconds = add(Histogram(
+            'piphone_event_latency_seconds', 'Latenz zwischen Ereignis und Verarbeitung in der Event-Loop',
+            buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+        ))
+
+    def _add(self, metric: Metric) -> Metric:
+        metric.const_labels = (('phone', self.phone),)
+        return self.registry.add(metric)
+
+    def add_wakeups(self, getter: callable) -> None:
+        """Aufwachvorgänge je Quelle (siehe WakeupCounter.snapshot)"""
+        self._add(Counter('piphone_wakeups_total', 'Aufwachvorgänge je Quelle', getter=getter))
+
+
+class MetricsExporter:
+    """
+    Metriken im Prometheus-Textformat per HTTP ausliefern (TCP `host:port` oder Unix-Socket `unix:/pfad`)
+    und optional periodisch als Snapshot in eine Datei schreiben.
+    """
+
+    registry: Registry
+    _server: asyncio.AbstractServer | None = None
+    _snapshot_task: asyncio.Task | None = None
+
+    def __init__(self, registry: Registry):
+        self.registry = registry
+
+    async def start(self, listen: str, snapshot_file: str = "", snapshot_interval: int = 0) -> None:
+        if listen.startswith("unix:"):
+            path = Path(listen.removeprefix("unix:"))
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.unlink(missing_ok=True)
+            self._server = await asyncio.start_unix_server(self._handle, path=path)
+        elif listen != "":
+            host, _, port = listen.rpartition(":")
+            self._server = await asyncio.start_server(self._handle, host=host or "127.0.0.1", port=int(port))
+
+        if self._server is not None:
+            log.info("Metriken verfügbar unter {}", listen)
+
+        # Snapshots wecken den Prozess periodisch auf, daher nur auf Wunsch
+        if snapshot_file != "" and snapshot_interval > 0:
+            self._snapshot_task = asyncio.create_task(self._write_snapshots(Path(snapshot_file), snapshot_interval))
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Minimaler HTTP-Server: jede Anfrage erhält die aktuellen Metriken"""
+        try:
+            # Anfragezeile und Header überspringen
+            while (await asyncio.wait_for(reader.readline(), timeout=5)).strip() != b"":
+                pass
+
+            body = self.registry.render().encode('utf-8')
+            writer.write(
+                b"HTTP/1.0 200 OK\r\n"
+                b"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                + f"Content-Length: {len(body)}\r\n\r\n".encode('ascii')
+                + body
+            )
+            await writer.drain()
+        except (TimeoutError, ConnectionError) as e:
+            log.debug("Metriken: Anfrage abgebrochen: {}", e)
+        finally:
+            writer.close()
+
+    async def _write_snapshots(self, path: Path, interval: int) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            self.write_snapshot(path)
+
+    def write_snapshot(self, path: Path) -> None:
+        """Snapshot atomar schreiben (temporäre Datei + rename)"""
+        tmp = path.with_name(f".{path.name}.{getpid()}")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(f"# {int(time())}\n{self.registry.render()}")
+            replace(tmp, path)
+        except OSError as e:
+            log.warning("Kann Metriken-Snapshot nicht schreiben: {}", e)
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
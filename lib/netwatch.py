@@ -0,0 +1,68 @@
+import errno
+import socket
+from asyncio import AbstractEventLoop
+
+from lib.eventlog import get_logger
+
+log = get_logger('netwatch')
+
+# Multicast-Gruppen von NETLINK_ROUTE (linux/rtnetlink.h)
+RTMGRP_LINK = 0x01
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+
+
+class NetworkWatch:
+    """
+    Änderungen an Schnittstellen, Adressen und Routen per Netlink melden.
+    Ersetzt das periodische Prüfen der WLAN-Verbindung: der Kernel weckt uns nur, wenn sich etwas ändert.
+    """
+
+    loop: AbstractEventLoop
+    on_change: callable
+    events: int = 0  # Empfangene Benachrichtigungen (= Aufwachvorgänge)
+    overruns: int = 0  # Empfangspuffer übergelaufen (ENOBUFS), Nachrichten verloren
+    _sock: socket.socket | None = None
+
+    def __init__(self, loop: AbstractEventLoop, on_change: callable):
+        self.loop = loop
+        self.on_change = on_change
+
+        try:
+            self._sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW | socket.SOCK_NONBLOCK, socket.NETLINK_ROUTE)
+            self._sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV4_ROUTE))
+        except OSError as e:
+            log.warning("Netlink nicht verfügbar, Netzwerkänderungen werden nicht gemeldet: {}", e)
+            self._sock = None
+            return
+
+        loop.add_reader(self._sock.fileno(), self._read)
+
+    @property
+    def available(self) -> bool:
+        return self._sock is not None
+
+    def _read(self) -> None:
+        """Alle anstehenden Nachrichten verwerfen (Inhalt ist egal) und Änderung einmal melden"""
+        while True:
+            try:
+                self._sock.recv(65536)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                if e.errno == errno.ENOBUFS:
+                    # Viele Ereignisse auf einmal: Nachrichten verloren, es hat sich aber in jedem Fall etwas geändert
+                    self.overruns += 1
+                    log.debug("Netlink-Puffer übergelaufen, melde Änderung")
+                else:
+                    log.error("Netlink-Socket fehlerhaft, Netzwerkänderungen werden nicht mehr gemeldet: {}", e)
+                    self.close()
+                break
+        self.events += 1
+        self.on_change()
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self.loop.remove_reader(self._sock.fileno())
+            self._sock.close()
+            self._sock = None
@@ -0,0 +1,241 @@
+import os
+from asyncio import AbstractEventLoop, TimerHandle
+from pathlib import Path
+from time import perf_counter
+
+from lib.eventlog import get_logger
+from lib.metrics import Counter, Gauge, Registry
+
+log = get_logger('performance')
+
+
+def process_threads(pid: int) -> list[int]:
+    """Thread-IDs eines Prozesses laut /proc (leer, falls der Prozess bereits beendet ist)"""
+    try:
+        return [int(task.name) for task in Path(f"/proc/{pid}/task").iterdir()]
+    except OSError:
+        return []
+
+
+def parse_cpus(value: str) -> set[int] | None:
+    """CPU-Liste aus der Konfiguration, z.B. "3" oder "2,3"; leer = alle"""
+    cpus = {int(cpu) for cpu in value.split(',') if cpu.strip() != ""}
+    return cpus or None
+
+
+class PerformancePolicy:
+    """
+    Leistungsprofil nach Aktivität der Telefone (von allen Telefonen eines Prozesses geteilt).
+    Aktiv (Hörer abgehoben, Wählen, Klingeln, Gespräch): cpufreq-Governor `active_governor` und Mindesttakt
+    angehoben, Nummernschalter und Audio (linphonec, aplay/arecord) mit SCHED_FIFO und optional auf feste CPUs.
+    Alle Telefone aufgelegt: nach `idle_delay` Sekunden zurück auf `idle_governor` und normale Priorität.
+    cpufreq über sysfs unter `root` (für Tests ein beliebiges Verzeichnis), Threads über sched_setscheduler.
+    """
+
+    loop: AbstractEventLoop
+    root: Path  # cpufreq-Verzeichnis mit policy0, policy1, ...
+    active_governor: str
+    idle_governor: str
+    min_freq: str  # Aktiv: Mindesttakt in kHz, "max" = höchster Takt, leer = unverändert
+    priorities: dict[str, int]  # Art (dial/audio) -> SCHED_FIFO-Priorität, 0 = unverändert
+    cpus: dict[str, set[int] | None]  # Art -> CPUs, None = unverändert
+    idle_delay: float
+
+    # Zustand
+    active: bool = False
+    phones: set[str]  # Aktive Telefone
+    sources: list[tuple[str, callable]]  # (Art, liefert Thread-IDs)
+    boosted: dict[int, tuple[int, int, set[int]]]  # Thread-ID -> Scheduler, Priorität, CPUs vorher
+    original: dict[Path, dict[str, str]]  # cpufreq-Policy -> Governor und Mindesttakt vor dem Start
+    switches: int = 0
+    switch_seconds: float = 0  # Dauer des letzten Wechsels
+    _idle_timer: TimerHandle | None = None
+    _warned: set[str]  # Fehler nur einmal melden
+
+    def __init__(
+            self,
+            loop: AbstractEventLoop,
+            root: Path = Path("/sys/devices/system/cpu/cpufreq"),
+            active_governor: str = "performance",
+            idle_governor: str = "powersave",
+            min_freq: str = "max",
+            dial_priority: int = 20,
+            audio_priority: int = 10,
+            dial_cpus: set[int] | None = None,
+            audio_cpus: set[int] | None = None,
+            idle_delay: float = 5
+    ):
+        self.loop = loop
+        self.root = root
+        self.active_governor = active_governor
+        self.idle_governor = idle_governor
+        self.min_freq = min_freq
+        self.priorities = {'dial': dial_priority, 'audio': audio_priority}
+        self.cpus = {'dial': dial_cpus, 'audio': audio_cpus}
+        self.idle_delay = idle_delay
+        self.phones = set()
+        self.sources = []
+        self.boosted = {}
+        self._warned = set()
+
+        # Ausgangszustand sofort merken: Telefone können schon während des Starts aktiv werden (Hörer abgehoben)
+        self.original = {
+            policy: {
+                'scaling_governor': self._read(policy, 'scaling_governor'),
+                'scaling_min_freq': self._read(policy, 'scaling_min_freq'),
+            }
+            for policy in sorted(root.glob("policy[0-9]*"))
+        }
+        if not self.original:
+            log.warning("cpufreq nicht verfügbar ({}), nur Prioritäten werden angepasst", root)
+
+    def register(self, registry: Registry) -> None:
+        """Kennzahlen einmal je Prozess (nicht je Telefon) registrieren"""
+        registry.add(Gauge('piphone_performance_active', 'Leistungsprofil aktiv', getter=lambda: int(self.active)))
+        registry.add(Counter(
+            'piphone_performance_switches_total', 'Wechsel auf das aktive Leistungsprofil', getter=lambda: self.switches
+        ))
+
+    def add_threads(self, kind: str, getter: callable) -> None:
+        """Quelle für Threads registrieren (kind: "dial" oder "audio"), abgefragt bei jedem Wechsel"""
+        self.sources.append((kind, getter))
+
+    def start(self) -> None:
+        """Nach dem Start der Telefone auf das Ruheprofil wechseln, falls kein Telefon aktiv ist"""
+        if not self.active:
+            self._set_cpufreq(self.idle_governor, None)
+
+    def close(self) -> None:
+        """Prioritäten zurücksetzen und cpufreq wie beim Start einstellen"""
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+        self._restore_threads()
+        self.active = False
+        for policy, values in self.original.items():
+            self._write(policy, 'scaling_governor', values['scaling_governor'])
+            self._write(policy, 'scaling_min_freq', values['scaling_min_freq'])
+
+    def update(self, phone: str, active: bool) -> None:
+        """Zustandswechsel eines Telefons: aktiv, sobald ein Telefon aktiv ist, Ruhe erst nach `idle_delay`"""
+        if active:
+            self.phones.add(phone)
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            if self.active:
+                self.refresh()
+            else:
+                self._activate()
+            return
+
+        self.phones.discard(phone)
+        if self.phones or not self.active or self._idle_timer is not None:
+            return
+        if self.idle_delay > 0:
+            self._idle_timer = self.loop.call_later(self.idle_delay, self._deactivate)
+        else:
+            self._deactivate()
+
+    def refresh(self) -> None:
+        """Neue Threads (z.B. Audioprozesse nach Gesprächsbeginn) im aktiven Profil ebenfalls anheben"""
+        if not self.active:
+            return
+        threads = self._threads()
+        self._forget_ended(threads)
+        for tid, kind in threads.items():
+            if tid not in self.boosted:
+                self._boost(tid, self.priorities[kind], self.cpus[kind])
+
+    def _activate(self) -> None:
+        started = perf_counter()
+        self.active = True
+        self._set_cpufreq(self.active_governor, self.min_freq)
+        self.refresh()
+        self.switches += 1
+        self.switch_seconds = perf_counter() - started
+        log.debug("Leistungsprofil aktiv ({} Threads, {:.1f}ms)", len(self.boosted), self.switch_seconds * 1000)
+
+    def _deactivate(self) -> None:
+        self._idle_timer = None
+        started = perf_counter()
+        self.active = False
+        self._restore_threads()
+        self._set_cpufreq(self.idle_governor, None)
+        log.debug("Leistungsprofil Ruhe ({:.1f}ms)", (perf_counter() - started) * 1000)
+
+    # cpufreq
+
+    def _set_cpufreq(self, governor: str, min_freq: str | None) -> None:
+        """Governor und Mindesttakt aller cpufreq-Policies setzen; min_freq None = Wert beim Start"""
+        for policy, values in self.original.items():
+            if governor != "" and governor != self._read(policy, 'scaling_governor'):
+                if governor in self._read(policy, 'scaling_available_governors').split():
+                    self._write(policy, 'scaling_governor', governor)
+                else:
+                    self._warn(f"governor-{governor}", "Governor {} nicht verfügbar ({})", governor, policy.name)
+            if min_freq is None:
+                self._write(policy, 'scaling_min_freq', values['scaling_min_freq'])
+            elif min_freq != "":
+                self._write(
+                    policy, 'scaling_min_freq',
+                    self._read(policy, 'cpuinfo_max_freq') if min_freq == "max" else min_freq
+                )
+
+    def _read(self, policy: Path, name: str) -> str:
+        try:
+            return (policy / name).read_text().strip()
+        except OSError:
+            return ""
+
+    def _write(self, policy: Path, name: str, value: str) -> None:
+        if value == "":
+            return
+        try:
+            (policy / name).write_text(value)
+        except OSError as e:
+            self._warn(f"write-{name}", "Kann {} nicht schreiben: {}", policy / name, e)
+
+    # Threads
+
+    def _threads(self) -> dict[int, str]:
+        """Aktuelle Threads aller Quellen: Thread-ID -> Art"""
+        return {tid: kind for kind, getter in self.sources for tid in getter()}
+
+    def _forget_ended(self, threads: dict[int, str]) -> None:
+        """
+        Nicht mehr gemeldete Threads (Prozess beendet) vergessen statt später zurückzusetzen: die Thread-ID kann
+        inzwischen ein anderer Thread erhalten haben
+        """
+        for tid in [tid for tid in self.boosted if tid not in threads]:
+            del self.boosted[tid]
+
+    def _boost(self, tid: int, priority: int, cpus: set[int] | None) -> None:
+        try:
+            before = (os.sched_getscheduler(tid), os.sched_getparam(tid).sched_priority, os.sched_getaffinity(tid))
+            if priority > 0:
+                os.sched_setscheduler(tid, os.SCHED_FIFO, os.sched_param(priority))
+            if cpus is not None:
+                os.sched_setaffinity(tid, cpus)
+        except ProcessLookupError:
+            return  # Thread bereits beendet (z.B. kurzer Ton)
+        except OSError as e:
+            self._warn("sched", "Kann Priorität nicht anheben (root bzw. CAP_SYS_NICE nötig): {}", e)
+            return
+        self.boosted[tid] = before
+
+    def _restore_threads(self) -> None:
+        self._forget_ended(self._threads())
+        for tid, (policy, priority, cpus) in self.boosted.items():
+            try:
+                os.sched_setscheduler(tid, policy, os.sched_param(priority))
+                os.sched_setaffinity(tid, cpus)
+            except ProcessLookupError:
+                pass  # Thread inzwischen beendet
+            except OSError as e:
+                self._warn("restore", "Kann Priorität nicht zurücksetzen: {}", e)
+        self.boosted.clear()
+
+    def _warn(self, key: str, message: str, *args) -> None:
+        if key not in self._warned:
+            self._warned.add(key)
+            log.warning(message, *args)
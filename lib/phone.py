@@ -0,0 +1,1425 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from configparser import ConfigParser
+from datetime import datetime, timedelta
+from os import close, open as os_open, posix_fadvise, system, O_RDONLY, POSIX_FADV_WILLNEED
+from pathlib import Path
+from time import monotonic_ns, perf_counter, time
+from typing import TYPE_CHECKING
+
+from RPi import GPIO
+
+from lib.audio import Audio
+from lib.boottiming import BootTiming
+from lib.callstate import CallState, CallStateMachine
+from lib.cdr import CallLog, CallRecord, calls_file
+from lib.eventlog import get_logger, Logger
+from lib.hookswitch import HookSwitch
+from lib.led import Led
+from lib.linphone import Linphone
+from lib.metrics import PhoneMetrics, Registry
+from lib.netwatch import NetworkWatch
+from lib.performance import PerformancePolicy, process_threads
+from lib.phoneconfig import DEFAULT_PHONE
+from lib.rotarydial import RotaryDial
+from lib.sdnotify import SystemdNotifier
+from lib.sounddevices import SoundCard, SoundDevices
+from lib.statefile import boot_id, state_file, StateFile
+
+# Optionale Funktionen werden erst in den Zweigen geladen, die sie einschalten (kürzerer Start)
+if TYPE_CHECKING:
+    from lib.intercom import Intercom
+    from lib.voicemail import Mailbox, Recorder
+
+# Kurzbefehle, die in [Numbers] statt einer Rufnummer hinterlegt werden können
+SHORTCUTS = (
+    "enable-night-mode", "play-sleep-music", "play-messages", "test-loudspeaker", "test-earpiece", "reboot", "shutdown"
+)
+
+
+class PiPhone:
+    """
+    Ein Telefon: Gabel, Nummernschalter, Lichter, Audiogeräte und SIP-Account.
+    Mehrere Instanzen können sich einen Prozess und eine Event-Loop teilen (siehe lib/phoneconfig.py).
+    """
+
+    WAKE_LIGHT_SECONDS: float = 2 * 60 * 60  # Aufwachlicht bleibt nach der Aufwachzeit so lange eingeschaltet
+
+    # Konfiguration
+    name: str
+    config: ConfigParser  # Konfiguration dieses Telefons (gemeinsame Abschnitte + eigene Überschreibungen)
+    verbose: bool
+    hook_pin: int
+
+    # Instanzen
+    loop: asyncio.AbstractEventLoop
+    log: Logger
+    audio: Audio
+    state: CallStateMachine  # Gesprächsablauf, alle Ereignisse und Timeouts laufen über die Event-Loop
+    dial: RotaryDial | None = None
+    hook: HookSwitch | None = None  # Gabelkontakt
+    linphone: Linphone | None = None
+    intercom: 'Intercom | None' = None  # Gegensprechanlage im LAN (falls aktiviert)
+    led: Led | None = None
+    network_watch: NetworkWatch
+    sound_devices: SoundDevices | None = None  # Soundkarten und Hotplug (von allen Telefonen geteilt)
+    performance: PerformancePolicy | None = None  # CPU-Takt und Echtzeitpriorität nach Aktivität (geteilt)
+    metrics: PhoneMetrics
+    notifier: SystemdNotifier
+    boot: BootTiming
+    calls: CallLog  # Anrufliste
+    mailbox: 'Mailbox | None' = None  # Anrufbeantworter (falls aktiviert)
+    recorder: 'Recorder | None' = None  # Laufende Aufzeichnung
+    state_file: StateFile | None = None  # Zustand für das Fortsetzen nach Neustart (falls aktiviert)
+
+    # Tasks und Timer (alle in der Event-Loop, keine eigenen Threads)
+    wifi_test_task: asyncio.Task | None = None  # WLAN-Verbindung bei Netzwerkänderungen prüfen
+    dialing_timeout: asyncio.TimerHandle | None = None  # Wählvorgang nach bestimmter Zeit abbrechen
+    call_duration_timeout: asyncio.TimerHandle | None = None  # Gesprächsdauer begrenzen
+    voicemail_timer: asyncio.TimerHandle | None = None  # Anrufbeantworter: Annahme nach N Klingelzeichen, Maximaldauer
+    night_light_timer: asyncio.TimerHandle | None = None  # Nachtlicht und Aufwachlicht
+    sleep_music_task: asyncio.Task | None = None  # Schlafmusik
+    action_task: asyncio.Task | None = None  # Laufender Kurzbefehl
+
+    # Zustandsvariablen
+    first_boot: bool = True  # Erster Startvorgang: Bootsound abspielen, sobald linphonec gestartet wurde
+    is_connected: bool = False
+    network_changed: asyncio.Event  # Netlink-Ereignis oder linphonec beendet: Verbindung erneut prüfen
+    linphone_ready: asyncio.Event  # linphonec hat sich gemeldet und Account registriert
+    terminated: asyncio.Event  # Programmende angefordert (ersetzt Polling in main())
+    manual_dnd: bool = False
+    wake_up_time: datetime | None = None  # Nachtmodus aktiv: nächste Aufwachzeit (lokal, mit Zeitzone)
+    sleep_music_started: float | None = None  # Schlafmusik läuft seit (Unix-Zeit)
+    resumed: dict  # Gespeicherter Zustand vor dem Neustart, wird in start() wiederhergestellt
+    call_setup_started: float | None = None  # Zeitpunkt von Wahl/Annahme, für Verbindungsdauer-Metrik
+    current_call: CallRecord | None = None  # Klingelnder oder laufender Anruf, für die Anrufliste
+    current_call_id: int | str | None = None  # ID in linphonec (ausgehend ab Verbindung bekannt) bzw. Gegensprechanlage
+    other_call: CallRecord | None = None  # Anklopfender oder gehaltener zweiter Anruf
+    other_call_id: int | None = None
+    rejected_calls: set[int]  # Abgewiesene Anrufe, deren Ende ignoriert wird
+    subscribers: list[callable]  # Ereignisse für Steuerungs-API: subscriber(Ereignis, Felder)
+    contacts: dict[str, str]  # Rufnummer -> Kurzwahl aus [Numbers]
+    audio_cards: dict[str, str]  # Rolle (speaker/earpiece) -> überwachte Soundkarte (Kurzname oder Teil des Namens)
+    audio_present: dict[str, bool]  # Rolle -> Soundkarte vorhanden
+    soundcard_index: int | None = None  # Nummer der Hörer-Soundkarte in linphonec, nach Hotplug neu ermittelt
+    soundcard_pending: SoundCard | None = None  # Hörer-Soundkarte neu erkannt, warte auf `soundcard list`
+    soundcard_plugged: float | None = None  # Zeitpunkt des Hotplugs, für Umschalt-Metrik
+    
+    def __init__(
+            self,
+            loop: asyncio.AbstractEventLoop,
+            name: str,
+            config: ConfigParser,
+            registry: Registry,
+            notifier: SystemdNotifier,
+            network_watch: NetworkWatch,
+            verbose: bool = False,
+            sound_devices: SoundDevices | None = None,
+            performance: PerformancePolicy | None = None
+    ):
+        """Telefon einrichten, der eigentliche Startvorgang folgt in start()"""
+        self.name = name
+        self.config = config
+        self.verbose = verbose
+        self.hook_pin = config['Pins'].getint('gabel')
+        self.log = get_logger(name, prefix="" if name == DEFAULT_PHONE else f"[{name}] ")
+        self.boot = BootTiming()
+
+        # Event-Loop und Zustandsautomat
+        self.loop = loop
+        self.metrics = PhoneMetrics(registry, phone=name)
+        self.state = CallStateMachine(loop, metrics=self.metrics)
+        self.metrics.add_wakeups(self.state.wakeups.snapshot)
+        self.network_changed = asyncio.Event()
+        self.linphone_ready = asyncio.Event()
+        self.terminated = asyncio.Event()
+        self.notifier = notifier
+        self.subscribers = []
+        self.rejected_calls = set()
+        self.state.listeners.append(
+            lambda old, new: self.publish('state', previous=old.value, state=new.value)
+        )
+        self.state.listeners.append(self.end_dtmf)
+
+        # Audiogeräte dieses Telefons: ALSA-Gerät aus der Konfiguration, sonst die erkannte Soundkarte
+        self.sound_devices = sound_devices
+        self.audio_cards = {
+            role: config.get('Audio', f'{role}_card', fallback='')
+            for role in ('speaker', 'earpiece') if config.get('Audio', f'{role}_card', fallback='') != ""
+        }
+        self.audio_present = {}
+        self.audio = Audio(
+            speaker_device=self.audio_device('speaker', default='i2s'),
+            earpiece_device=self.audio_device('earpiece', default='usb'),
+            metrics=self.metrics
+        )
+        if sound_devices is not None and self.audio_cards:
+            for role, pattern in self.audio_cards.items():
+                self.audio_present[role] = sound_devices.find(pattern) is not None
+                self.metrics.audio_device_present.set(int(self.audio_present[role]), role=role)
+                if not self.audio_present[role]:
+                    self.log.warning("Soundkarte für {} nicht gefunden: {}", role, pattern)
+            sound_devices.listeners.append(self.sound_card_changed)
+            self.metrics.audio_hotplugs.getter = lambda: sound_devices.hotplugs
+        self.use_prepared_sounds()
+
+        # WLAN-Verbindung und linphonec überwachen (Netlink-Socket wird von allen Telefonen geteilt)
+        self.network_watch = network_watch
+        self.state.wakeups.poll('netlink', lambda: self.network_watch.events)
+
+        # Anrufliste
+        self.calls = CallLog(
+            loop,
+            path=calls_file(Path(config.get('Storage', 'data_dir', fallback='/var/lib/piphone')), name),
+            flush_delay=config.getint('Storage', 'cdr_flush_delay', fallback=30)
+        )
+        self.contacts = {number: shortcut for (shortcut, number) in config['Numbers'].items()}
+
+        # Zustand vor einem Neustart (Dienst, Reboot, Stromausfall): Neustart des Dienstes und Neustart im
+        # Nachtmodus ohne Bootsound und Blinken
+        self.resumed = {}
+        if config.getboolean('Storage', 'resume', fallback=True):
+            self.state_file = StateFile(state_file(Path(config.get('Storage', 'data_dir', fallback='/var/lib/piphone')), name))
+            self.resumed = self.state_file.load()
+            if self.resumed and (self.resumed.get('boot_id') == boot_id() or self.resumed.get('manual_dnd')):
+                self.first_boot = False
+
+        # Anrufbeantworter
+        if config.getboolean('Voicemail', 'enabled', fallback=False):
+            from lib.voicemail import Mailbox
+            self.mailbox = Mailbox(Path(config.get('Storage', 'data_dir', fallback='/var/lib/piphone')), name)
+
+        # Gegensprechanlage: interne Anrufe direkt zwischen den Telefonen im LAN, Sockets öffnen in start()
+        if config.getboolean('Intercom', 'enabled', fallback=False):
+            from lib.intercom import Intercom
+            self.intercom = Intercom(
+                loop, name, config['Intercom']['extension'],
+                on_incoming_call=self.incoming_call,
+                on_connected=self.call_connected,
+                on_hang_up=self.hung_up,
+                group=config.get('Intercom', 'group', fallback='239.255.42.42'),
+                group_port=config.getint('Intercom', 'group_port', fallback=5071),
+                port=config.getint('Intercom', 'port', fallback=5070),
+                interface=config.get('Intercom', 'interface', fallback=''),
+                announce_interval=config.getfloat('Intercom', 'announce_interval', fallback=30),
+                rate=config.getint('Intercom', 'rate', fallback=16000),
+                rtp_port=config.getint('Intercom', 'rtp_port', fallback=0),
+                ring_timeout=config.getfloat('Intercom', 'ring_timeout', fallback=60),
+                device=self.audio.earpiece_device,
+                metrics=self.metrics
+            )
+            self.state.wakeups.poll('intercom', lambda: self.intercom.wakeups)
+            self.metrics.intercom_peers.getter = lambda: len(self.intercom.current_peers())
+
+        # Leistungsprofil: aktiv, solange das Telefon nicht in Ruhe ist (Hörer abgehoben, Wählen, Klingeln, Gespräch)
+        self.performance = performance
+        if performance is not None:
+            self.state.listeners.append(lambda old, new: performance.update(self.name, new is not CallState.IDLE))
+            performance.add_threads('dial', lambda: [self.dial.native_id] if self.dial is not None else [])
+            performance.add_threads('audio', self.audio_threads)
+
+    def audio_threads(self) -> list[int]:
+        """Threads der Audioprozesse (linphonec, Wiedergabe, Gegensprechanlage) für das Leistungsprofil"""
+        pids = self.audio.pids()
+        if self.linphone is not None and self.linphone.is_running():
+            pids.append(self.linphone.linphone.pid)
+        if self.intercom is not None:
+            pids += self.intercom.pids()
+        return [tid for pid in pids for tid in process_threads(pid)]
+
+    def audio_device(self, role: str, default: str) -> str:
+        """ALSA-Gerät einer Rolle: `[Audio] speaker/earpiece`, leer = erkannte Karte (`plughw:CARD=<Kurzname>`)"""
+        device = self.config.get('Audio', role, fallback='')
+        if device != "":
+            return device
+        if self.sound_devices is not None and role in self.audio_cards:
+            card = self.sound_devices.find(self.audio_cards[role])
+            if card is not None:
+                # Über den Kurznamen statt des Index: bleibt gültig, wenn die Karte neu aufgezählt wird
+                return f"plughw:CARD={card.id}"
+        return default
+
+    def use_prepared_sounds(self) -> None:
+        """
+        Sounds durch die von soundprep.py aufbereiteten WAV-Dateien ersetzen (natives Format, ohne Anfangsstille).
+        Je Sound ein Zugriff auf das Manifest und zwei stat-Aufrufe; nicht aufbereitete oder seitdem geänderte
+        Sounds werden wie bisher abgespielt (MP3 per sox, WAV in falschem Format scheitert erst bei der Wiedergabe)
+        """
+        path = self.config.get('Audio', 'sound_manifest', fallback='')
+        if path == "":
+            return
+
+        from lib.soundassets import configured_sounds, device_format, sound_role, Manifest
+        manifest = Manifest.load(Path(path))
+        cards = self.sound_devices.cards if self.sound_devices is not None else None
+        prepared = 0
+        problems = []
+        for section, key, source in configured_sounds(self.config):
+            output, status = manifest.lookup(source, device_format(self.config, sound_role(section, key), cards))
+            if output is None:
+                problems.append(f"{key} ({status})")
+                continue
+            self.config.set(section, key, output)
+            prepared += 1
+
+        self.log.info("{} Sounds im nativen Format", prepared)
+        if problems:
+            self.log.warning("Sounds nicht aufbereitet, soundprep.py ausführen: {}", ", ".join(problems))
+
+    async def start(self) -> None:
+        """
+        Startvorgang, unabhängige Schritte laufen parallel:
+        - GPIO (LEDs, Nummernschalter, Gabel) in einem Hilfsthread
+        - linphonec sofort starten, gleichzeitig WLAN prüfen
+        - Sounddateien in einem Hilfsthread in den Seitencache laden
+        Die Hilfsthreads enden mit dem Start (eigener Pool statt des Standard-Executors der Loop, dessen Threads
+        bis zum Programmende bleiben).
+        Danach Aufschlüsselung der Startzeit loggen; die Bereitschaft meldet main(), sobald alle Telefone bereit sind.
+        """
+        self.log.info("Starte Telefon {}...", self.name)
+        if self.intercom is not None:
+            self.intercom.start()
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix=f"start-{self.name}") as executor:
+            await asyncio.gather(
+                self.boot.measure('gpio', self.loop.run_in_executor(executor, self.setup_gpio)),
+                self.boot.measure('telefonie', self.start_telephony()),
+                self.boot.measure('sounds', self.loop.run_in_executor(executor, self.warm_sound_cache)),
+            )
+
+        restore_started = perf_counter()
+        self.restore_state()
+        self.boot.mark('zustand', restore_started)
+
+        # Falls beim booten direkt der Hörer abgehoben ist: Besetztton spielen
+        if not self.is_hungup():
+            self.log.debug("Gabel ist während des Startvorgangs abgehoben, spiele Besetztton.")
+            self.cancel_dialing()
+
+        # Ab jetzt nur noch bei Netzwerkänderungen prüfen
+        self.wifi_test_task = asyncio.create_task(self.watchdog())
+        if self.linphone_ready.is_set():
+            self.announce_boot()
+
+        # Registrierte Rufnummern loggen
+        self.log.info("Registrierte Zielrufnummern:")
+        for (number, action) in self.config['Numbers'].items():
+            self.log.info(" - {} -> {}", number, action)
+
+        self.log.info(self.boot.report(with_uptime=False))
+
+    def setup_gpio(self) -> None:
+        """GPIO einrichten (läuft in einem Hilfsthread parallel zum restlichen Start), GPIO.setmode() erfolgt in main()"""
+        # Nachtlicht / Aufwachlicht
+        self.led = Led(
+            night_light_pin = self.config['Misc'].getint('night_light_pin', fallback=0),
+            night_light_duty = self.config['Misc'].getint('night_light_duty', fallback=100),
+            wake_light_pin = self.config['Misc'].getint('wake_light_pin', fallback=None),
+            wake_light_duty = self.config['Misc'].getint('wake_light_duty', fallback=0),
+            verbose = self.verbose,
+            pwm_backend = self.config['Misc'].get('pwm_backend', fallback='auto'),
+            pwm_root = Path(self.config['Misc'].get('pwm_sysfs', fallback='/sys/class/pwm'))
+        )
+        if self.first_boot:
+            self.led.wake_light_blink()  # Bootvorgang visualisieren
+        self.update_message_indicator()
+
+        # Nummernschalter, im Gespräch optional für DTMF (Sprachmenüs, Mailboxen)
+        self.dial = RotaryDial(
+            pin_nsi = self.config['Pins'].getint('nsi'),
+            pin_nsa = self.config['Pins'].getint('nsa'),
+            receive_number_callback = self.state.threadsafe(self.receive_number),
+            name = f"rotarydial-{self.name}",
+            receive_dtmf_callback = (
+                self.state.threadsafe(self.receive_dtmf)
+                if self.config.getboolean('SIP', 'dtmf', fallback=True) else None
+            )
+        )
+        self.state.wakeups.poll('waehlscheibe', lambda: self.dial.samples)
+        self.metrics.dialed_digits.getter = lambda: self.dial.digits
+        self.metrics.dial_decode_errors.getter = lambda: self.dial.decode_errors
+
+        # Gabelkontakt: Flash nur im Gespräch, sonst wird Auflegen sofort gemeldet
+        flash = self.config.getboolean('Hook', 'flash', fallback=True)
+        self.hook = HookSwitch(
+            self.hook_pin, self.state, self.hook_event,
+            flash_enabled = lambda: flash and self.state.is_in(CallState.IN_CALL),
+            debounce_ms = self.config.getfloat('Hook', 'debounce_ms', fallback=20),
+            flash_min_ms = self.config.getfloat('Hook', 'flash_min_ms', fallback=80),
+            flash_max_ms = self.config.getfloat('Hook', 'flash_max_ms', fallback=600)
+        )
+
+    async def start_telephony(self) -> None:
+        """linphonec starten und gleichzeitig WLAN prüfen, dann auf linphonec warten (max. 30s)"""
+        self.start_linphonec()
+        if not await self.update_connection():
+            # Offline: vorsorglich gestartetes linphonec beenden, der Watchdog startet es bei Verbindung neu
+            if self.linphone is not None:
+                self.linphone.terminate()
+                self.linphone = None
+            return
+
+        try:
+            await asyncio.wait_for(self.linphone_ready.wait(), timeout=30)
+        except TimeoutError:
+            self.log.warning("linphonec hat sich nach 30s nicht gemeldet, setze Start fort.")
+
+    def warm_sound_cache(self) -> int:
+        """Sounddateien vorab in den Seitencache lesen lassen (Readahead des Kernels, blockiert nicht)"""
+        paths = set(self.config['Sounds'].values())
+        if self.config.has_section('Ringtones'):
+            paths.update(self.config['Ringtones'].values())
+
+        warmed = 0
+        for path in paths:
+            try:
+                fd = os_open(path, O_RDONLY)
+            except OSError:
+                self.log.warning("Sounddatei nicht gefunden: {}", path)
+                continue
+            try:
+                posix_fadvise(fd, 0, 0, POSIX_FADV_WILLNEED)
+                warmed += 1
+            finally:
+                close(fd)
+        return warmed
+
+    def restore_state(self) -> None:
+        """
+        Zustand vor dem Neustart wiederherstellen: Nicht stören, Nachtmodus (Timer anhand der Uhrzeit neu berechnet,
+        auch mitten im Sonnenaufgang) und Schlafmusik (an der Stelle, an der sie unterbrochen wurde)
+        """
+        resumed = self.resumed
+        if resumed:
+            self.manual_dnd = bool(resumed.get('manual_dnd', False))
+            if resumed.get('wake_up') is not None and self.led is not None:
+                self.schedule_night_mode(datetime.fromisoformat(resumed['wake_up']))
+            started = resumed.get('sleep_music_started')
+            if started is not None and self.sleep_music_task is None:
+                self.sleep_music_task = asyncio.create_task(self.start_sleep_music(started=started))
+            self.update_message_indicator()
+            self.log.info(
+                "Zustand wiederhergestellt: Nicht stören {}, Nachtmodus {}, Schlafmusik {}",
+                "an" if self.manual_dnd else "aus", self.wake_up_time or "aus", "an" if started is not None else "aus"
+            )
+        self.save_state()
+
+    def save_state(self) -> None:
+        """Zustand für das Fortsetzen nach Neustart speichern (nur bei Änderungen)"""
+        if self.state_file is None:
+            return
+        self.state_file.save({
+            'manual_dnd': self.manual_dnd,
+            'wake_up': self.wake_up_time.isoformat() if self.wake_up_time is not None else None,
+            'sleep_music_started': self.sleep_music_started,
+        })
+
+    def report_status(self, status: str) -> None:
+        """Status an systemd melden, bei mehreren Telefonen mit Namen"""
+        self.notifier.status(status if self.name == DEFAULT_PHONE else f"{self.name}: {status}")
+
+    def print_status(self) -> None:
+        """SIGUSR1: Zustand und Aufwachvorgänge je Quelle ausgeben"""
+        self.log.info("Zustand {}: {}", self.state.state.name, self.state.report())
+        self.log.info(self.state.wakeups.report())
+
+    def request_terminate(self) -> None:
+        """Timer stoppen und Programmende anfordern (main() beendet daraufhin alle Telefone)"""
+        for timer in (self.dialing_timeout, self.call_duration_timeout, self.night_light_timer, self.voicemail_timer):
+            if timer is not None:
+                timer.cancel()
+        if self.recorder is not None:
+            self.recorder.abort()
+        if self.dial is not None:
+            self.dial.end_dialing()
+        if self.wifi_test_task is not None:
+            self.wifi_test_task.cancel()
+        self.calls.flush()
+        self.terminated.set()
+
+    def start_linphonec(self) -> None:
+        self.metrics.linphonec_starts.inc()
+        self.linphone = Linphone(
+            hostname=self.config['SIP']['host'],
+            username=self.config['SIP']['user'],
+            password=self.config['SIP']['pass'],
+            on_boot=self.state.threadsafe(self.linphone_booted),
+            on_incoming_call=self.state.threadsafe(self.incoming_call),
+            on_hang_up=self.state.threadsafe(self.hung_up),
+            on_exit=self.state.threadsafe(self.on_network_change, source='linphonec_exit'),
+            on_connected=self.state.threadsafe(self.call_connected),
+            on_soundcard=self.state.threadsafe(self.linphone_soundcard),
+            verbose=self.verbose,
+            binary=self.config['SIP'].get('linphonec', fallback='/usr/bin/linphonec'),
+            config_file=self.config['SIP'].get('linphonerc', fallback=''),
+            name=f"linphone-{self.name}"
+        )
+
+    def sound_card_changed(self, card: SoundCard, present: bool) -> None:
+        """
+        Callback (Event-Loop): Soundkarte entfernt oder (wieder) erkannt, z.B. USB-Karte nach Unterspannung.
+        Abgebrochene Wiedergabe wird neu gestartet, linphonec liest die Karten neu ein und wechselt auf die Hörer-Karte
+        """
+        for role, pattern in self.audio_cards.items():
+            if not card.matches(pattern):
+                continue
+            self.audio_present[role] = present
+            self.metrics.audio_device_present.set(int(present), role=role)
+            self.publish('audio', role=role, card=card.name, present=present)
+            if not present:
+                self.log.warning("Soundkarte für {} entfernt: {}", role, card.name)
+                continue
+
+            self.log.info("Soundkarte für {} wieder verfügbar: {} (Karte {})", role, card.name, card.index)
+            if role == 'speaker':
+                self.audio.reopen_speaker()
+                continue
+            self.audio.reopen_earpiece()
+            if self.linphone is not None and self.linphone.is_running():
+                self.soundcard_pending = card
+                self.soundcard_plugged = perf_counter()
+                self.linphone.reload_soundcards()
+
+    def linphone_soundcard(self, index: int, name: str) -> None:
+        """Callback: Zeile von `soundcard list`, z.B. "1: ALSA: USB Audio Device" -> auf neu erkannte Karte wechseln"""
+        card = self.soundcard_pending
+        if card is None or card.name.lower() not in name.lower():
+            return
+        self.soundcard_pending = None
+        self.soundcard_index = index
+        if self.recorder is None:  # Anrufbeantworter nutzt Dateien, wechselt in finish_voicemail()
+            self.linphone.use_soundcard(index)
+        self.metrics.soundcard_switch_seconds.observe(perf_counter() - self.soundcard_plugged)
+        self.log.info("linphonec verwendet Soundkarte {}: {}", index, name)
+
+    def on_network_change(self) -> None:
+        """Callback: Netzwerk hat sich geändert oder linphonec wurde beendet -> Watchdog wecken"""
+        self.network_changed.set()
+
+    async def watchdog(self) -> None:
+        """
+        WLAN-Verbindung (und linphonec) prüfen. Ereignisgesteuert statt periodisch:
+        Geprüft wird bei Netlink-Ereignissen und wenn linphonec endet (die erste Prüfung erfolgt in start()).
+        Ohne Verbindung wird mit wachsendem Abstand (bis 60s) erneut geprüft,
+        mit Verbindung nur, falls `check_interval` konfiguriert ist (Standard: 0 = nie).
+        """
+        check_interval = self.config['Network'].getint('check_interval', fallback=0)
+        retry_interval = 1
+        while True:
+            if self.is_connected:
+                retry_interval = 1
+                if check_interval > 0:
+                    timeout = check_interval
+                else:
+                    # Ohne Netlink bleibt nur regelmäßiges Prüfen
+                    timeout = None if self.network_watch.available else 60
+            else:
+                # Erneut prüfen mit wachsendem Abstand, falls vorher keine Netzwerkänderung gemeldet wird
+                timeout = retry_interval
+                retry_interval = min(retry_interval * 2, 60)
+
+            # Schlafen bis zur nächsten Netzwerkänderung (oder Timeout)
+            try:
+                await asyncio.wait_for(self.network_changed.wait(), timeout)
+            except TimeoutError:
+                pass
+
+            self.state.wakeups.count('watchdog')
+            self.network_changed.clear()
+            await self.update_connection()
+
+    async def update_connection(self) -> bool:
+        """WLAN prüfen, linphonec bei Verbindung (neu) starten und bei Verbindungsverlust beenden"""
+        # linphonec-Prozess überwachen
+        if self.linphone is not None and not self.linphone.is_running():
+            self.linphone = None
+
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(
+                    self.config['Network']['wifi_test_host'], self.config['Network'].getint('wifi_test_port', fallback=80)
+                ),
+                timeout=1
+            )
+            writer.close()
+        except (TimeoutError, OSError):
+            # Verbindung war zuvor verfügbar
+            if self.is_connected:
+                self.is_connected = False
+                self.log.warning("WLAN-Verbindung wurde getrennt.")
+                self.metrics.wifi_flaps.inc()
+                self.metrics.wifi_connected.set(0)
+                self.report_status("WLAN-Verbindung getrennt")
+                self.publish('network', connected=False)
+
+                # linphonec beenden
+                if self.linphone is not None:
+                    self.linphone.terminate()
+                    self.linphone = None
+            return False
+
+        # Verbindung war zuvor nicht verfügbar (oder es handelt sich um den ersten Startvorgang)
+        if not self.is_connected:
+            self.log.info("WLAN-Verbindung verfügbar.")
+            self.is_connected = True
+            self.metrics.wifi_connected.set(1)
+            self.report_status("Bereit")
+            self.publish('network', connected=True)
+
+        # linphonec (neu) starten
+        if self.linphone is None:
+            self.start_linphonec()
+        return True
+
+    def is_hungup(self) -> bool:
+        """Prüfe, ob Hörer auf Gabel liegt (aufgelegt ist), entprellter Zustand"""
+        if self.hook is None:
+            return GPIO.input(self.hook_pin)
+        return self.hook.on_hook
+
+    def hook_event(self, event: str) -> None:
+        """Callback: Gabelkontakt entprellt (läuft in der Event-Loop)"""
+
+        if event == HookSwitch.FLASH:
+            self.metrics.hook_events.inc(state="flash")
+            self.hook_flash()
+            return
+
+        if event == HookSwitch.ON_HOOK:
+            if self.state.is_in(CallState.IDLE, CallState.RINGING):
+                # Hörer lag bereits auf (z.B. abgehoben während des Startvorgangs)
+                return
+
+            if self.state.is_in(CallState.VOICEMAIL):
+                # Anrufbeantworter zeichnet weiter auf
+                self.log.info("Hörer aufgelegt")
+                self.metrics.hook_events.inc(state="on")
+                self.audio.stop_earpiece()
+                return
+
+            # Hörer wurde soeben aufgelegt
+            self.log.info("Hörer aufgelegt")
+            self.metrics.hook_events.inc(state="on")
+
+            # Wählvorgang beenden, falls aktiv
+            self.dial.end_dialing()
+            if self.dialing_timeout is not None:
+                self.dialing_timeout.cancel()
+
+            # Laufenden Kurzbefehl abbrechen
+            if self.action_task is not None:
+                self.action_task.cancel()
+
+            # Wiedergabe (Freizeichen, Besetzt, usw.) im Hörer stoppen
+            self.audio.stop_earpiece()
+
+            # Auflegen (auch gehaltene und anklopfende Anrufe)
+            if self.linphone is not None:
+                self.linphone.hangup_all()
+            if self.intercom is not None:
+                self.intercom.hangup_all()
+            self.end_call()
+            self.end_other_call()
+
+            # Stoppe Timer für maximale Gesprächsdauer
+            if self.call_duration_timeout is not None:
+                self.call_duration_timeout.cancel()
+
+            self.state.transition(CallState.IDLE)
+
+        else:
+            if self.state.is_in(CallState.VOICEMAIL):
+                # Leitung ist belegt, bis der Anrufbeantworter fertig ist
+                self.log.info("Hörer abgehoben, Anrufbeantworter zeichnet auf.")
+                self.metrics.hook_events.inc(state="off")
+                self.audio.play_earpiece(self.config['Sounds']['waehlen_besetzt'], repeat=True)
+                return
+
+            if not self.state.is_in(CallState.IDLE, CallState.RINGING):
+                # Hörer war bereits abgehoben
+                return
+
+            # Hörer wurde soeben abgehoben
+            self.log.info("Hörer abgehoben")
+            self.metrics.hook_events.inc(state="off")
+
+            # Eingehender Anruf
+            if self.state.is_in(CallState.RINGING):
+                self.answer_call()
+                return
+
+            if self.telephony_available() or (self.intercom is not None and self.intercom.current_peers()):
+                # WLAN verbunden und Linphone verfügbar (oder interne Anrufe möglich): Freizeichen im Hörer abspielen
+                self.audio.play_earpiece(self.config['Sounds']['waehlen_frei'])
+            else:
+                # Telefonie nicht verfügbar: Besetztton im Hörer abspielen
+                self.audio.play_earpiece(self.config['Sounds']['waehlen_nicht_verbunden'])
+
+            # Nummernschalter überwachen
+            self.dial.start_dialing()
+            self.state.transition(CallState.DIALING)
+
+            # Maximale Dauer des Wählvorgangs begrenzen
+            self.dialing_timeout = self.state.call_later(
+                self.config['SIP'].getint('dial_timeout', fallback=60),
+                self.cancel_dialing
+            )
+
+    def cancel_dialing(self) -> None:
+        """Timer: Wählvorgang nach einer Minute automatisch abbrechen"""
+        self.log.info("Wählvorgang nach Timeout automatisch abgebrochen.")
+        self.dial.end_dialing()
+        self.audio.play_earpiece(self.config['Sounds']['waehlen_besetzt'], repeat=True)
+        self.state.transition(CallState.BUSY)
+
+    def receive_number(self, number: str) -> None:
+        """
+        Callback: Ziffernfolge von rotarydial empfangen -> mit gespeicherten Kurzwahlen/Befehlen abgleichen
+        Nummer muss zwingend `str` sein, da sie mit einer 0 beginnen kann.
+        """
+
+        # Ziffer kam nach Auflegen, Timeout o.ä. noch aus dem Decoder-Thread an
+        if not self.state.is_in(CallState.DIALING):
+            return
+
+        self.log.debug("Gewählte Ziffernfolge: {}", number)
+        action = self.config['Numbers'].get(number)
+        if action is None and self.intercom is not None and self.intercom.find(number) is not None:
+            action = number  # Interne Durchwahl eines anderen Telefons (Gegensprechanlage)
+        if action is None:
+            # Ziffernfolge nicht hinterlegt
+
+            # Bereits zu viele Ziffern gewählt
+            if len(number) > 5:
+                self.log.info("Ziffernfolge zu lang, beende Wahlvorgang.")
+                self.dial.end_dialing()
+                self.audio.play_earpiece(self.config['Sounds']['waehlen_ungueltig'])
+                self.state.transition(CallState.BUSY)
+
+            return
+
+        self.log.info("Gewählt: {} -> {}", number, action)
+        self.dial.end_dialing()
+        self.dialing_timeout.cancel()
+        self.audio.stop_earpiece()
+
+        if action in SHORTCUTS:
+            self.state.transition(CallState.ACTION)
+            self.action_task = asyncio.create_task(self.run_action(action))
+
+        elif not self.place_call(action, contact=number):
+            self.audio.play_earpiece(self.config['Sounds']['waehlen_besetzt'])
+            self.state.transition(CallState.BUSY)
+
+    def receive_dtmf(self, digit: str) -> None:
+        """Callback: Ziffer im Gespräch gewählt -> sofort als DTMF senden"""
+        if not self.state.is_in(CallState.IN_CALL) or self.linphone is None:
+            return
+        self.linphone.send_dtmf(digit)
+        self.metrics.dtmf_digits.inc()
+        self.metrics.dtmf_latency_seconds.observe((monotonic_ns() - self.dial.last_pulse_ns) / 1e9)
+        self.log.debug("DTMF gesendet: {}", digit)
+
+    def end_dtmf(self, old: CallState, new: CallState) -> None:
+        """Zustandswechsel: Gespräch verlassen -> Nummernschalter nicht mehr für DTMF abtasten"""
+        if old is CallState.IN_CALL and self.dial is not None:
+            self.dial.end_dtmf()
+
+    def telephony_available(self) -> bool:
+        return self.is_connected and self.linphone is not None and self.linphone.is_running()
+
+    def is_intercom(self, call_id: int | str | None) -> bool:
+        """Interner Anruf über die Gegensprechanlage (statt über linphonec)"""
+        return self.intercom is not None and call_id in self.intercom.calls
+
+    def line(self, call_id: int | str | None) -> 'Linphone | Intercom | None':
+        """Leitung eines Anrufs: Gegensprechanlage oder linphonec (beide mit answer/hangup)"""
+        return self.intercom if self.is_intercom(call_id) else self.linphone
+
+    def place_call(self, number: str, contact: str | None = None) -> bool:
+        """Ausgehenden Anruf starten (nach Wahl am Nummernschalter oder über die Steuerungs-API)"""
+        # Interne Durchwahl: direkt über die Gegensprechanlage, auch ohne SIP-Server
+        peer = self.intercom.find(number) if self.intercom is not None else None
+        if peer is None and not self.telephony_available():
+            self.calls.finish(self.calls.begin("out", number, contact=contact), reason="offline")
+            return False
+
+        self.log.info("Rufe Nummer an: {}", number if peer is None else f"{number} ({peer.name}, intern)")
+        self.metrics.calls.inc(direction="out")
+        self.call_setup_started = perf_counter()
+        if peer is not None:
+            self.current_call = self.calls.begin("out", number, contact=peer.name if contact in (None, number) else contact)
+            self.current_call_id = self.intercom.call(number)
+        else:
+            self.current_call = self.calls.begin("out", number, contact=contact)
+            self.linphone.call(number)
+        self.state.transition(CallState.IN_CALL)
+
+        # Starte Timer für maximale Gesprächsdauer ausgehender Anrufe
+        call_duration = self.config['SIP'].getint('max_call_duration', fallback=0)
+        if call_duration > 0:
+            self.log.info("Maximale Anrufdauer: {} Minuten", call_duration)
+            self.call_duration_timeout = self.state.call_later(call_duration * 60, self._timeout_call)
+        return True
+
+    def answer_call(self) -> None:
+        """Klingelnden Anruf annehmen (Hörer abgehoben oder Steuerungs-API)"""
+        self.cancel_voicemail_timer()
+
+        # Wiedergabe im Hörer (nur zur Sicherheit; hier sollte nichts laufen) und Klingeln stoppen
+        self.audio.stop_earpiece()
+        self.audio.stop_speaker()
+
+        # Anruf annehmen
+        self.call_setup_started = perf_counter()
+        self.line(self.current_call_id).answer()
+        self.state.transition(CallState.IN_CALL)
+
+    def hangup_call(self) -> None:
+        """Klingelnden oder laufenden Anruf beenden (Steuerungs-API); Hörer abgehoben: Besetztton"""
+        if self.state.is_in(CallState.VOICEMAIL):
+            self.linphone.hangup()  # Aufzeichnung endet in hung_up()
+            return
+
+        self.cancel_voicemail_timer()
+        if self.call_duration_timeout is not None:
+            self.call_duration_timeout.cancel()
+        self.audio.stop_speaker()
+        line = self.line(self.current_call_id)
+        if line is not None:
+            line.hangup()
+        self.end_call()
+
+        if self.is_hungup():
+            self.state.transition(CallState.IDLE)
+        else:
+            self.audio.play_earpiece(self.config['Sounds']['waehlen_besetzt'])
+            self.state.transition(CallState.BUSY)
+
+    def remote_dial(self, number: str) -> None:
+        """Steuerungs-API: Kurzwahl oder Rufnummer anrufen, bei aufgelegtem Hörer oder während des Wählvorgangs"""
+        if not self.state.is_in(CallState.IDLE, CallState.DIALING):
+            raise ValueError(f"Telefon ist beschäftigt ({self.state.state.value})")
+
+        contact = None
+        if number in self.config['Numbers']:
+            contact, number = number, self.config['Numbers'][number]
+        if number in SHORTCUTS:
+            raise ValueError(f"{number} ist ein Kurzbefehl, siehe Befehl 'action'")
+
+        dialing = self.state.is_in(CallState.DIALING)
+        if dialing:
+            self.dial.end_dialing()
+            self.dialing_timeout.cancel()
+            self.audio.stop_earpiece()
+
+        if not self.place_call(number, contact=contact):
+            if dialing:
+                self.audio.play_earpiece(self.config['Sounds']['waehlen_besetzt'])
+                self.state.transition(CallState.BUSY)
+            raise ValueError("Telefonie nicht verfügbar")
+
+    def remote_answer(self) -> None:
+        """Steuerungs-API: klingelnden Anruf annehmen"""
+        if not self.state.is_in(CallState.RINGING):
+            raise ValueError("Kein eingehender Anruf")
+        self.answer_call()
+
+    def remote_hangup(self) -> None:
+        """Steuerungs-API: klingelnden oder laufenden Anruf beenden"""
+        if not self.state.is_in(CallState.RINGING, CallState.IN_CALL, CallState.VOICEMAIL):
+            raise ValueError("Kein Anruf aktiv")
+        self.hangup_call()
+
+    def remote_action(self, action: str) -> None:
+        """Steuerungs-API: Kurzbefehl bei aufgelegtem Hörer ausführen"""
+        if action not in SHORTCUTS:
+            raise ValueError(f"Unbekannter Kurzbefehl: {action}")
+        if not self.state.is_in(CallState.IDLE):
+            raise ValueError(f"Telefon ist beschäftigt ({self.state.state.value})")
+        self.action_task = asyncio.create_task(self.run_action(action))
+
+    def publish(self, event: str, **fields) -> None:
+        """Ereignis an Abonnenten (Steuerungs-API) melden, kostet ohne Abonnenten nichts"""
+        for subscriber in self.subscribers:
+            subscriber(self.name, event, fields)
+
+    def snapshot(self) -> dict:
+        """Aktueller Zustand für die Steuerungs-API"""
+        call = None
+        if self.current_call is not None:
+            call = {
+                'direction': self.current_call.direction,
+                'number': self.current_call.number,
+                'contact': self.current_call.contact,
+                'start': self.current_call.start,
+                'answer': self.current_call.answer,
+                'held': self.linphone is not None and self.current_call_id in self.linphone.paused,
+                'internal': self.is_intercom(self.current_call_id),
+                'waiting': self.other_call.number if self.other_call is not None else None,
+            }
+        return {
+            'phone': self.name,
+            'state': self.state.state.value,
+            'hook': "on" if self.is_hungup() else "off",
+            'connected': self.is_connected,
+            'linphonec_running': self.linphone is not None and self.linphone.is_running(),
+            'night_mode': self.night_light_timer is not None,
+            'sleep_music': self.sleep_music_task is not None,
+            'dnd': self.manual_dnd,
+            'call': call,
+            'messages': self.mailbox.new_count if self.mailbox is not None else None,
+            'audio': self.audio_present,
+        }
+
+    async def run_action(self, action: str) -> None:
+        """Kurzbefehl ausführen (Task in der Event-Loop, wartet ohne zu blockieren)"""
+
+        match action:
+            case "enable-night-mode":
+                self.start_night_mode()
+                await Audio.wait(self.audio.play_speaker(self.config['Sounds']['action_confirmed']))
+                await asyncio.sleep(1)
+
+            case "play-sleep-music":
+                # Dieser Fall sollte eigentlich nicht eintreten, da mit Abheben des Hörers die Wiedergabe stoppt
+                if self.sleep_music_task is not None:
+                    self.log.info("Schlafmusik läuft bereits.")
+                    return
+
+                self.sleep_music_task = asyncio.create_task(self.start_sleep_music())
+                return
+
+            case "play-messages":
+                await self.play_messages()
+
+            case "test-loudspeaker":
+                await Audio.wait(self.audio.play_speaker(self.config['Sounds']['test_loud']))
+                await asyncio.sleep(1)
+
+            case "test-earpiece":
+                await asyncio.sleep(0.5)
+                await Audio.wait(self.audio.play_earpiece(self.config['Sounds']['test_earpiece']))
+                await asyncio.sleep(1)
+
+            case "reboot":
+                await Audio.wait(self.audio.play_speaker(self.config['Sounds']['reboot']))
+                system("systemctl reboot -i")
+                self.request_terminate()
+                return
+
+            case "shutdown":
+                await Audio.wait(self.audio.play_speaker(self.config['Sounds']['shutdown']))
+                system("systemctl poweroff -i")
+                self.request_terminate()
+                return
+
+        if self.state.is_in(CallState.ACTION) and not self.is_hungup():
+            # Hörer noch nicht aufgelegt
+            self.audio.play_earpiece(self.config['Sounds']['waehlen_besetzt'])
+            self.state.transition(CallState.BUSY)
+
+    async def start_sleep_music(self, started: float | None = None) -> None:
+        """Einschlafmusik starten (eigener Task); nach Neustart ab der Stelle seit `started` (Unix-Zeit)"""
+        sleep_music = self.config['Sounds'].get('sleep_music', fallback=None)
+        if sleep_music is None:
+            self.log.warning("Kann Einschlafmusik nicht starten: keine Datei angegeben!")
+            self.sleep_music_task = None
+            return
+
+        self.log.info("Spiele Einschlafmusik.")
+        self.manual_dnd = True
+        self.sleep_music_started = started if started is not None else time()
+        self.save_state()
+        # Versatz nur beim Fortsetzen: sonst bleibt der schnellere Weg über aplay (WAV) möglich
+        offset = max(0.0, time() - started) if started is not None else 0
+        await Audio.wait(self.audio.play_speaker(sleep_music, offset=offset))
+
+        self.log.debug("Einschlafmusik abgespielt.")
+
+        # DND abschalten, falls Nachtlicht nicht aktiv ist
+        if self.night_light_timer is None:
+            self.manual_dnd = False
+            self.update_message_indicator()
+
+        self.sleep_music_task = None
+        self.sleep_music_started = None
+        self.save_state()
+
+    def start_night_mode(self) -> None:
+        """Nachtmodus starten: Nachtlicht aktivieren, Aufwachlicht zu den konfigurierten Zeiten"""
+
+        if self.led.wake_light_pin is None and self.led.night_light_pin is None:
+            self.log.warning("Kann Nachtmodus nicht aktivieren: Weder Nachtlicht noch Aufwachlicht sind konfiguriert.")
+            return
+
+        # Aufwachlicht abschalten
+        self.led.wake_light_off()
+
+        # Nachtmodus bereits aktiv: Nachtmodus stattdessen beenden
+        if self.night_light_timer is not None:
+            self.log.info("Deaktiviere Nacht-/Aufwachlicht.")
+            self.night_light_timer.cancel()
+            self.night_light_timer = None
+            self.wake_up_time = None
+            self.led.night_light_off()
+            self.manual_dnd = False
+            self.update_message_indicator()
+            self.save_state()
+            return
+
+        # Nachtlicht einschalten, Anzeige für wartende Nachrichten aus
+        self.manual_dnd = True
+        self.led.night_light_on()
+        self.update_message_indicator()
+
+        # Timer für nächsten Morgen aktivieren
+        wake_up_time = self.next_wake_up(datetime.now().astimezone())
+        if wake_up_time is None:
+            self.log.warning("Kann Nachtmodus nicht aktivieren: Wochentage für wake_up_times unvollständig!")
+            self.save_state()
+            return
+
+        self.log.info("Aktiviere Nachtlicht bis {}.", wake_up_time)
+        self.schedule_night_mode(wake_up_time)
+
+    def next_wake_up(self, now: datetime) -> datetime | None:
+        """
+        Nächste Aufwachzeit laut `wake_up_times` nach `now`: heute (nach Mitternacht) oder morgen (vor Mitternacht).
+        Lokale Zeit mit der Zeitzone des jeweiligen Tages, damit Abstände über eine Zeitumstellung stimmen
+        """
+        wake_up_times = self.config['Misc'].get('wake_up_times', fallback='').split(',')
+        if len(wake_up_times) != 7:
+            return None
+        for day in (now.date(), now.date() + timedelta(days=1)):
+            wake_up_time = datetime.combine(day, datetime.strptime(wake_up_times[day.weekday()], '%H:%M').time())
+            wake_up_time = wake_up_time.astimezone()  # Ohne Zeitzone: lokale Zeit an diesem Tag
+            if wake_up_time >= now:
+                return wake_up_time
+        return None
+
+    def schedule_night_mode(self, wake_up_time: datetime) -> None:
+        """
+        Nacht- und Aufwachlicht für `wake_up_time` anhand der aktuellen Uhrzeit einstellen, auch nach einem Neustart
+        mitten in der Nacht, im Sonnenaufgang oder danach. Sonnenaufgang beginnt so, dass zur Aufwachzeit die volle
+        Helligkeit erreicht ist, danach bleibt das Licht WAKE_LIGHT_SECONDS eingeschaltet
+        """
+        sunrise = self.config['Misc'].getfloat('sunrise_minutes', fallback=30) * 60
+        until_sunrise = (wake_up_time - datetime.now().astimezone()).total_seconds() - sunrise
+        if until_sunrise + sunrise + self.WAKE_LIGHT_SECONDS <= 0:
+            self.log.info("Nachtmodus bis {} ist bereits abgelaufen.", wake_up_time)
+            self.wake_up_time = None
+            self.manual_dnd = False
+            self.update_message_indicator()
+            self.save_state()
+            return
+
+        self.wake_up_time = wake_up_time
+        self.manual_dnd = True
+        self.led.night_light_on()
+        self.update_message_indicator()
+        if until_sunrise > 0:
+            self.night_light_timer = self.state.call_later(until_sunrise, self.start_wakeup_light)
+        else:
+            self.start_wakeup_light(elapsed=-until_sunrise)
+        self.save_state()
+
+    def start_wakeup_light(self, elapsed: float = 0) -> None:
+        """
+        Aufwachlicht (zusätzlich zu Nachtlicht) langsam heller werden lassen, danach zwei Stunden eingeschaltet.
+        `elapsed`: Sekunden seit Beginn des Sonnenaufgangs (Fortsetzen nach Neustart)
+        """
+        sunrise = self.config['Misc'].getfloat('sunrise_minutes', fallback=30) * 60
+        self.log.info("Aktiviere Aufwachlicht, Sonnenaufgang über {:.0f} Minuten.", sunrise / 60)
+        if sunrise > elapsed:
+            self.led.sunrise(self.state.call_later, sunrise - elapsed, progress=elapsed / sunrise)
+        else:
+            self.led.night_light_on(duty_cycle=100)  # Nachtlicht heller stellen
+            self.led.wake_light_on()
+        self.night_light_timer = self.state.call_later(
+            sunrise + self.WAKE_LIGHT_SECONDS - elapsed, self.stop_wakeup_light
+        )
+
+    def stop_wakeup_light(self) -> None:
+        """Nacht- und Aufwachlicht abschalten"""
+        self.log.info("Deaktiviere Aufwachlicht.")
+        self.led.night_light_off()
+        self.night_light_timer = None
+        self.wake_up_time = None
+        self.manual_dnd = False
+        self.update_message_indicator()
+        self.led.wake_light_off()
+        self.save_state()
+
+    def linphone_booted(self) -> None:
+        """Callback: linphonec gestartet"""
+        self.linphone_ready.set()
+        # Während des Startvorgangs übernimmt start() den Bootsound, sobald die LEDs eingerichtet sind
+        if self.wifi_test_task is not None:
+            self.announce_boot()
+
+    def announce_boot(self) -> None:
+        """Bootsound beim ersten Start von linphonec abspielen"""
+        if self.first_boot:
+            self.first_boot = False
+            self.audio.play_speaker(self.config['Sounds']['boot'])
+            self.led.wake_light_off()
+
+    def incoming_call(self, caller: str, call_id: int | None = None) -> None:
+        """Callback: Eingehender Anruf"""
+        self.log.info("Eingehender Anruf von {}", caller)
+
+        self.metrics.calls.inc(direction="in")
+
+        # Anruf in bestimmten Situationen abweisen
+        now = datetime.now()
+        if not self.state.is_in(CallState.IDLE):                   # Hörer ist abgehoben
+            reject_reason = "offhook"
+        elif (
+            (0 < now.hour <= self.config['SIP'].getint("dnd_to")) or    # Nicht stören: Morgens
+            (0 < self.config['SIP'].getint("dnd_from") <= now.hour) or  # Nicht stören: Abends
+            self.manual_dnd                                        # Nicht stören: Manuell (Nachtmodus)
+        ):
+            reject_reason = "dnd"
+        else:
+            reject_reason = None
+
+        # Interner Anruf (Gegensprechanlage): ohne Anklopfen, Anrufbeantworter und Whitelist
+        internal = self.is_intercom(call_id)
+
+        # Anklopfen: zweiter Anruf während eines Gesprächs, annehmen per Flash
+        waiting = (
+            reject_reason == "offhook" and not internal and call_id is not None and self.other_call is None
+            and self.state.is_in(CallState.IN_CALL) and self.config['SIP'].getboolean('call_waiting', fallback=False)
+        )
+        if waiting:
+            reject_reason = None
+
+        # Klingelsperre: Anrufbeantworter nimmt sofort und ohne Klingeln an, statt abzuweisen
+        voicemail = (
+            reject_reason == "dnd" and self.mailbox is not None and not internal
+            and self.config.getboolean('Voicemail', 'dnd', fallback=True)
+        )
+        if voicemail:
+            reject_reason = None
+
+        contact = self.find_contact(caller)
+        if internal and contact is None:
+            contact = self.intercom.calls[call_id].peer.name
+        record = self.calls.begin("in", caller, contact=contact)
+
+        if reject_reason is not None:
+            self.log.info("Hörer ist abgehoben oder Klingelsperre ist aktiv: weise Anruf ab")
+            self.metrics.calls_rejected.inc(reason=reject_reason)
+            self.calls.finish(record, reason=reject_reason)
+            self.publish('incoming', number=caller, contact=contact, rejected=reject_reason)
+            self.reject_call(call_id)
+            return
+
+        # Whitelist ist aktiv
+        if self.config['SIP'].getboolean("whitelist_active") and not internal:
+            self.log.debug("Whitelist aktiv, prüfe Anrufer.")
+
+            if contact is None:
+                self.log.info("Anrufer nicht in hinterlegten Nummbern: weise Anruf ab")
+                self.metrics.calls_rejected.inc(reason="whitelist")
+                self.calls.finish(record, reason="whitelist")
+                self.publish('incoming', number=caller, contact=contact, rejected="whitelist")
+                self.reject_call(call_id)
+                return
+
+        if waiting:
+            self.log.info("Anruf wartet (Anklopfen), annehmen mit Flash.")
+            self.other_call = record
+            self.other_call_id = call_id
+            self.publish('incoming', number=caller, contact=contact, rejected=None, waiting=True)
+            return
+
+        self.current_call = record
+        self.current_call_id = call_id
+        self.publish('incoming', number=caller, contact=contact, rejected=None, waiting=False)
+
+        if voicemail:
+            self.start_voicemail()
+            return
+
+        self.state.transition(CallState.RINGING)
+
+        # Anrufbeantworter nach N Klingelzeichen
+        if self.mailbox is not None and not internal:
+            self.voicemail_timer = self.state.call_later(
+                self.config.getint('Voicemail', 'rings', fallback=5)
+                * self.config.getfloat('Voicemail', 'ring_seconds', fallback=5),
+                self.start_voicemail
+            )
+
+        # Klingelton spielen
+        try:
+            self.audio.play_speaker(self.config['Ringtones'][caller], repeat=True)
+        except KeyError:
+            self.audio.play_speaker(self.config['Sounds']['ring'], repeat=True)
+
+    def find_contact(self, caller: str) -> str | None:
+        """Kurzwahl zur Rufnummer, auch wenn Anrufer und [Numbers] unterschiedliche Formate verwenden"""
+        if caller.startswith('00'):
+            # International format without plus sign: e.g. 0049891234 => also check for +49891234
+            caller_alt_format = f'+{caller.removeprefix('00')}'
+
+        elif caller.startswith('0'):
+            # National format: e.g. 0891234 => also check for +49891234
+            # Note: Country-specific prefix (+49) is currently not configurable
+            caller_alt_format = f'+49{caller.removeprefix('0')}'
+
+        elif caller.startswith('+'):
+            # International format with plus sign: e.g. +49891234 => also check for 0049891234
+            caller_alt_format = f'00{caller.removeprefix('+')}'
+
+        else:
+            # Unknown => No additional check
+            caller_alt_format = None
+
+        return self.contacts.get(caller) or self.contacts.get(caller_alt_format)
+
+    def reject_call(self, call_id: int | None) -> None:
+        """Eingehenden Anruf abweisen, ohne ein laufendes Gespräch zu beenden"""
+        if call_id is None:
+            self.linphone.hangup()  # hung_up() ignoriert das Gesprächsende, da kein Klingeln/Gespräch aktiv
+            return
+        self.rejected_calls.add(call_id)
+        self.line(call_id).hangup(call_id)
+
+    def call_connected(self, call_id: int | None = None) -> None:
+        """Callback: Gespräch verbunden"""
+        if self.state.is_in(CallState.VOICEMAIL):
+            return  # Anrufbeantworter: Anruf gilt weiterhin als nicht angenommen
+        if self.current_call_id is None:
+            self.current_call_id = call_id  # Ausgehender Anruf
+        setup_seconds = None
+        if self.call_setup_started is not None:
+            setup_seconds = perf_counter() - self.call_setup_started
+            self.metrics.call_setup_seconds.observe(setup_seconds)
+            self.call_setup_started = None
+        if self.current_call is not None and self.current_call.answer is None:
+            self.calls.answered(self.current_call, setup_seconds)
+        if self.state.is_in(CallState.IN_CALL) and not self.is_intercom(call_id):
+            self.dial.start_dtmf()  # Kein DTMF über die Gegensprechanlage
+        if self.performance is not None:
+            self.performance.refresh()  # Audioprozesse des Gesprächs (Gegensprechanlage) ebenfalls anheben
+        self.publish('connected')
+
+    def end_call(self) -> None:
+        """Klingelnden oder laufenden Anruf in die Anrufliste übernehmen"""
+        self.current_call_id = None
+        if self.current_call is not None:
+            self.calls.finish(self.current_call)
+            self.current_call = None
+            self.publish('call_ended')
+
+    def end_other_call(self) -> None:
+        """Anklopfenden oder gehaltenen zweiten Anruf in die Anrufliste übernehmen"""
+        self.other_call_id = None
+        if self.other_call is not None:
+            self.calls.finish(self.other_call)
+            self.other_call = None
+            self.publish('call_ended', waiting=True)
+
+    def hook_flash(self) -> None:
+        """Flash im Gespräch: zum zweiten Anruf wechseln (Anklopfen annehmen), sonst Gespräch halten/fortsetzen"""
+        if not self.state.is_in(CallState.IN_CALL) or self.linphone is None:
+            return
+
+        if self.other_call is not None:
+            self.switch_calls()
+            return
+
+        if self.current_call_id is None or self.is_intercom(self.current_call_id):
+            return  # Verbindungsaufbau läuft noch bzw. interne Anrufe werden nicht gehalten
+
+        held = self.current_call_id not in self.linphone.paused
+        self.log.info("Flash: Gespräch {}.", "halten" if held else "fortsetzen")
+        if held:
+            self.linphone.pause(self.current_call_id)
+        else:
+            self.linphone.resume(self.current_call_id)
+        self.publish('hold', held=held)
+
+    def switch_calls(self) -> None:
+        """Zum anklopfenden bzw. gehaltenen zweiten Anruf wechseln, ein laufendes Gespräch wird gehalten"""
+        if self.other_call.answer is None:
+            self.log.info("Nehme wartenden Anruf von {} an.", self.other_call.number)
+            self.call_setup_started = perf_counter()
+            self.linphone.answer(self.other_call_id)
+        else:
+            self.log.info("Wechsle zum Gespräch mit {}.", self.other_call.number)
+            self.linphone.resume(self.other_call_id)
+
+        self.current_call, self.other_call = self.other_call, self.current_call
+        self.current_call_id, self.other_call_id = self.other_call_id, self.current_call_id
+        self.publish('hold', held=False, switched=True)
+
+    def _timeout_call(self) -> None:
+        """Timer: Maximale Gesprächsdauer für ausgehende Gespräche erreicht, beende Gespräch"""
+        self.log.info("Maximale Telefondauer erreicht. Gespräch wird beendet.")
+        self.line(self.current_call_id).hangup()
+        self.end_call()
+        self.audio.play_earpiece(self.config['Sounds']['waehlen_besetzt'])
+        self.state.transition(CallState.BUSY)
+
+    def hung_up(self, call_id: int | None = None) -> None:
+        """Callback: Gespräch wurde (durch uns oder Gegenseite) beendet"""
+        self.log.info("Anruf beendet")
+
+        # Anruf wurde durch uns abgewiesen - hier nichts weiter tun
+        if call_id in self.rejected_calls:
+            self.rejected_calls.discard(call_id)
+            return
+
+        # Anklopfender oder gehaltener zweiter Anruf beendet: laufendes Gespräch bleibt bestehen
+        if call_id is not None and call_id == self.other_call_id:
+            self.end_other_call()
+            return
+
+        if self.state.is_in(CallState.VOICEMAIL):
+            self.finish_voicemail()
+            return
+
+        # Anruf wurde bereits durch Auflegen beendet - hier nichts weiter tun
+        if not self.state.is_in(CallState.RINGING, CallState.IN_CALL):
+            return
+
+        self.cancel_voicemail_timer()
+
+        if self.call_duration_timeout is not None:
+            self.call_duration_timeout.cancel()
+        self.end_call()
+
+        if self.state.is_in(CallState.RINGING):
+            # Klingeln beenden
+            self.audio.stop_speaker()
+            self.state.transition(CallState.IDLE)
+            return
+
+        # Gegenseite hat aufgelegt, zweiter Anruf wartet oder wird gehalten: diesen übernehmen
+        if self.other_call is not None:
+            self.switch_calls()
+            return
+
+        # Gegenseite hat aufgelegt, Hörer ist noch abgehoben: Besetztton spielen
+        self.audio.play_earpiece(self.config['Sounds']['waehlen_besetzt'])
+        self.state.transition(CallState.BUSY)
+
+    def cancel_voicemail_timer(self) -> None:
+        if self.voicemail_timer is not None:
+            self.voicemail_timer.cancel()
+            self.voicemail_timer = None
+
+    def start_voicemail(self) -> None:
+        """Anrufbeantworter: Anruf annehmen, Ansage abspielen und Nachricht aufzeichnen"""
+        self.voicemail_timer = None
+        if self.current_call is None or not self.telephony_available():
+            return
+
+        self.log.info("Anrufbeantworter nimmt Anruf von {} an.", self.current_call.number)
+        self.audio.stop_speaker()
+
+        from lib.voicemail import Recorder
+        self.recorder = Recorder(
+            self.loop,
+            fifo=self.mailbox.directory / "record.fifo",
+            output=self.mailbox.path_for(self.current_call.number, self.config.get('Voicemail', 'format', fallback='ogg')),
+            buffer_size=self.config.getint('Voicemail', 'buffer_kb', fallback=64) * 1024,
+            encoder=self.config.get('Voicemail', 'encoder', fallback='sox')
+        )
+        try:
+            self.recorder.start()
+        except OSError as e:
+            self.log.warning("Anrufbeantworter: Kann Aufzeichnung nicht starten: {}", e)
+            self.recorder = None
+            return
+
+        greeting = self.config.get('Voicemail', 'greeting', fallback='')
+        if greeting != "" and not Path(greeting).exists():
+            self.log.warning("Anrufbeantworter: Ansage {} nicht gefunden.", greeting)
+            greeting = ""
+
+        self.linphone.answer_with_files(self.current_call_id, greeting, str(self.recorder.fifo))
+        self.state.transition(CallState.VOICEMAIL)
+        self.voicemail_timer = self.state.call_later(
+            self.config.getint('Voicemail', 'max_seconds', fallback=120),
+            self._timeout_voicemail
+        )
+
+    def _timeout_voicemail(self) -> None:
+        """Timer: Maximale Länge einer Nachricht erreicht"""
+        self.voicemail_timer = None
+        self.log.info("Anrufbeantworter: Maximale Länge erreicht, beende Anruf.")
+        self.linphone.hangup()
+
+    def finish_voicemail(self) -> None:
+        """Anrufbeantworter: Anruf beendet, Aufzeichnung abschließen"""
+        self.cancel_voicemail_timer()
+        if self.linphone is not None:
+            if self.soundcard_index is not None:
+                self.linphone.use_soundcard(self.soundcard_index)
+            else:
+                self.linphone.use_soundcard(self.config.getint('Voicemail', 'soundcard', fallback=0))
+
+        record = self.current_call
+        self.current_call = None
+        self.current_call_id = None
+        if record is not None:
+            self.calls.finish(record, reason="voicemail")
+            self.publish('call_ended')
+
+        if self.recorder is not None:
+            self.recorder.stop()
+            asyncio.create_task(self.store_message(self.recorder, record))
+            self.recorder = None
+
+        # Hörer wurde während der Aufzeichnung abgehoben: Besetztton läuft bereits
+        self.state.transition(CallState.IDLE if self.is_hungup() else CallState.BUSY)
+
+    async def store_message(self, recorder: 'Recorder', record: CallRecord | None) -> None:
+        """Warten, bis der Encoder fertig ist, dann Nachricht übernehmen (sehr kurze Aufzeichnungen verwerfen)"""
+        path = await recorder.finished
+        if recorder.bytes_dropped > 0:
+            self.metrics.voicemail_dropped_bytes.inc(recorder.bytes_dropped)
+            self.log.warning("Anrufbeantworter: {} Bytes verworfen (Encoder zu langsam).", recorder.bytes_dropped)
+
+        if path is None or recorder.seconds < self.config.getfloat('Voicemail', 'min_seconds', fallback=2):
+            self.log.info("Anrufbeantworter: Keine Nachricht hinterlassen.")
+            if path is not None:
+                path.unlink(missing_ok=True)
+            return
+
+        self.mailbox.add(path)
+        self.metrics.voicemail_messages.inc()
+        self.log.info("Anrufbeantworter: Nachricht ({:.0f}s) gespeichert: {}", recorder.seconds, path)
+        self.publish(
+            'voicemail',
+            number=record.number if record is not None else None,
+            contact=record.contact if record is not None else None,
+            seconds=round(recorder.seconds, 1),
+            messages=self.mailbox.new_count
+        )
+        self.update_message_indicator()
+
+    async def play_messages(self) -> None:
+        """Kurzbefehl: Neue Nachrichten im Hörer abspielen (älteste zuerst), danach als abgehört markieren"""
+        messages = self.mailbox.new_messages() if self.mailbox is not None else []
+        if len(messages) == 0:
+            self.log.info("Keine neuen Nachrichten.")
+            await Audio.wait(self.audio.play_earpiece(self.config['Sounds']['waehlen_besetzt']))
+            return
+
+        self.log.info("Spiele {} neue Nachricht(en).", len(messages))
+        for path in messages:
+            await asyncio.sleep(0.5)
+            await Audio.wait(self.audio.play_earpiece(str(path)))
+            # Bei Auflegen wird der Task abgebrochen: unterbrochene Nachricht bleibt neu
+            self.mailbox.mark_heard(path)
+            self.update_message_indicator()
+
+    def update_message_indicator(self) -> None:
+        """Wartende Nachrichten am Aufwachlicht anzeigen, außer bei Nicht stören (Nachtmodus, Schlafmusik)"""
+        if self.led is not None and self.mailbox is not None:
+            self.led.set_message_waiting(self.mailbox.new_count > 0 and not self.manual_dnd)
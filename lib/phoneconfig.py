@@ -0,0 +1,40 @@
+from configparser import ConfigParser
+
+# Name des Telefons, wenn kein Abschnitt [Phones] konfiguriert ist
+DEFAULT_PHONE = "piphone"
+
+
+def phone_configs(config: ConfigParser) -> dict[str, ConfigParser]:
+    """
+    Konfiguration je Telefon.
+    Ohne Abschnitt [Phones] gibt es genau ein Telefon, das die gesamte Konfiguration verwendet.
+    Mit `[Phones] names = empfang, buero` erhält jedes Telefon die gemeinsamen Abschnitte ([Pins], [SIP], ...),
+    überschrieben bzw. ergänzt durch seine eigenen Abschnitte ([empfang.Pins], [buero.SIP], ...).
+    """
+    if not config.has_section('Phones'):
+        return {DEFAULT_PHONE: config}
+
+    names = [name.strip() for name in config['Phones'].get('names', fallback='').split(',') if name.strip() != ""]
+    if len(names) == 0:
+        raise Exception("Abschnitt [Phones] enthält keine Telefone (names).")
+
+    shared = [section for section in config.sections() if '.' not in section and section != 'Phones']
+    phones = {}
+    for name in names:
+        phone = ConfigParser()
+        for section in shared:
+            phone[section] = {key: config.get(section, key, raw=True) for key in config[section]}
+
+        prefix = f"{name}."
+        for section in config.sections():
+            if not section.startswith(prefix):
+                continue
+            target = section.removeprefix(prefix)
+            if not phone.has_section(target):
+                phone.add_section(target)
+            for key in config[section]:
+                phone.set(target, key, config.get(section, key, raw=True))
+
+        phones[name] = phone
+
+    return phones
@@ -0,0 +1,173 @@
+import asyncio
+import sys
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from threading import Event, Thread, enumerate as threads, get_ident
+from time import perf_counter, strftime
+
+from lib.eventlog import get_logger
+from lib.metrics import ProcessStats
+
+log = get_logger('profiler')
+
+REPO = Path(__file__).resolve().parent.parent
+
+
+def _short(filename: str) -> str:
+    """Pfad im Repository relativ, sonst nur Verzeichnis und Datei (z.B. asyncio/base_events.py)"""
+    path = Path(filename)
+    if path.is_relative_to(REPO):
+        return str(path.relative_to(REPO))
+    return "/".join(path.parts[-2:])
+
+
+class Profiler:
+    """
+    Laufzeitprofil auf Anforderung (Signal oder Steuerungs-API), ohne den Dienst neu zu starten:
+    - Stichproben aller Threads (`sys._current_frames()`) aus einem eigenen Thread alle `interval_ms`;
+      ohne Messung entstehen keine Kosten, während der Messung etwa eine Stichprobe aller Stacks je Intervall
+    - CPU-Zeit je Thread laut Kernel über die Messdauer: zeigt, welcher Thread tatsächlich rechnet
+      (Stichproben zeigen auch wartende Threads)
+    - Speicher: tracemalloc während der Messung, Top-N der dabei belegten und noch nicht freigegebenen Blöcke
+    Der Bericht ist eine kurze Textdatei in `report_dir` (wie der Ringpuffer des Ereignisprotokolls).
+    """
+
+    # Konfiguration
+    report_dir: Path
+    interval: float
+    depth: int  # Rahmen je Stack (innerste zuerst)
+    top: int  # Stacks je Thread bzw. Allokationsstellen
+
+    # Zustand
+    task: asyncio.Task | None = None
+    last_report: Path | None = None
+
+    def __init__(self, report_dir: Path, interval_ms: float = 10, depth: int = 6, top: int = 10):
+        self.report_dir = report_dir
+        self.interval = interval_ms / 1000
+        self.depth = depth
+        self.top = top
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def start(self, seconds: float = 10) -> Path:
+        """Messung starten (in der Event-Loop), liefert den Pfad des Berichts; ValueError, falls bereits aktiv"""
+        if self.running:
+            raise ValueError("Profil wird bereits erstellt")
+        if not 0 < seconds <= 300:
+            raise ValueError("Dauer muss zwischen 0 und 300 Sekunden liegen")
+
+        path = self.report_dir / f"profile-{strftime('%Y%m%d-%H%M%S')}.txt"
+        log.info("Erstelle Profil über {:.0f}s: {}", seconds, path)
+        self.task = asyncio.create_task(self._profile(seconds, path))
+        return path
+
+    async def _profile(self, seconds: float, path: Path) -> None:
+        samples = Counter()
+        stop = Event()
+        sampler = Thread(target=self._sample, args=(stop, samples), name="profiler", daemon=True)
+
+        tracing = tracemalloc.is_tracing()  # z.B. PYTHONTRACEMALLOC: dann weiterlaufen lassen
+        if not tracing:
+            tracemalloc.start(1)
+        names = {thread.native_id: thread.name for thread in threads()}
+        cpu_before = ProcessStats.thread_cpu_seconds()
+        started = perf_counter()
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            stop.set()
+            elapsed = perf_counter() - started
+            cpu_after = ProcessStats.thread_cpu_seconds()
+            names.update((thread.native_id, thread.name) for thread in threads())
+            snapshot = tracemalloc.take_snapshot()
+            traced, peak = tracemalloc.get_traced_memory()
+            if not tracing:
+                tracemalloc.stop()
+
+        sampler.join()
+        report = await asyncio.to_thread(
+            self._report, elapsed, samples, names, cpu_before, cpu_after, snapshot, traced, peak
+        )
+        try:
+            self.report_dir.mkdir(parents=True, exist_ok=True)
+            path.write_text(report)
+        except OSError as e:
+            log.warning("Kann Profil nicht speichern: {}", e)
+            return
+        self.last_report = path
+        log.info("Profil gespeichert: {}", path)
+
+    def _sample(self, stop: Event, samples: Counter) -> None:
+        """Thread: Stacks aller Threads (außer diesem) zählen, Schlüssel (Thread-Name, Stack)"""
+        own = get_ident()
+        names = {}
+        while not stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                name = names.get(ident)
+                if name is None:
+                    names.update((thread.ident, thread.name) for thread in threads())
+                    name = names.setdefault(ident, str(ident))
+
+                stack = []
+                while frame is not None and len(stack) < self.depth:
+                    stack.append((frame.f_code.co_filename, frame.f_code.co_name, frame.f_lineno))
+                    frame = frame.f_back
+                samples[(name, tuple(stack))] += 1
+            samples[("profiler", ())] += 1  # Anzahl Durchläufe
+
+    def _report(
+            self,
+            elapsed: float,
+            samples: Counter,
+            names: dict[int, str],
+            cpu_before: dict[int, tuple[str, float]],
+            cpu_after: dict[int, tuple[str, float]],
+            snapshot: tracemalloc.Snapshot,
+            traced: int,
+            peak: int
+    ) -> str:
+        rounds = samples.pop(("profiler", ()), 0)
+        lines = [f"PiPhone-Profil {strftime('%Y-%m-%d %H:%M:%S')}: {elapsed:.1f}s, {rounds} Stichproben"
+                 f" à {self.interval * 1000:.0f}ms"]
+
+        # CPU je Thread, auch Threads, die während der Messung beendet wurden oder hinzukamen
+        lines += ["", "CPU je Thread (User + System):"]
+        cpu = []
+        for tid, (kernel_name, seconds) in cpu_after.items():
+            used = seconds - cpu_before.get(tid, (kernel_name, 0.0))[1]
+            cpu.append((used, names.get(tid, kernel_name), tid))
+        for used, name, tid in sorted(cpu, reverse=True):
+            lines.append(f"  {used:8.3f}s {used / elapsed * 100:5.1f}%  {name} ({tid})")
+
+        # Häufigste Stacks je Thread
+        lines += ["", "Stichproben je Thread (innerster Rahmen zuerst):"]
+        per_thread: dict[str, list[tuple[int, tuple]]] = {}
+        for (name, stack), count in samples.items():
+            per_thread.setdefault(name, []).append((count, stack))
+        for name, stacks in sorted(per_thread.items(), key=lambda item: -sum(count for count, _ in item[1])):
+            total = sum(count for count, _ in stacks)
+            lines.append(f"  {name}: {total}")
+            for count, stack in sorted(stacks, reverse=True)[:self.top]:
+                frames = " < ".join(f"{function} ({_short(file)}:{line})" for file, function, line in stack)
+                lines.append(f"    {count / total * 100:5.1f}%  {frames}")
+
+        # Speicher: während der Messung belegt und noch nicht freigegeben
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        lines += ["", f"Speicher (tracemalloc, seit Beginn der Messung): {traced / 1024:.1f} KiB belegt,"
+                      f" Spitze {peak / 1024:.1f} KiB"]
+        for stat in snapshot.statistics('lineno')[:self.top]:
+            frame = stat.traceback[0]
+            lines.append(f"  {stat.size / 1024:8.1f} KiB {stat.count:6} Blöcke  {_short(frame.filename)}:{frame.lineno}")
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,133 @@
+from pathlib import Path
+from time import sleep
+
+from RPi import GPIO
+
+from lib.eventlog import get_logger
+
+log = get_logger('pwm')
+
+# GPIO (BCM) -> Hardware-PWM-Kanal des SoC (dtoverlay=pwm-2chan,pin=18,func=2,pin2=19,func2=2)
+HARDWARE_CHANNELS: dict[int, int] = {12: 0, 18: 0, 13: 1, 19: 1}
+
+
+class PwmOutput:
+    """Ausgang mit einstellbarer Helligkeit (Duty in Prozent), 0 = aus"""
+
+    pin: int
+    frequency: float
+    duty: float = 0
+
+    def set(self, duty: float, frequency: float | None = None) -> None:
+        raise NotImplementedError
+
+    def off(self) -> None:
+        self.set(0)
+
+
+class SysfsPwm(PwmOutput):
+    """
+    Hardware-PWM über /sys/class/pwm: der SoC erzeugt das Signal, kein Thread und keine CPU-Last.
+    Setzt einen aktivierten PWM-Kanal voraus, z.B. `dtoverlay=pwm-2chan` in /boot/config.txt.
+    """
+
+    channel_dir: Path
+    _period_ns: int = 0
+    _enabled: bool = False
+
+    def __init__(self, pin: int, frequency: float, root: Path = Path("/sys/class/pwm"), chip: int = 0):
+        self.pin = pin
+        self.frequency = frequency
+        channel = HARDWARE_CHANNELS[pin]
+        chip_dir = root / f"pwmchip{chip}"
+        self.channel_dir = chip_dir / f"pwm{channel}"
+
+        if not self.channel_dir.exists():
+            (chip_dir / "export").write_text(str(channel))
+            # Kanalverzeichnis erscheint asynchron (udev setzt Berechtigungen)
+            for _ in range(100):
+                if self.channel_dir.exists():
+                    break
+                sleep(0.01)
+            else:
+                raise OSError(f"PWM-Kanal {self.channel_dir} nach Export nicht verfügbar")
+
+        self._write("enable", 0)
+        self._set_period(frequency)
+
+    def _write(self, name: str, value: int) -> None:
+        (self.channel_dir / name).write_text(str(value))
+
+    def _set_period(self, frequency: float) -> None:
+        period_ns = round(1e9 / frequency)
+        if period_ns == self._period_ns:
+            return
+        # duty_cycle darf period nie überschreiten: erst Duty zurücksetzen
+        self._write("duty_cycle", 0)
+        self._write("period", period_ns)
+        self._period_ns = period_ns
+        self.frequency = frequency
+
+    def set(self, duty: float, frequency: float | None = None) -> None:
+        if frequency is not None:
+            self._set_period(frequency)
+        self._write("duty_cycle", round(self._period_ns * min(max(duty, 0), 100) / 100))
+        self.duty = duty
+
+        enabled = duty > 0
+        if enabled != self._enabled:
+            self._write("enable", int(enabled))
+            self._enabled = enabled
+
+
+class SoftwarePwm(PwmOutput):
+    """
+    Software-PWM von RPi.GPIO (eigener Thread, CPU-Last steigt mit der Frequenz).
+    0% und 100% werden ohne PWM direkt geschaltet.
+    """
+
+    default_frequency: float
+    _pwm: GPIO.PWM | None = None
+
+    def __init__(self, pin: int, frequency: float):
+        self.pin = pin
+        self.frequency = frequency
+        self.default_frequency = frequency
+        GPIO.setup(pin, GPIO.OUT)
+        GPIO.output(pin, False)
+
+    def set(self, duty: float, frequency: float | None = None) -> None:
+        frequency = frequency or self.default_frequency
+        self.duty = duty
+
+        if 0 < duty < 100:
+            if self._pwm is None:
+                self._pwm = GPIO.PWM(self.pin, frequency)
+                self._pwm.start(duty)
+            else:
+                if frequency != self.frequency:
+                    self._pwm.ChangeFrequency(frequency)
+                self._pwm.ChangeDutyCycle(duty)
+            self.frequency = frequency
+            return
+
+        if self._pwm is not None:
+            self._pwm.stop()
+            self._pwm = None
+        self.frequency = frequency
+        GPIO.output(self.pin, duty >= 100)
+
+
+def create_pwm(pin: int, frequency: float, root: Path = Path("/sys/class/pwm"), backend: str = "auto") -> PwmOutput:
+    """Hardware-PWM, falls der Pin einen PWM-Kanal hat und dieser verfügbar ist, sonst Software-PWM"""
+    if backend != "software" and pin in HARDWARE_CHANNELS and (root / "pwmchip0").exists():
+        try:
+            output = SysfsPwm(pin, frequency, root=root)
+            log.debug("Hardware-PWM für Pin {}: {}", pin, output.channel_dir)
+            return output
+        except OSError as e:
+            log.warning("Hardware-PWM für Pin {} nicht verfügbar, nutze Software-PWM: {}", pin, e)
+
+    if backend == "hardware":
+        log.warning("Pin {} hat keinen verfügbaren Hardware-PWM-Kanal, nutze Software-PWM.", pin)
+    return SoftwarePwm(pin, frequency)
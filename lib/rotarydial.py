@@ -1,6 +1,6 @@
 from RPi import GPIO
-from time import time_ns, sleep
-from threading import Timer
+from time import monotonic_ns, time_ns, sleep
+from threading import Event, Thread
 from typing import Final
 
 
@@ -8,7 +8,8 @@ from typing import Final
 class RotaryDial:
 
     # Konstanten
-    SAMPLE_RATE: Final[int] = 5  # ms
+    SAMPLE_RATE: Final[int] = 1  # ms
+    NSA_DEBOUNCE: Final[int] = 10  # NSA muss so viele Abtastungen stabil sein (10 * 1ms)
     LOW_PULSE_DURATION: Final[int] = 20 / 5  # detection limit impulse duration low (20 / sampleRate)
     HIGH_PULSE_DURATION: Final[int] = 40 / 5  # detection limit impluse duration high (40 / sampleRate)
 
@@ -16,113 +17,169 @@ class RotaryDial:
     pin_nsi: int  # Nummern-Schalter-Impuls-Kontakt
     pin_nsa: int  # Nummern-Schalter-Arbeits- (oder Abschalte-)Kontakt
     receive_number_callback: callable
+    receive_dtmf_callback: callable = None  # Im Gespräch: jede Ziffer einzeln (DTMF)
 
     # Zustand
     dialing: bool = False
-    current_number: str
-    impulses: int
-    impulse_counter_is_running: bool = False
-
-    def __init__(self, pin_nsi: int, pin_nsa: int, receive_number_callback: callable):
+    dtmf: bool = False  # Im Gespräch: Decoder schläft, bis NSA schließt, und meldet genau eine Ziffer
+    current_number: str = ""
+    impulses: int = 0
+    samples: int = 0  # Abtastungen insgesamt (= Aufwachvorgänge des Decoder-Threads)
+    digits: int = 0  # Erkannte Ziffern insgesamt
+    decode_errors: int = 0  # Verworfene Ziffern (keine oder mehr als 10 Impulse)
+    last_pulse_ns: int = 0  # Zeitpunkt, zu dem der letzte Impuls erkannt wurde (Latenz bis DTMF)
+
+    # Ein einziger Decoder-Thread für die gesamte Laufzeit (statt eines Timer-Threads pro Ziffer)
+    _active: Event
+    _thread: Thread
+
+    def __init__(
+            self,
+            pin_nsi: int,
+            pin_nsa: int,
+            receive_number_callback: callable,
+            name: str = "rotarydial",
+            receive_dtmf_callback: callable = None
+    ):
         self.pin_nsi = pin_nsi
         self.pin_nsa = pin_nsa
         self.receive_number_callback = receive_number_callback
+        self.receive_dtmf_callback = receive_dtmf_callback
 
-        # GPIO.setmode(GPIO.BCM)  # Voraussetzung - Bereits in piphone.py erledigt
+        # GPIO.setmode(GPIO.BCM)  # Voraussetzung - Bereits in main() (piphone.py) erledigt
         GPIO.setup(self.pin_nsi, GPIO.IN, pull_up_down=GPIO.PUD_UP)
         GPIO.setup(self.pin_nsa, GPIO.IN, pull_up_down=GPIO.PUD_UP)
 
-    async def start_dialing(self):
-        """Wählvorgang starten"""
+        self._active = Event()
+        self._thread = Thread(target=self._decode, name=name, daemon=True)
+        self._thread.start()
+
+    @property
+    def native_id(self) -> int:
+        """Thread-ID des Decoders im Kernel (für Echtzeitpriorität und CPU-Affinität)"""
+        return self._thread.native_id
+
+    def start_dialing(self):
+        """Wählvorgang starten: Decoder-Thread wecken"""
 
         #print("Starte Wählvorgang")
-        self.dialing = True
         self.current_number = ""
+        self.impulses = 0
+        self.dialing = True
+        self._active.set()
+
+    def end_dialing(self):
+        """Wählvorgang sanft beenden"""
+        if self.dialing:
+            #print("Beende Wählvorgang...")
+            self.dialing = False
+            self._active.clear()
+
+    def start_dtmf(self):
+        """Gespräch: Ziffern einzeln melden. Ohne Wählvorgang wird nicht abgetastet, NSA weckt den Decoder"""
+        if self.receive_dtmf_callback is None or self.dtmf:
+            return
+        self.end_dialing()
+        self.dtmf = True
+        GPIO.add_event_detect(self.pin_nsa, GPIO.FALLING, callback=self._nsa_closed)
+
+    def end_dtmf(self):
+        """Gespräch beendet"""
+        if self.dtmf:
+            self.dtmf = False
+            GPIO.remove_event_detect(self.pin_nsa)
+            self.end_dialing()
+
+    def _nsa_closed(self, channel: int):
+        """GPIO-Thread: Wählscheibe wird aufgezogen -> Decoder für eine Ziffer wecken"""
+        if self.dtmf and not self.dialing:
+            self.current_number = ""
+            self.impulses = 0
+            self.dialing = True
+            self._active.set()
+
+    def _decode(self):
+        """Decoder-Thread: schläft ohne Wählvorgang, sonst wird der Nummernschalter abgetastet"""
+        while True:
+            self._active.wait()
+            self._sample()
+            #print("Wählvorgang beendet")
+
+    def _sample(self):
+        """NSA entprellen und NSI-Impulse zählen, Schleife alle 1ms - darf keine langsamen Operationen enthalten!"""
+
         nsa_low_count = 0
         nsa_high_count = 0
-        self.impulses = 0
-        
+        counting = False
+        low_pulse = 0  # count nsi period low
+        high_pulse = 0  # count nsi period high
+
+        last_start = time_ns()
         while self.dialing:
 
             # NSA = 0 -> Wählvorgang läuft
             if not GPIO.input(self.pin_nsa):
-            
+
                 nsa_high_count = 0
-                
-                if nsa_low_count > 10:
+
+                if nsa_low_count > self.NSA_DEBOUNCE:
                     # we have long enough a low signal
-                    if not self.impulse_counter_is_running:
-                        self.impulse_counter_is_running = True
-                        Timer(self.SAMPLE_RATE / 1000, self.count_impulses).start()
+                    if not counting:
+                        counting = True
+                        low_pulse = 0
+                        high_pulse = 0
                 else:
                     nsa_low_count += 1
-            
+
             else:
                 # NSA = 1 -> Reset
                 nsa_low_count = 0
-                
+
                 # debounce
-                if nsa_high_count > 10:
+                if nsa_high_count > self.NSA_DEBOUNCE:
                     # disc rotated to end
-                    if self.impulse_counter_is_running:
-                        self.impulse_counter_is_running = False
+                    if counting:
+                        counting = False
                         #print(f"Ziffer gewählt: {self.impulses} Impulse = Ziffer {self.impulses % 10}")
-                        self.current_number += str(self.impulses % 10)
-                        self.receive_number_callback(self.current_number)
+                        if 0 < self.impulses <= 10:
+                            self.digits += 1
+                            if self.dtmf:
+                                self.receive_dtmf_callback(str(self.impulses % 10))
+                            else:
+                                self.current_number += str(self.impulses % 10)
+                                self.receive_number_callback(self.current_number)
+                        else:
+                            # Scheibe nur angetippt oder Kontakt prellt
+                            self.decode_errors += 1
                         self.impulses = 0
+
+                    if self.dtmf:
+                        # Ziffer gemeldet (oder NSA hat nur geprellt): schlafen bis zur nächsten Ziffer
+                        self.dialing = False
+                        self._active.clear()
                 else:
                     nsa_high_count += 1
 
-        #print("Wählvorgang beendet")
-
-    def end_dialing(self):
-        """Wählvorgang sanft beenden"""
-        if self.dialing:
-            #print("Beende Wählvorgang...")
-            self.dialing = False
-
-    def count_impulses(self):
-        """Impulse zählen"""
+            self.samples += 1
 
-        low_pulse = 0  # count nsi period low
-        high_pulse = 0  # count nsi period high
-        
-        # Schleife alle 1ms ausführen - loop darf keine langsamen Operationen enthalten!
-        last_start = time_ns()
-        while True:
-            
-            # Wählvorgang beendet
-            if not self.impulse_counter_is_running:
-                return
-            
-            # Doppel-Check: Wählvorgang beendet (NSA = 1)
-            #if GPIO.input(self.pinNSA):
-            #    return
-            
-            # NSI = 0
-            if not GPIO.input(self.pin_nsi):
-                low_pulse += 1
-                if low_pulse > self.LOW_PULSE_DURATION:
-                    high_pulse = 0 # reset the last high pulse
-            
-            else:
-                # NSI = 1
-                high_pulse += 1
-                if high_pulse > self.HIGH_PULSE_DURATION:
+            if counting:
+                # NSI = 0
+                if not GPIO.input(self.pin_nsi):
+                    low_pulse += 1
                     if low_pulse > self.LOW_PULSE_DURATION:
-                        self.impulses += 1
-                    low_pulse = 0  # state changed to high, waiting for the next falling slope
-            
-            # Debugging
-            #duration = (time_ns() - last_start) / 1e6
-            #print(f"took {duration}ms, waiting {(1 - duration) / 1000}")
-            
-            time_until_next_iteration = (1 - (time_ns() - last_start) / 1e6) / 1000
+                        high_pulse = 0  # reset the last high pulse
+
+                else:
+                    # NSI = 1
+                    high_pulse += 1
+                    if high_pulse > self.HIGH_PULSE_DURATION:
+                        if low_pulse > self.LOW_PULSE_DURATION:
+                            self.impulses += 1
+                            self.last_pulse_ns = monotonic_ns()
+                        low_pulse = 0  # state changed to high, waiting for the next falling slope
+
+            time_until_next_iteration = (self.SAMPLE_RATE - (time_ns() - last_start) / 1e6) / 1000
             if time_until_next_iteration > 0:
                 sleep(time_until_next_iteration)
 
             last_start = time_ns()
-
-    def gather_number(self, number: int):
-        """Gewählte Nummer merken"""
-        self.current_number += str(number)
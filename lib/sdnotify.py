@@ -0,0 +1,78 @@
+import socket
+from asyncio import AbstractEventLoop, TimerHandle
+from os import environ, getpid
+
+from lib.eventlog import get_logger
+
+log = get_logger('sdnotify')
+
+
+class SystemdNotifier:
+    """
+    Status an systemd melden (sd_notify-Protokoll, ohne libsystemd):
+    READY=1 sobald das Telefon bedienbar ist, STATUS=… und WATCHDOG=1 in halbem WatchdogSec-Abstand.
+    Ohne NOTIFY_SOCKET (z.B. manueller Start) passiert nichts.
+    """
+
+    loop: AbstractEventLoop
+    _address: str | None = None
+    _sock: socket.socket | None = None
+    _watchdog_interval: float | None = None
+    _watchdog_timer: TimerHandle | None = None
+    watchdog_pings: int = 0
+
+    def __init__(self, loop: AbstractEventLoop):
+        self.loop = loop
+        address = environ.get('NOTIFY_SOCKET')
+        if not address:
+            return
+
+        # Abstrakter Namensraum: führendes @ wird zu Nullbyte
+        self._address = '\0' + address[1:] if address.startswith('@') else address
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM | socket.SOCK_CLOEXEC)
+
+        # WATCHDOG_USEC gilt nur, wenn es für diesen Prozess bestimmt ist
+        watchdog_usec = environ.get('WATCHDOG_USEC')
+        watchdog_pid = environ.get('WATCHDOG_PID')
+        if watchdog_usec and (watchdog_pid is None or watchdog_pid == str(getpid())):
+            self._watchdog_interval = int(watchdog_usec) / 1e6 / 2
+
+    @property
+    def enabled(self) -> bool:
+        return self._sock is not None
+
+    def notify(self, **fields: str | int) -> None:
+        """Felder an systemd senden, z.B. notify(READY=1, STATUS="Bereit")"""
+        if self._sock is None:
+            return
+
+        message = "\n".join(f"{key}={value}" for key, value in fields.items())
+        try:
+            self._sock.sendto(message.encode('utf-8'), self._address)
+        except OSError as e:
+            log.warning("sd_notify fehlgeschlagen: {}", e)
+
+    def ready(self, status: str) -> None:
+        self.notify(READY=1, STATUS=status)
+        self.start_watchdog()
+
+    def status(self, status: str) -> None:
+        self.notify(STATUS=status)
+
+    def start_watchdog(self) -> None:
+        """Watchdog-Pings aus der Event-Loop: hängt die Loop, bleiben die Pings aus und systemd startet neu"""
+        if self._watchdog_interval is None or self._watchdog_timer is not None:
+            return
+        log.debug("Watchdog-Ping alle {:.0f}s", self._watchdog_interval)
+        self._ping()
+
+    def _ping(self) -> None:
+        self.watchdog_pings += 1
+        self.notify(WATCHDOG=1)
+        self._watchdog_timer = self.loop.call_later(self._watchdog_interval, self._ping)
+
+    def stopping(self) -> None:
+        if self._watchdog_timer is not None:
+            self._watchdog_timer.cancel()
+            self._watchdog_timer = None
+        self.notify(STOPPING=1)
@@ -0,0 +1,243 @@
+import hashlib
+import json
+import wave
+from configparser import ConfigParser
+from os import getpid, replace, stat
+from pathlib import Path
+from subprocess import run, PIPE
+
+from lib.eventlog import get_logger
+from lib.sounddevices import SoundCard
+
+log = get_logger('soundassets')
+
+# Töne im Hörer, alle anderen Sounds (und Klingeltöne) spielt der Lautsprecher
+EARPIECE_SOUNDS = frozenset({
+    'waehlen_frei', 'waehlen_besetzt', 'waehlen_ungueltig', 'waehlen_nicht_verbunden', 'test_earpiece'
+})
+
+
+class SoundFormat:
+    """Natives WAV-Format eines Geräts, z.B. "S16_LE:44100:2" (ALSA-Format, Abtastrate, Kanäle)"""
+
+    # ALSA-Format -> Bits bzw. Bytes je Sample (ganzzahlig mit Vorzeichen, Little Endian)
+    BITS: dict[str, int] = {'S16_LE': 16, 'S24_3LE': 24, 'S32_LE': 32}
+    WIDTH: dict[str, int] = {'S16_LE': 2, 'S24_3LE': 3, 'S32_LE': 4}
+
+    sample: str
+    rate: int
+    channels: int
+
+    def __init__(self, sample: str, rate: int, channels: int):
+        if sample not in self.BITS:
+            raise ValueError(f"Nicht unterstütztes Format: {sample} (möglich: {', '.join(self.BITS)})")
+        self.sample = sample
+        self.rate = rate
+        self.channels = channels
+
+    @classmethod
+    def parse(cls, value: str) -> 'SoundFormat':
+        sample, rate, channels = value.split(":")
+        return cls(sample.strip().upper(), int(rate), int(channels))
+
+    @classmethod
+    def from_card(cls, card: SoundCard) -> 'SoundFormat | None':
+        """Erstes unterstütztes natives Wiedergabeformat laut /proc/asound (nur USB-Karten melden es)"""
+        playback = card.native.get('playback', {})
+        samples = [sample for sample in playback.get('format', []) if sample in cls.BITS]
+        rates = [rate for rate in playback.get('rates', []) if rate.isdigit()]
+        channels = [channels for channels in playback.get('channels', []) if channels.isdigit()]
+        if not samples or not rates or not channels:
+            return None
+        return cls(samples[0], int(rates[0]), int(channels[0]))
+
+    def sox_args(self) -> list[str]:
+        return ['-b', str(self.BITS[self.sample]), '-e', 'signed-integer', '-r', str(self.rate), '-c', str(self.channels)]
+
+    def __str__(self) -> str:
+        return f"{self.sample}:{self.rate}:{self.channels}"
+
+
+# Formate laut sounds/README.md: MAX98357 (Lautsprecher) bzw. USB-Soundkarte (Hörer)
+DEFAULT_FORMATS: dict[str, SoundFormat] = {
+    'speaker': SoundFormat('S32_LE', 48000, 2),
+    'earpiece': SoundFormat('S16_LE', 44100, 2),
+}
+
+
+def sound_role(section: str, key: str) -> str:
+    """Gerät, auf dem ein Sound aus [Sounds] bzw. [Ringtones] abgespielt wird"""
+    return 'earpiece' if section == 'Sounds' and key in EARPIECE_SOUNDS else 'speaker'
+
+
+def configured_sounds(config: ConfigParser) -> list[tuple[str, str, str]]:
+    """Alle konfigurierten Sounds als (Abschnitt, Schlüssel, Datei)"""
+    sounds = []
+    for section in ('Sounds', 'Ringtones'):
+        if config.has_section(section):
+            sounds += [(section, key, path) for key, path in config[section].items() if path != ""]
+    return sounds
+
+
+def device_format(config: ConfigParser, role: str, cards: dict[int, SoundCard] | None = None) -> SoundFormat:
+    """
+    Natives Format eines Geräts: `[Audio] speaker_format` bzw. `earpiece_format`, sonst das Format der überwachten
+    Karte (`speaker_card`/`earpiece_card`) laut /proc/asound, sonst das Format laut sounds/README.md
+    """
+    value = config.get('Audio', f'{role}_format', fallback='')
+    if value != "":
+        return SoundFormat.parse(value)
+    pattern = config.get('Audio', f'{role}_card', fallback='')
+    if pattern != "" and cards:
+        for card in cards.values():
+            if card.matches(pattern):
+                native = SoundFormat.from_card(card)
+                if native is not None:
+                    return native
+    return DEFAULT_FORMATS[role]
+
+
+def fingerprint(path: Path) -> str:
+    """SHA-256 des Dateiinhalts"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while chunk := file.read(1 << 16):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def validate(path: Path, sound_format: SoundFormat) -> float:
+    """WAV-Datei prüfen (PCM im Format des Geräts), liefert die Dauer; ValueError bei falschem Format"""
+    try:
+        with wave.open(str(path), 'rb') as file:
+            width, rate, channels, frames = (
+                file.getsampwidth(), file.getframerate(), file.getnchannels(), file.getnframes()
+            )
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f"{path}: kein PCM-WAV: {e}")
+    found = (width, rate, channels)
+    expected = (SoundFormat.WIDTH[sound_format.sample], sound_format.rate, sound_format.channels)
+    if found != expected:
+        raise ValueError(f"{path}: {width * 8} Bit, {rate} Hz, {channels} Kanäle statt {sound_format}")
+    if frames == 0:
+        raise ValueError(f"{path}: leer")
+    return frames / rate
+
+
+class Manifest:
+    """
+    Aufbereitete Sounds (Ergebnis von soundprep.py): je Quelldatei und Format die erzeugte WAV-Datei mit
+    Fingerabdrücken (SHA-256) und Größe/Änderungszeit von Quelle und Ergebnis.
+    Beim Start prüft PiPhone je Sound nur Größe und Änderungszeit (ein Wörterbuchzugriff, zwei stat-Aufrufe);
+    die Fingerabdrücke vergleicht `soundprep.py check`.
+    """
+
+    VERSION: int = 1
+
+    path: Path
+    entries: dict[str, dict]  # "Format Quelldatei" -> Eintrag
+
+    def __init__(self, path: Path, entries: dict[str, dict] | None = None):
+        self.path = path
+        self.entries = entries if entries is not None else {}
+
+    @classmethod
+    def load(cls, path: Path) -> 'Manifest':
+        """Manifest lesen, fehlende oder unlesbare Datei ergibt ein leeres Manifest"""
+        try:
+            data = json.loads(path.read_text())
+        except FileNotFoundError:
+            return cls(path)
+        except (OSError, ValueError) as e:
+            log.warning("Kann Sound-Manifest {} nicht lesen: {}", path, e)
+            return cls(path)
+        if data.get('version') != cls.VERSION:
+            log.warning("Sound-Manifest {} hat unbekannte Version {}", path, data.get('version'))
+            return cls(path)
+        return cls(path, data.get('sounds', {}))
+
+    @staticmethod
+    def key(source: str, sound_format: SoundFormat) -> str:
+        return f"{sound_format} {source}"
+
+    @staticmethod
+    def _stat(path: str) -> tuple[int, int] | None:
+        try:
+            result = stat(path)
+        except OSError:
+            return None
+        return result.st_size, result.st_mtime_ns
+
+    def lookup(self, source: str, sound_format: SoundFormat) -> tuple[str | None, str]:
+        """
+        Aufbereitete Datei zu einer Quelldatei in O(1): (Pfad, "ok") oder (None, Grund):
+        "fehlt" (nicht aufbereitet), "veraltet" (Quelle geändert) oder "verändert" (Ergebnis geändert/gelöscht)
+        """
+        entry = self.entries.get(self.key(source, sound_format))
+        if entry is None:
+            return None, "fehlt"
+        if self._stat(source) != (entry['source_size'], entry['source_mtime_ns']):
+            return None, "veraltet"
+        if self._stat(entry['output']) != (entry['size'], entry['mtime_ns']):
+            return None, "verändert"
+        return entry['output'], "ok"
+
+    def record(self, source: str, sound_format: SoundFormat, output: Path, **details) -> dict:
+        """Aufbereitete Datei eintragen (Fingerabdrücke werden hier berechnet)"""
+        source_stat = stat(source)
+        output_stat = stat(output)
+        entry = {
+            'source': source,
+            'source_size': source_stat.st_size,
+            'source_mtime_ns': source_stat.st_mtime_ns,
+            'source_sha256': fingerprint(Path(source)),
+            'output': str(output),
+            'size': output_stat.st_size,
+            'mtime_ns': output_stat.st_mtime_ns,
+            'sha256': fingerprint(output),
+            'format': str(sound_format),
+            **details
+        }
+        self.entries[self.key(source, sound_format)] = entry
+        return entry
+
+    def save(self) -> None:
+        """Atomar schreiben (temporäre Datei + rename)"""
+        tmp = self.path.with_name(f".{self.path.name}.{getpid()}")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(json.dumps({'version': self.VERSION, 'sounds': self.entries}, indent=1, sort_keys=True) + "\n")
+        replace(tmp, self.path)
+
+
+def output_path(directory: Path, source: str, sound_format: SoundFormat) -> Path:
+    """Zieldatei je Quelle und Format, z.B. native/S16_LE-44100-2/waehlen-frei-mp3.wav"""
+    path = Path(source)
+    return directory / str(sound_format).replace(":", "-") / f"{path.stem}-{path.suffix.removeprefix('.')}.wav"
+
+
+def transcode(source: str, output: Path, sound_format: SoundFormat, level: float = -1, silence: float = -50) -> None:
+    """
+    Mit sox in das native Format wandeln: Stille am Anfang entfernen (verzögert sonst jeden Ton),
+    Spitzenpegel auf `level` dBFS normalisieren. Schreibt zuerst eine temporäre Datei, dann rename
+    """
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_name(f".{output.name}.{getpid()}")
+    cmd = [
+        'sox', source, *sound_format.sox_args(), '-t', 'wav', str(tmp),
+        'silence', '1', '0.005', f'{silence}d',  # Bis 5ms über der Schwelle liegen
+        'gain', '-n', str(level)
+    ]
+    result = run(cmd, stdout=PIPE, stderr=PIPE)
+    if result.returncode != 0:
+        tmp.unlink(missing_ok=True)
+        raise ValueError(f"{source}: sox fehlgeschlagen: {result.stderr.decode(errors='replace').strip()}")
+    replace(tmp, output)
+
+
+def source_duration(source: str) -> float | None:
+    """Dauer der Quelldatei laut sox (für die entfernte Stille)"""
+    result = run(['sox', '--i', '-D', source], stdout=PIPE, stderr=PIPE)
+    try:
+        return float(result.stdout)
+    except ValueError:
+        return None
@@ -0,0 +1,220 @@
+import socket
+from asyncio import AbstractEventLoop, TimerHandle
+from pathlib import Path
+from re import compile, Pattern
+
+from lib.eventlog import get_logger
+
+log = get_logger('sounddevices')
+
+NETLINK_KOBJECT_UEVENT = 15
+UEVENT_KERNEL_GROUP = 1
+
+
+RE_CARD: Pattern = compile(r'^\s*(\d+) \[(\S+)\s*\]: (.+?) - (.*)$')
+RE_PCM: Pattern = compile(r'^(\d+)-(\d+): .*')
+
+
+class SoundCard:
+    """Soundkarte laut /proc/asound, Fähigkeiten werden einmal je Scan gelesen"""
+
+    index: int
+    id: str  # Kurzname, z.B. "Device" (ALSA: CARD=Device)
+    driver: str  # z.B. "USB-Audio"
+    name: str  # z.B. "USB Audio Device"
+    playback: bool = False
+    capture: bool = False
+    # Native Formate je Richtung (nur USB-Karten melden sie ohne geöffneten Stream): Format, Kanäle, Raten
+    native: dict[str, dict[str, list[str]]]
+
+    def __init__(self, index: int, id: str, driver: str, name: str):
+        self.index = index
+        self.id = id
+        self.driver = driver
+        self.name = name
+        self.native = {}
+
+    def matches(self, pattern: str) -> bool:
+        """Kurzname exakt oder Teil des Namens (ohne Groß-/Kleinschreibung), z.B. "USB Audio" """
+        return pattern == self.id or pattern.lower() in self.name.lower()
+
+    def key(self) -> tuple:
+        """Identität über Neuaufzählungen hinweg: gleiche Karte mit neuem Index gilt als neu eingesteckt"""
+        return self.index, self.id, self.name
+
+    def describe(self) -> dict:
+        return {
+            'index': self.index, 'id': self.id, 'name': self.name, 'driver': self.driver,
+            'playback': self.playback, 'capture': self.capture, 'native': self.native
+        }
+
+
+def read_cards(root: Path = Path("/proc/asound")) -> dict[int, SoundCard]:
+    """Soundkarten mit Wiedergabe/Aufnahme und nativen Formaten aus /proc/asound (Index -> Karte)"""
+    cards = {}
+    try:
+        lines = (root / "cards").read_text().splitlines()
+    except OSError:
+        return cards  # Kein ALSA (oder keine Karte)
+    for line in lines:
+        match = RE_CARD.match(line)
+        if match:
+            card = SoundCard(int(match[1]), match[2], match[3].strip(), match[4].strip())
+            cards[card.index] = card
+
+    # Wiedergabe/Aufnahme je Karte: "00-00: USB Audio : USB Audio : playback 1 : capture 1"
+    try:
+        for line in (root / "pcm").read_text().splitlines():
+            match = RE_PCM.match(line)
+            if match and int(match[1]) in cards:
+                card = cards[int(match[1])]
+                card.playback |= ": playback" in line
+                card.capture |= ": capture" in line
+    except OSError:
+        pass
+
+    for card in cards.values():
+        card.native = _read_stream(root / f"card{card.index}" / "stream0")
+    return cards
+
+
+def _read_stream(path: Path) -> dict[str, dict[str, list[str]]]:
+    """Native Formate einer USB-Karte: Abschnitte Playback/Capture mit Format, Channels, Rates"""
+    try:
+        lines = path.read_text().splitlines()
+    except OSError:
+        return {}
+
+    native = {}
+    direction = None
+    for line in lines:
+        if line in ("Playback:", "Capture:"):
+            direction = native.setdefault(line[:-1].lower(), {})
+            continue
+        if direction is None:
+            continue
+        key, _, value = line.strip().partition(": ")
+        if key in ("Format", "Channels", "Rates"):
+            values = direction.setdefault(key.lower(), [])
+            for item in value.split(", "):
+                if item not in values:
+                    values.append(item)
+    return native
+
+
+class SoundDevices:
+    """
+    Soundkarten aus /proc/asound (ein Scan beim Start und nach jeder Änderung, Ergebnis wird zwischengespeichert)
+    und Hotplug über Kernel-uevents (Netlink), ohne Polling:
+    - uevents des Subsystems `sound` planen einen erneuten Scan nach `settle` Sekunden (fasst die Ereignisse
+      einer Karte zusammen, /proc/asound ist dann vollständig)
+    - Listener erhalten (Karte, vorhanden) für jede entfernte bzw. (neu) erkannte Karte
+    Wird von allen Telefonen eines Prozesses geteilt.
+    """
+
+    re_devpath: Pattern = compile(r'/sound/card(\d+)$')
+
+    loop: AbstractEventLoop
+    root: Path
+    settle: float
+    cards: dict[int, SoundCard]  # Index -> Karte
+    listeners: list[callable]
+
+    # Statistik
+    scans: int = 0
+    uevents: int = 0  # Empfangene uevents des Subsystems sound
+    hotplugs: int = 0  # Hinzugekommene oder entfernte Karten nach dem ersten Scan
+
+    _sock: socket.socket | None = None
+    _scan_timer: TimerHandle | None = None
+    _replugged: set[int]  # Karten mit add/remove seit dem letzten Scan (gleicher Index nach Neuaufzählung)
+
+    def __init__(self, loop: AbstractEventLoop, root: Path = Path("/proc/asound"), settle: float = 0.2):
+        self.loop = loop
+        self.root = root
+        self.settle = settle
+        self.cards = {}
+        self.listeners = []
+        self._replugged = set()
+        self.scan()
+
+        try:
+            self._sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW | socket.SOCK_NONBLOCK, NETLINK_KOBJECT_UEVENT)
+            self._sock.bind((0, UEVENT_KERNEL_GROUP))
+        except OSError as e:
+            log.warning("uevents nicht verfügbar, Soundkarten werden nur beim Start erkannt: {}", e)
+            self._sock = None
+            return
+        loop.add_reader(self._sock.fileno(), self._read)
+
+    @property
+    def available(self) -> bool:
+        return self._sock is not None
+
+    def find(self, pattern: str) -> SoundCard | None:
+        for card in self.cards.values():
+            if card.matches(pattern):
+                return card
+        return None
+
+    def _read(self) -> None:
+        while True:
+            try:
+                message = self._sock.recv(65536)
+            except BlockingIOError:
+                break
+            self.uevent(message)
+
+    def uevent(self, message: bytes) -> None:
+        """Kernel-uevent ("add@/devices/...\\0ACTION=add\\0SUBSYSTEM=sound\\0..."): Soundkarten erneut scannen"""
+        fields = message.split(b"\0")
+        if b"SUBSYSTEM=sound" not in fields:
+            return
+        self.uevents += 1
+        if b"ACTION=add" in fields or b"ACTION=remove" in fields:
+            for field in fields:
+                if field.startswith(b"DEVPATH="):
+                    card = self.re_devpath.search(field.decode(errors='replace'))
+                    if card:
+                        self._replugged.add(int(card[1]))
+        if self._scan_timer is not None:
+            self._scan_timer.cancel()
+        self._scan_timer = self.loop.call_later(self.settle, self.scan)
+
+    def scan(self) -> None:
+        """/proc/asound lesen, Änderungen an die Listener melden"""
+        self._scan_timer = None
+        self.scans += 1
+        cards = read_cards(self.root)
+
+        # Entfernt und wieder eingesteckt zwischen zwei Scans: trotzdem als Hotplug melden
+        replugged = {card.key() for index, card in self.cards.items() if index in self._replugged}
+        self._replugged.clear()
+        old = {card.key(): card for card in self.cards.values()}
+        new = {card.key(): card for card in cards.values()}
+        for key in replugged & new.keys():
+            old[(None, *key)] = old.pop(key)
+        self.cards = cards
+        if self.scans == 1:
+            for card in cards.values():
+                log.info("Soundkarte {}: {} ({}, {})", card.index, card.name, card.id, card.driver)
+            return
+
+        for key in old.keys() - new.keys():
+            self.hotplugs += 1
+            log.warning("Soundkarte entfernt: {} ({})", old[key].name, old[key].index)
+            for listener in self.listeners:
+                listener(old[key], False)
+        for key in new.keys() - old.keys():
+            self.hotplugs += 1
+            log.info("Soundkarte erkannt: {} ({})", new[key].name, new[key].index)
+            for listener in self.listeners:
+                listener(new[key], True)
+
+    def close(self) -> None:
+        if self._scan_timer is not None:
+            self._scan_timer.cancel()
+        if self._sock is not None:
+            self.loop.remove_reader(self._sock.fileno())
+            self._sock.close()
+            self._sock = None
@@ -0,0 +1,85 @@
+import json
+from os import close, fsync, getpid, open as os_open, replace, write, O_CREAT, O_DIRECTORY, O_RDONLY, O_TRUNC, O_WRONLY
+from pathlib import Path
+from time import time
+
+from lib.eventlog import get_logger
+from lib.phoneconfig import DEFAULT_PHONE
+
+log = get_logger('statefile')
+
+VERSION = 1
+
+
+def state_file(data_dir: Path, phone: str = DEFAULT_PHONE) -> Path:
+    """Laufzeitzustand eines Telefons (bei mehreren Telefonen je Telefon eine Datei)"""
+    return data_dir / ("state.json" if phone == DEFAULT_PHONE else f"state-{phone}.json")
+
+
+def boot_id() -> str | None:
+    """Kennung des laufenden Systemstarts: gleich nach Neustart nur des Dienstes, neu nach Reboot"""
+    try:
+        return Path("/proc/sys/kernel/random/boot_id").read_text().strip()
+    except OSError:
+        return None
+
+
+class StateFile:
+    """
+    Laufzeitzustand eines Telefons (Nicht stören, Nachtmodus, Schlafmusik), um nach einem Neustart nahtlos
+    fortzusetzen. Wenige hundert Bytes JSON, atomar geschrieben (temporäre Datei, fsync, rename, fsync des
+    Verzeichnisses): nach einem Stromausfall liegt entweder der alte oder der neue Stand vor.
+    Geschrieben wird nur, wenn sich der Zustand geändert hat.
+    """
+
+    path: Path
+    writes: int = 0
+    _last: dict | None = None  # Zuletzt geschriebener Zustand (ohne Metadaten)
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def load(self) -> dict:
+        """Gespeicherten Zustand lesen, fehlende, beschädigte oder fremde Dateien ergeben {}"""
+        try:
+            data = json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            log.warning("Kann gespeicherten Zustand {} nicht lesen: {}", self.path, e)
+            return {}
+        if not isinstance(data, dict) or data.get('version') != VERSION:
+            log.warning("Gespeicherter Zustand {} hat unbekanntes Format, ignoriere", self.path)
+            return {}
+        return data
+
+    def save(self, state: dict) -> bool:
+        """Zustand schreiben, falls geändert; mit Zeitpunkt und boot_id, liefert True, falls geschrieben"""
+        if state == self._last:
+            return False
+
+        data = json.dumps({'version': VERSION, **state, 'saved': round(time(), 3), 'boot_id': boot_id()}).encode()
+        tmp = self.path.with_name(f".{self.path.name}.{getpid()}")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os_open(tmp, O_WRONLY | O_CREAT | O_TRUNC, 0o644)
+            try:
+                write(fd, data)
+                fsync(fd)
+            finally:
+                close(fd)
+            replace(tmp, self.path)
+
+            # Umbenennung selbst dauerhaft machen
+            fd = os_open(self.path.parent, O_RDONLY | O_DIRECTORY)
+            try:
+                fsync(fd)
+            finally:
+                close(fd)
+        except OSError as e:
+            log.warning("Kann Zustand nicht speichern: {}", e)
+            return False
+
+        self._last = dict(state)
+        self.writes += 1
+        return True
@@ -0,0 +1,230 @@
+import asyncio
+from datetime import datetime
+from os import O_NONBLOCK, O_RDONLY, O_WRONLY, close, mkfifo, open as os_open, read, set_blocking, write
+from pathlib import Path
+from struct import unpack_from
+from subprocess import DEVNULL, PIPE, Popen
+
+from lib.audio import Audio
+from lib.eventlog import get_logger
+from lib.phoneconfig import DEFAULT_PHONE
+
+log = get_logger('voicemail')
+
+
+class Mailbox:
+    """
+    Nachrichten des Anrufbeantworters, ein Verzeichnis je Telefon: neue Nachrichten in `new/`,
+    abgehörte in `old/`. Dateiname: Zeitpunkt und Rufnummer. Die Anzahl neuer Nachrichten wird nur beim Start gezählt.
+    """
+
+    directory: Path
+    new_count: int = 0
+
+    def __init__(self, data_dir: Path, phone: str = DEFAULT_PHONE):
+        self.directory = data_dir / ("voicemail" if phone == DEFAULT_PHONE else f"voicemail-{phone}")
+        for sub in ("new", "old"):
+            (self.directory / sub).mkdir(parents=True, exist_ok=True)
+        self.new_count = sum(1 for _ in (self.directory / "new").iterdir())
+
+    def path_for(self, number: str, extension: str) -> Path:
+        """Pfad für eine neue Nachricht (wird erst nach der Aufzeichnung mit add() gezählt)"""
+        name = f"{datetime.now():%Y%m%d-%H%M%S}-{''.join(c for c in number if c.isdigit() or c == '+')}.{extension}"
+        return self.directory / "new" / name
+
+    def add(self, path: Path) -> None:
+        self.new_count += 1
+
+    def new_messages(self) -> list[Path]:
+        """Neue Nachrichten, älteste zuerst"""
+        return sorted((self.directory / "new").iterdir())
+
+    def mark_heard(self, path: Path) -> None:
+        path.rename(self.directory / "old" / path.name)
+        self.new_count = max(0, self.new_count - 1)
+
+
+class Recorder:
+    """
+    Aufzeichnung eines Anrufs als komprimierte Datei, ohne den Gesprächspfad zu verzögern:
+    - linphonec schreibt WAV in eine FIFO, die Event-Loop liest sie nicht-blockierend (add_reader)
+    - Die Daten gehen über einen Puffer fester Größe an einen Encoder (sox), lange Nachrichten belegen
+      daher nicht mehr Speicher; kommt der Encoder nicht nach, werden Daten verworfen statt linphonec zu bremsen
+    - Startet der Encoder nicht oder bricht er ab, wird die FIFO bis zum Ende weiter gelesen und verworfen
+    """
+
+    CHUNK: int = 4096
+    HEADER_MAX: int = 4096  # WAV-Header größer als das: Standardformat annehmen
+
+    loop: asyncio.AbstractEventLoop
+    fifo: Path
+    output: Path
+    buffer_size: int
+    encoder: list[str]
+
+    # Zustand
+    rate: int = 8000
+    channels: int = 1
+    bytes_recorded: int = 0
+    bytes_dropped: int = 0
+    finished: asyncio.Future
+    _buffer: bytearray
+    _header: bytearray | None
+    _read_fd: int | None = None
+    _keepalive_fd: int | None = None  # Eigenes Schreibende: FIFO liefert kein EOF, bevor linphonec sie öffnet
+    _eof: bool = False
+    _process: Popen | None = None
+    _encoder_failed: bool = False  # Encoder nicht gestartet oder abgebrochen: weitere Daten verwerfen
+
+    def __init__(
+            self,
+            loop: asyncio.AbstractEventLoop,
+            fifo: Path,
+            output: Path,
+            buffer_size: int = 64 * 1024,
+            encoder: str = "sox"
+    ):
+        self.loop = loop
+        self.fifo = fifo
+        self.output = output
+        self.buffer_size = buffer_size
+        self.encoder = encoder.split()
+        self.finished = loop.create_future()
+        self._buffer = bytearray()
+        self._header = bytearray()
+
+    def start(self) -> None:
+        """FIFO anlegen und lesen (vor dem record-Befehl an linphonec)"""
+        self.fifo.unlink(missing_ok=True)
+        mkfifo(self.fifo, 0o600)
+        self._read_fd = os_open(self.fifo, O_RDONLY | O_NONBLOCK)
+        self._keepalive_fd = os_open(self.fifo, O_WRONLY | O_NONBLOCK)
+        self.loop.add_reader(self._read_fd, self._read)
+
+    def stop(self) -> None:
+        """Gespräch beendet: restliche Daten lesen, danach Encoder beenden (siehe `finished`)"""
+        if self._keepalive_fd is not None:
+            close(self._keepalive_fd)
+            self._keepalive_fd = None
+        if self._read_fd is not None:
+            self._read()
+
+    @property
+    def seconds(self) -> float:
+        return self.bytes_recorded / (self.rate * self.channels * 2)
+
+    def _read(self) -> None:
+        try:
+            data = read(self._read_fd, self.CHUNK)
+        except BlockingIOError:
+            return
+
+        if data == b"":
+            if self._keepalive_fd is None:
+                self._close_reader()
+            return
+
+        if self._header is not None:
+            data = self._parse_header(data)
+            if data is None:
+                return
+
+        self.bytes_recorded += len(data)
+        if self._encoder_failed:
+            self.bytes_dropped += len(data)
+            return
+        free = self.buffer_size - len(self._buffer)
+        if len(data) > free:
+            self.bytes_dropped += len(data) - free
+            data = data[:free]
+        if len(data) > 0:
+            was_empty = len(self._buffer) == 0
+            self._buffer += data
+            if was_empty:
+                self.loop.add_writer(self._process.stdin.fileno(), self._write)
+
+    def _parse_header(self, data: bytes) -> bytes | None:
+        """WAV-Header sammeln bis zum data-Chunk, Format übernehmen und Encoder starten"""
+        self._header += data
+        header = bytes(self._header)
+        offset = 12
+        while offset + 8 <= len(header):
+            chunk_id, size = header[offset:offset + 4], unpack_from('<I', header, offset + 4)[0]
+            if chunk_id == b"fmt " and offset + 16 <= len(header):
+                self.channels, self.rate = unpack_from('<HI', header, offset + 10)
+            if chunk_id == b"data":
+                self._header = None
+                self._start_encoder()
+                return header[offset + 8:]
+            offset += 8 + size
+
+        if len(header) > self.HEADER_MAX or not header.startswith(b"RIFF"[:len(header)]):
+            log.warning("Anrufbeantworter: Kein WAV-Header erkannt, nehme {} Hz/{} Kanal an.", self.rate, self.channels)
+            self._header = None
+            self._start_encoder()
+            return header
+        return None
+
+    def _start_encoder(self) -> None:
+        try:
+            self.output.parent.mkdir(parents=True, exist_ok=True)
+            self._process = Popen(
+                [*self.encoder, '-q', '-t', 'raw', '-r', str(self.rate), '-c', str(self.channels),
+                 '-e', 'signed-integer', '-b', '16', '-', str(self.output)],
+                stdin=PIPE, stdout=DEVNULL, stderr=DEVNULL
+            )
+        except OSError as e:
+            log.error("Anrufbeantworter: Encoder {} nicht gestartet: {}", self.encoder[0], e)
+            self._encoder_failed = True
+            return
+        set_blocking(self._process.stdin.fileno(), False)
+
+    def _write(self) -> None:
+        fd = self._process.stdin.fileno()
+        try:
+            written = write(fd, self._buffer)
+        except BlockingIOError:
+            return
+        except BrokenPipeError:
+            log.warning("Anrufbeantworter: Encoder wurde beendet.")
+            self._encoder_failed = True
+            self.bytes_dropped += len(self._buffer)
+            written = len(self._buffer)
+        del self._buffer[:written]
+
+        if len(self._buffer) == 0:
+            self.loop.remove_writer(fd)
+            if self._eof:
+                self._finish_encoder()
+
+    def _close_reader(self) -> None:
+        self.loop.remove_reader(self._read_fd)
+        close(self._read_fd)
+        self._read_fd = None
+        self.fifo.unlink(missing_ok=True)
+        self._eof = True
+        if self._process is None:
+            self.finished.set_result(None)  # Nichts aufgezeichnet
+        elif len(self._buffer) == 0:
+            self._finish_encoder()
+
+    def _finish_encoder(self) -> None:
+        self._process.stdin.close()
+        task = asyncio.ensure_future(Audio.wait(self._process))
+        task.add_done_callback(lambda _: self.finished.done() or self.finished.set_result(self.output))
+
+    def abort(self) -> None:
+        """Aufzeichnung verwerfen (z.B. Programmende)"""
+        if self._read_fd is not None:
+            self.loop.remove_reader(self._read_fd)
+            close(self._read_fd)
+            self._read_fd = None
+        if self._keepalive_fd is not None:
+            close(self._keepalive_fd)
+            self._keepalive_fd = None
+        if self._process is not None:
+            self.loop.remove_writer(self._process.stdin.fileno())
+            self._process.kill()
+        self.fifo.unlink(missing_ok=True)
+        if not self.finished.done():
+            self.finished.set_result(None)
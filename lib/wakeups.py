@@ -0,0 +1,77 @@
+from os import listdir
+from time import monotonic
+
+
+class WakeupCounter:
+    """
+    Zählt Aufwachvorgänge (Ereignisse, Timer, Abtastungen) je Quelle, um den Ruhezustand zu überprüfen:
+    Aufgelegt und ohne laufende Aktion sollte keine Quelle periodisch wecken.
+    Zusätzlich werden die freiwilligen Kontextwechsel aller Threads des Prozesses aus /proc gelesen,
+    damit auch Aufwachvorgänge außerhalb von Python (z.B. Software-PWM) sichtbar werden.
+    """
+
+    counts: dict[str, int]
+    _polled: dict[str, callable]  # Quellen, die selbst zählen (z.B. Abtast-Thread des Nummernschalters)
+    _started: float
+    _last_report: float
+    _last_counts: dict[str, int]
+    _last_ctxt_switches: int
+
+    def __init__(self):
+        self.counts = {}
+        self._polled = {}
+        self._started = self._last_report = monotonic()
+        self._last_counts = {}
+        self._last_ctxt_switches = self.context_switches()
+
+    def count(self, source: str, n: int = 1) -> None:
+        """Aufwachvorgang einer Quelle zählen (billig genug für jeden Aufruf)"""
+        self.counts[source] = self.counts.get(source, 0) + n
+
+    def poll(self, source: str, getter: callable) -> None:
+        """Quelle registrieren, deren Zähler erst beim Bericht abgefragt wird"""
+        self._polled[source] = getter
+
+    def snapshot(self) -> dict[str, int]:
+        counts = dict(self.counts)
+        for source, getter in self._polled.items():
+            counts[source] = getter()
+        return counts
+
+    @staticmethod
+    def context_switches() -> int:
+        """Summe der freiwilligen Kontextwechsel (= Aufwachvorgänge nach Schlafen) aller Threads"""
+        total = 0
+        try:
+            for tid in listdir('/proc/self/task'):
+                with open(f'/proc/self/task/{tid}/status') as status:
+                    for line in status:
+                        if line.startswith('voluntary_ctxt_switches:'):
+                            total += int(line.split()[1])
+                            break
+        except OSError:
+            pass
+        return total
+
+    def rates(self) -> dict[str, float]:
+        """Aufwachvorgänge pro Sekunde je Quelle seit dem letzten Aufruf"""
+        now = monotonic()
+        elapsed = max(now - self._last_report, 1e-9)
+        counts = self.snapshot()
+        ctxt_switches = self.context_switches()
+
+        rates = {
+            source: (count - self._last_counts.get(source, 0)) / elapsed
+            for source, count in sorted(counts.items())
+        }
+        rates['prozess'] = (ctxt_switches - self._last_ctxt_switches) / elapsed
+
+        self._last_report = now
+        self._last_counts = counts
+        self._last_ctxt_switches = ctxt_switches
+        return rates
+
+    def report(self) -> str:
+        elapsed = monotonic() - self._last_report
+        rates = ", ".join(f"{source} {rate:.3f}" for source, rate in self.rates().items())
+        return f"Aufwachvorgänge/s der letzten {elapsed:.0f}s: {rates}"
@@ -1,23 +1,32 @@
 #!/usr/bin/python3
 
+# Zeitpunkt vor allen Imports, für die Aufschlüsselung der Startzeit
+from time import perf_counter
+started = perf_counter()
+
 from lib.audio import Audio
-from lib.led import Led
-from lib.linphone import Linphone
-from lib.rotarydial import RotaryDial
+from lib.boottiming import BootTiming
+from lib.control import ControlServer
+from lib.eventlog import events, get_logger, DEBUG, LEVELS
+from lib.metrics import MetricsExporter, ProcessStats, Registry
+from lib.netwatch import NetworkWatch
+from lib.performance import parse_cpus, PerformancePolicy
+from lib.phone import PiPhone
+from lib.phoneconfig import phone_configs
+from lib.sdnotify import SystemdNotifier
+from lib.sounddevices import SoundDevices
 
 import argparse
 import asyncio
 from configparser import ConfigParser
-from datetime import datetime, timedelta
+from functools import cache
 from getpass import getuser
 from pathlib import Path
 from RPi import GPIO
-from signal import signal, SIGTERM, SIGINT
-from os import system
-import socket
+from signal import SIGTERM, SIGINT, SIGUSR1, SIGUSR2, SIGPROF
+import sys
 from sys import exit
-from threading import Timer, Thread
-from time import sleep
+import threading
 
 
 # CLI-Argumente lesen
@@ -43,474 +52,185 @@ if args.ignore_dnd:
     config.set('SIP', 'dnd_from', "0")
     config.set('SIP', 'dnd_to', "0")
 
+# Ereignisprotokoll: Ringpuffer für Fehleranalyse, Ausgabe ins Journal
+events.configure(
+    size=config.getint('Log', 'ring_size', fallback=5000),
+    level=LEVELS[config.get('Log', 'ring_level', fallback='info')],
+    output_level=DEBUG if args.verbose else LEVELS[config.get('Log', 'level', fallback='info')],
+    dump_dir=Path(config.get('Log', 'dump_dir', fallback='/run/piphone'))
+)
+log = get_logger('piphone')
 
-class PiPhone:
-    
-    # Instanzen
-    loop: asyncio.AbstractEventLoop
-    dial: RotaryDial
-    linphone: Linphone | None = None
-    led: Led | None = None
-
-    # Tasks, Timer und Prozesse
-    wifi_test_task: asyncio.Task  # Periodisch WLAN-Verbindung prüfen
-    dialing_timeout: Timer | None = None  # Wählvorgang nach bestimmter Zeit abbrechen
-    call_duration_timeout: Timer | None = None  # Gesprächsdauer begrenzen
-    night_light_timer: Timer | None = None  # Nachtlicht und Aufwachlicht
-    sleep_music_thread: Thread | None = None  # Schlafmusik
-
-    # Zustandsvariablen
-    first_boot: bool = True  # Erster Startvorgang: Bootsound abspielen, sobald linphonec gestartet wurde
-    is_connected: bool = False
-    call_incoming: bool = False
-    declined_incoming_call: bool = False
-    terminate_requested: bool = False
-    manual_dnd: bool = False
-    
-    def __init__(self, loop: asyncio.AbstractEventLoop):
-        """Haupt-Programm starten"""
-        print(f"Starte PiPhone als {getuser()}...")
-
-        # Event-Loop speichern
-        self.loop = loop
-
-        # Systemsignale
-        signal(SIGTERM, self.handle_sigterm)
-        signal(SIGINT, self.handle_sigterm)
-
-        # GPIO einrichten
-        GPIO.setmode(GPIO.BCM)
-
-        # Nachtlicht / Aufwachlicht
-        self.led = Led(
-            night_light_pin = config['Misc'].getint('night_light_pin', fallback=0),
-            night_light_duty = config['Misc'].getint('night_light_duty', fallback=100),
-            wake_light_pin = config['Misc'].getint('wake_light_pin', fallback=None),
-            wake_light_duty = config['Misc'].getint('wake_light_duty', fallback=0),
-            verbose = args.verbose
-        )
-        self.led.wake_light_blink()  # Bootvorgang visualisieren
 
-        # Nummernschalter
-        self.dial = RotaryDial(
-            pin_nsi = config['Pins'].getint('nsi'),
-            pin_nsa = config['Pins'].getint('nsa'),
-            receive_number_callback = self.receive_number
-        )
+def dump_on_crash(exc_type, exc, tb) -> None:
+    """Unbehandelte Ausnahme (auch in Threads): protokollieren und Ringpuffer sichern"""
+    log.error("Unbehandelte Ausnahme: {}: {}", exc_type.__name__, exc)
+    events.detach()
+    events.dump(f"crash: {exc_type.__name__}: {exc}")
+    sys.__excepthook__(exc_type, exc, tb)
 
-        # Gabelkontakt
-        GPIO.setup(config['Pins'].getint('gabel'), GPIO.IN, pull_up_down=GPIO.PUD_UP)
-        GPIO.add_event_detect(config['Pins'].getint('gabel'), GPIO.BOTH, callback = self.watch_hook, bouncetime=100)
-
-        # Falls beim booten direkt der Hörer abgehoben ist: Besetztton spielen
-        if not self.is_hungup():
-            if args.verbose:
-                print("Gabel ist während des Startvorgangs abgehoben, spiele Besetztton.")
-            self.cancel_dialing()
-
-        # WLAN-Verbindung und linphonec überwachen
-        asyncio.create_task(self.watchdog())
-
-        # Registrierte Rufnummern loggen
-        print("Registrierte Zielrufnummern:")
-        for (number, action) in config['Numbers'].items():
-            print(f" - {number} -> {action}")
-
-        print("Bereit.")
-
-    def handle_sigterm(self, _, __) -> None:
-        """SIGTERM/SIGINT empfangen und Programm sauber beenden"""
-        print("\nSIGTERM/SIGINT empfangen, beende.")
-        if self.dialing_timeout is not None:
-            self.dialing_timeout.cancel()
-        if self.call_duration_timeout is not None:
-            self.call_duration_timeout.cancel()
-        raise SystemExit()
-
-    def start_linphonec(self) -> None:
-        self.linphone = Linphone(
-            hostname=config['SIP']['host'],
-            username=config['SIP']['user'],
-            password=config['SIP']['pass'],
-            on_boot=self.linphone_booted,
-            on_incoming_call=self.incoming_call,
-            on_hang_up=self.hung_up,
-            verbose=args.verbose
-        )
 
-    async def watchdog(self) -> None:
-        """WLAN-Verbindung (und linphonec) periodisch prüfen"""
-        await asyncio.sleep(1)
-        socket.setdefaulttimeout(1)
-        while True:
-
-            # linphonec-Prozess überwachen
-            if self.linphone is not None and not self.linphone.is_running():
-                self.linphone = None
-
-            # WLAN prüfen
-            try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-                    sock.connect((config['Network']['wifi_test_host'], 80))
-
-                # Verbindung ist verfügbar (sonst: TimeoutError/OSError)
-
-                # Verbindung war zuvor nicht verfügbar (oder es handelt sich um den ersten Startvorgang)
-                if not self.is_connected:
-                    print("WLAN-Verbindung verfügbar.")
-                    self.is_connected = True
-
-                # linphonec (neu) starten
-                if self.linphone is None:
-                    self.start_linphonec()
-
-                # Alle 60s prüfen
-                await asyncio.sleep(60)
-
-            except (TimeoutError, OSError):
-                # Verbindung war zuvor verfügbar
-                if self.is_connected:
-                    self.is_connected = False
-                    print("WLAN-Verbindung wurde getrennt.")
-
-                    # linphonec beenden
-                    if self.linphone is not None:
-                        self.linphone.terminate()
-                        self.linphone = None
-
-                await asyncio.sleep(1)
-
-    @staticmethod
-    def is_hungup() -> bool:
-        """Prüfe, ob Hörer auf Gabel liegt (aufgelegt ist)"""
-        return GPIO.input(config['Pins'].getint('gabel'))
-
-    def watch_hook(self, _) -> None:
-        """Callback/Hook: Gabelkontakt hat ausgelöst"""
-
-        if self.is_hungup():
-            # Hörer wurde soeben aufgelegt
-            print("Hörer aufgelegt")
-
-            # Wählvorgang beenden, falls aktiv
-            self.dial.end_dialing()
-            if self.dialing_timeout is not None:
-                self.dialing_timeout.cancel()
-
-            # Wiedergabe (Freizeichen, Besetzt, usw.) im Hörer stoppen
-            Audio.stop_earpiece()
-
-            # Auflegen
-            if self.linphone is not None:
-                self.linphone.hangup()
-
-            # Zustand zurücksetzen
-            self.declined_incoming_call = False
-
-            # Stoppe Timer für maximale Gesprächsdauer
-            if self.call_duration_timeout is not None:
-                self.call_duration_timeout.cancel()
-
-        else:
-            # Hörer wurde soeben abgehoben
-            print("Hörer abgehoben")
-
-            # Eingehender Anruf
-            if self.call_incoming:
-                # Wiedergabe im Hörer (nur zur Sicherheit; hier sollte nichts laufen) und Klingeln stoppen
-                Audio.stop_earpiece()
-                Audio.stop_speaker()
-
-                # Anruf annehmen
-                self.linphone.answer()
-                return
-
-            if self.is_connected and self.linphone is not None and self.linphone.is_running():
-                # WLAN verbunden und Linphone verfügbar: Freizeichen im Hörer abspielen
-                Audio.play_earpiece(config['Sounds']['waehlen_frei'])
-            else:
-                # Telefonie nicht verfügbar: Besetztton im Hörer abspielen
-                Audio.play_earpiece(config['Sounds']['waehlen_nicht_verbunden'])
-
-            # Nummernschalter überwachen
-            asyncio.run_coroutine_threadsafe(self.dial.start_dialing(), self.loop)
-
-            # Maximale Dauer des Wählvorgangs begrenzen
-            self.dialing_timeout = Timer(config['SIP'].getint('dial_timeout', fallback=60), self.cancel_dialing)
-            self.dialing_timeout.start()
-
-    def cancel_dialing(self) -> None:
-        """Timer: Wählvorgang nach einer Minute automatisch abbrechen"""
-        print("Wählvorgang nach Timeout automatisch abgebrochen.")
-        self.dial.end_dialing()
-        Audio.play_earpiece(config['Sounds']['waehlen_besetzt'], repeat=True)
-
-    def receive_number(self, number: str) -> None:
-        """
-        Callback: Ziffernfolge von rotarydial empfangen -> mit gespeicherten Kurzwahlen/Befehlen abgleichen
-        Nummer muss zwingend `str` sein, da sie mit einer 0 beginnen kann.
-        """
-
-        #print(f"Gewählte Ziffernfolge: {number}")
-        try:
-            action = config['Numbers'][number]
-        except KeyError:
-            # Ziffernfolge nicht hinterlegt
-
-            # Bereits zu viele Ziffern gewählt
-            if len(number) > 5:
-                print("Ziffernfolge zu lang, beende Wahlvorgang.")
-                self.dial.end_dialing()
-                Audio.play_earpiece(config['Sounds']['waehlen_ungueltig'])
-
-            return
-
-        print(f"Gewählt: {number} -> {action}")
-        self.dial.end_dialing()
-        self.dialing_timeout.cancel()
-        Audio.stop_earpiece()
-
-        match action:
-            case "enable-night-mode":
-                self.start_night_mode()
-                Audio.play_speaker(config['Sounds']['action_confirmed']).wait()
-                sleep(1)
-                if not self.is_hungup():
-                    # Hörer noch nicht aufgelegt
-                    Audio.play_earpiece(config['Sounds']['waehlen_besetzt'])
-
-            case "play-sleep-music":
-                # Dieser Fall sollte eigentlich nicht eintreten, da mit Abheben des Hörers die Wiedergabe stoppt
-                if self.sleep_music_thread is not None:
-                    print("Schlafmusik läuft bereits.")
-                    return
-
-                self.sleep_music_thread = Thread(target=self.start_sleep_music)
-                self.sleep_music_thread.start()
-
-            case "test-loudspeaker":
-                Audio.play_speaker(config['Sounds']['test_loud']).wait()
-                sleep(1)
-                if not self.is_hungup():
-                    # Hörer noch nicht aufgelegt
-                    Audio.play_earpiece(config['Sounds']['waehlen_besetzt'])
-
-            case "test-earpiece":
-                sleep(0.5)
-                Audio.play_earpiece(config['Sounds']['test_earpiece']).wait()
-                sleep(1)
-                if not self.is_hungup():
-                    # Hörer noch nicht aufgelegt
-                    Audio.play_earpiece(config['Sounds']['waehlen_besetzt'])
-
-            case "reboot":
-                Audio.play_speaker(config['Sounds']['reboot']).wait()
-                system("systemctl reboot -i")
-                raise SystemExit()
-
-            case "shutdown":
-                Audio.play_speaker(config['Sounds']['shutdown']).wait()
-                system("systemctl poweroff -i")
-                raise SystemExit()
-
-            case _:
-                if not self.is_connected or self.linphone is None or not self.linphone.is_running():
-                    Audio.play_earpiece(config['Sounds']['waehlen_besetzt'])
-                else:
-                    print(f"Rufe Nummer an: {action}")
-                    self.linphone.call(action)
-
-                    # Starte Timer für maximale Gesprächsdauer ausgehender Anrufe
-                    call_duration = config['SIP'].getint('max_call_duration', fallback=0)
-                    if call_duration > 0:
-                        self.call_duration_timeout = Timer(call_duration * 60, self._timeout_call)
-                        print(f"Maximale Anrufdauer: {call_duration} Minuten")
-                        self.call_duration_timeout.start()
-
-    def start_sleep_music(self) -> None:
-        """Einschlafmusik starten (eigener Thread)"""
-        sleep_music = config['Sounds'].get('sleep_music', fallback=None)
-        if sleep_music is None:
-            print("Kann Einschlafmusik nicht starten: keine Datei angegeben!")
-            return
-
-        print("Spiele Einschlafmusik.")
-        self.manual_dnd = True
-        Audio.play_speaker(sleep_music).wait()
-
-        if args.verbose:
-            print("Einschlafmusik abgespielt.")
-
-        # DND abschalten, falls Nachtlicht nicht aktiv ist
-        if self.night_light_timer is None:
-            self.manual_dnd = False
-
-        self.sleep_music_thread = None
-
-    def start_night_mode(self) -> None:
-        """Nachtmodus starten: Nachtlicht aktivieren, Aufwachlicht zu den konfigurierten Zeiten"""
-
-        if self.led.wake_light_pin is None and self.led.night_light_pin is None:
-            print("Kann Nachtmodus nicht aktivieren: Weder Nachtlicht noch Aufwachlicht sind konfiguriert.")
-            return
-
-        # Aufwachlicht abschalten
-        self.led.wake_light_off()
-
-        # Nachtmodus bereits aktiv: Nachtmodus stattdessen beenden
-        if self.night_light_timer is not None:
-            print("Deaktiviere Nacht-/Aufwachlicht.")
-            self.night_light_timer.cancel()
-            self.night_light_timer = None
-            self.led.night_light_off()
-            self.manual_dnd = False
-            return
-
-        # Nachtlicht einschalten
-        self.manual_dnd = True
-        self.led.night_light_on()
-
-        # Timer für nächsten Morgen aktivieren
-        now = datetime.now()
-        wake_up_times = config['Misc'].get('wake_up_times', fallback='').split(',')
-        if len(wake_up_times) != 7:
-            print("Kann Nachtmodus nicht aktivieren: Wochentage für wake_up_times unvollständig!")
-            return
-
-        # Fall 1: Nach Mitternacht: Aktuellen Wochentag auswählen
-        wake_up_time = datetime.combine(
-            now,
-            datetime.strptime(wake_up_times[now.weekday()], '%H:%M').time()
-        )
+sys.excepthook = dump_on_crash
+threading.excepthook = lambda hook_args: dump_on_crash(hook_args.exc_type, hook_args.exc_value, hook_args.exc_traceback)
 
-        # Fall 2: Vor Mitternacht: Nächsten Wochentag auswählen
-        if now > wake_up_time:
-            tomorrow = now + timedelta(days=1)
-            wake_up_time = datetime.combine(
-                tomorrow,
-                datetime.strptime(wake_up_times[tomorrow.weekday()], '%H:%M').time()
-            )
-
-        print(f"Aktiviere Nachtlicht bis {wake_up_time}.")
-        self.night_light_timer = Timer((wake_up_time - now).seconds, self.start_wakeup_light)
-        self.night_light_timer.start()
-
-    def start_wakeup_light(self) -> None:
-        """Aufwachlicht (zusätzlich zu Nachtlicht) aktivieren"""
-        print("Aktiviere Aufwachlicht für zwei Stunden.")
-        self.led.night_light_on(duty_cycle=100)  # Nachtlicht heller stellen
-        self.led.wake_light_on()
-        self.night_light_timer = Timer(2 * 60 * 60, self.stop_wakeup_light)
-        self.night_light_timer.start()
-
-    def stop_wakeup_light(self) -> None:
-        """Nacht- und Aufwachlicht abschalten"""
-        print("Deaktiviere Aufwachlicht.")
-        self.led.night_light_off()
-        self.led.wake_light_off()
-        self.night_light_timer = None
-        self.manual_dnd = False
-
-    def linphone_booted(self) -> None:
-        """Callback: linphonec gestartet"""
-        if self.first_boot:
-            self.first_boot = False
-            Audio.play_speaker(config['Sounds']['boot'])
-            self.led.wake_light_off()
-
-    def incoming_call(self, caller: str) -> None:
-        """Callback: Eingehender Anruf"""
-        print(f"Eingehender Anruf von {caller}")
-
-        # Anruf in bestimmten Situationen abweisen
-        now = datetime.now()
-        if (
-            not self.is_hungup() or                                # Hörer ist abgehoben
-            (0 < now.hour <= config['SIP'].getint("dnd_to")) or    # Nicht stören: Morgens
-            (0 < config['SIP'].getint("dnd_from") <= now.hour) or  # Nicht stören: Abends
-            self.manual_dnd                                        # Nicht stören: Manuell (Nachtmodus)
-        ):
-            print("Hörer ist abgehoben oder Klingelsperre ist aktiv: weise Anruf ab")
-            self.declined_incoming_call = True  # Nötig für hung_up()
-            self.linphone.hangup()
-            return
-
-        # Whitelist ist aktiv
-        if config['SIP'].getboolean("whitelist_active"):
-            print("Whitelist aktiv, prüfe Anrufer.")
-
-            if caller.startswith('00'):
-                # International format without plus sign: e.g. 0049891234 => also check for +49891234
-                caller_alt_format = f'+{caller.removeprefix('00')}'
-
-            elif caller.startswith('0'):
-                # National format: e.g. 0891234 => also check for +49891234
-                # Note: Country-specific prefix (+49) is currently not configurable
-                caller_alt_format = f'+49{caller.removeprefix('0')}'
-
-            elif caller.startswith('+'):
-                # International format with plus sign: e.g. +49891234 => also check for 0049891234
-                caller_alt_format = f'00{caller.removeprefix('+')}'
-
-            else:
-                # Unknown => No additional check
-                caller_alt_format = None
-
-            if not caller in config['Numbers'].values() and (caller_alt_format is None or not caller_alt_format in config['Numbers'].values()):
-                print("Anrufer nicht in hinterlegten Nummbern: weise Anruf ab")
-                self.declined_incoming_call = True  # Nötig für hung_up()
-                self.linphone.hangup()
-                return
-
-        self.call_incoming = True
-
-        # Klingelton spielen
-        try:
-            Audio.play_speaker(config['Ringtones'][caller], repeat=True)
-        except KeyError:
-            Audio.play_speaker(config['Sounds']['ring'], repeat=True)
 
-    def _timeout_call(self) -> None:
-        """Timer: Maximale Gesprächsdauer für ausgehende Gespräche erreicht, beende Gespräch"""
-        print("Maximale Telefondauer erreicht. Gespräch wird beendet.")
-        self.linphone.hangup()
-        Audio.play_earpiece(config['Sounds']['waehlen_besetzt'])
+def handle_loop_exception(loop: asyncio.AbstractEventLoop, context: dict) -> None:
+    """Ausnahme in Callback/Task der Event-Loop: protokollieren und Ringpuffer sichern"""
+    exception = context.get('exception')
+    log.error("Fehler in Event-Loop: {} {}", context.get('message'), repr(exception))
+    events.dump(f"loop: {context.get('message')}: {exception!r}")
+    loop.default_exception_handler(context)
 
-    def hung_up(self) -> None:
-        """Callback: Gespräch wurde (durch uns oder Gegenseite) beendet"""
-        print("Anruf beendet")
-        self.call_incoming = False
 
-        # Anruf wurde durch uns abgewiesen, da Hörer bereits abgehoben war - hier nichts weiter tun
-        if self.declined_incoming_call:
-            self.declined_incoming_call = False
-            return
+async def start_control(control: ControlServer) -> None:
+    path = config.get('Control', 'socket', fallback='')
+    if path != "":
+        await control.start(path)
 
-        # Klingeln beenden
-        Audio.stop_speaker()
 
-        # Falls Hörer abgehoben: Besetztton spielen
-        if not self.is_hungup():
-            Audio.play_earpiece(config['Sounds']['waehlen_besetzt'])
+async def main() -> None:
+    """Alle konfigurierten Telefone in einer gemeinsamen Event-Loop betreiben"""
+    boot = BootTiming(started=started)
+    boot.mark('imports', started)
+    log.info("Starte PiPhone als {}...", getuser())
+
+    loop = asyncio.get_running_loop()
+    events.attach(loop)
+    loop.set_exception_handler(handle_loop_exception)
+    notifier = SystemdNotifier(loop)
+    notifier.status("Starte...")
+
+    # Metriken aller Telefone in einem Registry, per HTTP/Unix-Socket und als Snapshot-Datei
+    registry = Registry()
+    ProcessStats.register(registry)
+    metrics_exporter = MetricsExporter(registry)
+
+    # Ein Netlink-Socket für alle Telefone
+    phones: list[PiPhone] = []
+    network_watch = NetworkWatch(loop, on_change=lambda: [phone.on_network_change() for phone in phones])
+
+    # Soundkarten einmal erkennen, Hotplug über uevents (ebenfalls geteilt)
+    sound_devices = SoundDevices(loop, settle=config.getfloat('Audio', 'hotplug_settle', fallback=0.2))
+
+    # Leistungsprofil nach Aktivität aller Telefone (optional), Ruheprofil erst nach dem Start
+    performance = None
+    if config.getboolean('Performance', 'enabled', fallback=False):
+        performance = PerformancePolicy(
+            loop,
+            root=Path(config.get('Performance', 'cpufreq_sysfs', fallback='/sys/devices/system/cpu/cpufreq')),
+            active_governor=config.get('Performance', 'governor_active', fallback='performance'),
+            idle_governor=config.get('Performance', 'governor_idle', fallback='powersave'),
+            min_freq=config.get('Performance', 'min_freq', fallback='max'),
+            dial_priority=config.getint('Performance', 'dial_priority', fallback=20),
+            audio_priority=config.getint('Performance', 'audio_priority', fallback=10),
+            dial_cpus=parse_cpus(config.get('Performance', 'dial_cpus', fallback='')),
+            audio_cpus=parse_cpus(config.get('Performance', 'audio_cpus', fallback='')),
+            idle_delay=config.getfloat('Performance', 'idle_delay', fallback=5)
+        )
+        performance.register(registry)
+
+    GPIO.setmode(GPIO.BCM)
+    for (name, phone_config) in phone_configs(config).items():
+        phones.append(PiPhone(
+            loop, name, phone_config,
+            registry=registry, notifier=notifier, network_watch=network_watch, verbose=args.verbose,
+            sound_devices=sound_devices, performance=performance
+        ))
+
+    # Laufzeitprofil auf Anforderung (SIGPROF oder Steuerung), Bericht neben dem Ringpuffer.
+    # Erst bei der ersten Messung geladen, der Start braucht es nicht
+    @cache
+    def profiler():
+        from lib.profiler import Profiler
+        return Profiler(
+            report_dir=Path(config.get('Log', 'dump_dir', fallback='/run/piphone')),
+            interval_ms=config.getfloat('Log', 'profile_interval_ms', fallback=10),
+            top=config.getint('Log', 'profile_top', fallback=10)
+        )
+    profile_seconds = config.getfloat('Log', 'profile_seconds', fallback=10)
 
+    # Steuerung und Abfrage über Unix-Socket
+    control = ControlServer(phones, registry, profiler=profiler, profile_seconds=profile_seconds)
+
+    # Systemsignale (werden von der Loop zugestellt)
+    def handle_sigterm() -> None:
+        log.info("SIGTERM/SIGINT empfangen, beende.")
+        for phone in phones:
+            phone.request_terminate()
+
+    loop.add_signal_handler(SIGTERM, handle_sigterm)
+    loop.add_signal_handler(SIGINT, handle_sigterm)
+    loop.add_signal_handler(SIGUSR1, lambda: [phone.print_status() for phone in phones])
+    loop.add_signal_handler(SIGUSR2, lambda: events.dump("SIGUSR2"))
+
+    def handle_sigprof() -> None:
+        try:
+            profiler().start(profile_seconds)
+        except ValueError as e:
+            log.warning("SIGPROF: {}", e)
+
+    loop.add_signal_handler(SIGPROF, handle_sigprof)
 
-async def main() -> None:
-    piphone = PiPhone(loop=asyncio.get_running_loop())
     try:
-        while True:
-            await asyncio.sleep(0.1)
+        # Telefone und Metriken-Server parallel starten
+        await asyncio.gather(
+            boot.measure('metriken', metrics_exporter.start(
+                listen=config.get('Metrics', 'listen', fallback=''),
+                snapshot_file=config.get('Metrics', 'snapshot_file', fallback=''),
+                snapshot_interval=config.getint('Metrics', 'snapshot_interval', fallback=0)
+            )),
+            boot.measure('steuerung', start_control(control)),
+            *(boot.measure(phone.name, phone.start()) for phone in phones)
+        )
+        connected = all(phone.is_connected for phone in phones)
+        if performance is not None:
+            performance.start()
+        notifier.ready("Bereit" if connected else "Bereit, ohne WLAN-Verbindung")
+        log.info(boot.report())
+
+        # Kein Polling: schlafen, bis SIGTERM/SIGINT oder ein Kurzbefehl (Neustart, Herunterfahren) eines
+        # Telefons das Programmende anfordert, dann alle Telefone beenden
+        await asyncio.wait(
+            [asyncio.create_task(phone.terminated.wait()) for phone in phones],
+            return_when=asyncio.FIRST_COMPLETED
+        )
+        notifier.stopping()
+        for phone in phones:
+            phone.request_terminate()
+        network_watch.close()
+        sound_devices.close()
+        if performance is not None:
+            performance.close()
+        metrics_exporter.close()
+        control.close()
 
-    except (KeyboardInterrupt, SystemExit):
         GPIO.cleanup()
-        piphone.linphone.terminate()
-        Audio.play_speaker(config['Sounds']['shutdown']).wait()
-        print("PiPhone beendet.")
+        for phone in phones:
+            if phone.linphone is not None:
+                phone.linphone.terminate()
+            if phone.intercom is not None:
+                phone.intercom.close()  # Abmelden: andere Telefone entfernen die Durchwahl sofort
+        await asyncio.gather(*(
+            Audio.wait(phone.audio.play_speaker(phone.config['Sounds']['shutdown'])) for phone in phones
+        ))
+        for phone in phones:
+            phone.log.info("PiPhone beendet. {}", phone.state.report())
+            phone.log.debug(phone.state.wakeups.report())
+        events.detach()
         exit(0)
 
     except Exception as e:
-        print(e)
+        log.error("Programm abgebrochen: {!r}", e)
+        for phone in phones:
+            phone.calls.flush()
+        if performance is not None:
+            performance.close()
+        events.detach()
+        events.dump(f"crash: {e!r}")
         GPIO.cleanup()
-        piphone.linphone.terminate()
+        for phone in phones:
+            if phone.linphone is not None:
+                phone.linphone.terminate()
         exit(1)
 
 
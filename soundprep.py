@@ -0,0 +1,107 @@
+#!/usr/bin/python3
+
+from lib.phoneconfig import phone_configs
+from lib.soundassets import (
+    configured_sounds, device_format, fingerprint, output_path, sound_role, source_duration, transcode, validate,
+    Manifest
+)
+from lib.sounddevices import read_cards
+
+import argparse
+from configparser import ConfigParser
+from pathlib import Path
+from sys import exit
+
+
+argparser = argparse.ArgumentParser(
+    prog='soundprep.py',
+    description='Alle konfigurierten Sounds in das native Format ihres Geräts (Lautsprecher bzw. Hörer) wandeln, '
+                'damit sie ohne Umwandlung per aplay abgespielt werden: Stille am Anfang entfernen, Pegel normalisieren, '
+                'Manifest mit Fingerabdrücken schreiben. Benötigt sox (mit MP3-Unterstützung: libsox-fmt-mp3).'
+)
+argparser.add_argument('-c', '--config', type=Path, default=Path("/boot/piphone/config.ini"),
+                       help='Pfad zur Konfigurationsdatei (Standard: %(default)s)')
+argparser.add_argument('-m', '--manifest', type=Path,
+                       help='Manifest, die Dateien liegen daneben (Standard: [Audio] sound_manifest)')
+argparser.add_argument('--level', type=float, default=-1,
+                       help='Spitzenpegel in dBFS nach dem Normalisieren (Standard: %(default)s)')
+argparser.add_argument('--silence', type=float, default=-50,
+                       help='Schwelle in dBFS, bis zu der Anfangsstille entfernt wird (Standard: %(default)s)')
+argparser.add_argument('-f', '--force', action='store_true', help='Auch unveränderte Sounds neu aufbereiten')
+argparser.add_argument('command', choices=('build', 'check'), nargs='?', default='build',
+                       help='build: geänderte Sounds aufbereiten, check: Manifest, Fingerabdrücke und Formate prüfen')
+args = argparser.parse_args()
+
+if not args.config.exists():
+    print(f"Konfigurationsdatei {args.config} nicht gefunden.")
+    exit(1)
+
+config = ConfigParser()
+config.read(args.config)
+manifest_path = args.manifest or Path(
+    config.get('Audio', 'sound_manifest', fallback='') or "/opt/piphone/sounds/native/manifest.json"
+)
+manifest = Manifest.load(manifest_path)
+
+# Je Quelldatei und Zielformat einmal, auch wenn mehrere Telefone oder Schlüssel dieselbe Datei verwenden
+cards = read_cards()
+jobs = {}
+for name, phone_config in phone_configs(config).items():
+    for section, key, source in configured_sounds(phone_config):
+        sound_format = device_format(phone_config, sound_role(section, key), cards)
+        jobs.setdefault(Manifest.key(source, sound_format), (source, sound_format, []))[2].append(f"{section}.{key}")
+
+failed = 0
+match args.command:
+    case 'build':
+        for source, sound_format, keys in jobs.values():
+            if not args.force and manifest.lookup(source, sound_format)[1] == "ok":
+                print(f"aktuell      {sound_format}  {source}")
+                continue
+
+            if not Path(source).is_file():
+                print(f"FEHLER       {sound_format}  {source}: Datei nicht gefunden")
+                failed += 1
+                continue
+
+            output = output_path(manifest_path.parent, source, sound_format)
+            try:
+                transcode(source, output, sound_format, level=args.level, silence=args.silence)
+                duration = validate(output, sound_format)
+            except (OSError, ValueError) as e:
+                print(f"FEHLER       {sound_format}  {source}: {e}")
+                failed += 1
+                continue
+
+            original = source_duration(source)
+            trimmed_ms = round((original - duration) * 1000) if original is not None else None
+            manifest.record(
+                source, sound_format, output,
+                duration=round(duration, 3), trimmed_ms=trimmed_ms, level_db=args.level, keys=keys
+            )
+            trimmed = f", {trimmed_ms} ms Stille entfernt" if trimmed_ms else ""
+            print(f"aufbereitet  {sound_format}  {source} -> {output.name} ({duration:.1f}s{trimmed})")
+
+        # Einträge nicht mehr konfigurierter Sounds entfernen
+        for key in manifest.entries.keys() - jobs.keys():
+            del manifest.entries[key]
+        manifest.save()
+        print(f"{len(jobs) - failed} von {len(jobs)} Sounds im Manifest {manifest_path}")
+
+    case 'check':
+        for key, (source, sound_format, keys) in jobs.items():
+            output, status = manifest.lookup(source, sound_format)
+            if output is not None:
+                entry = manifest.entries[key]
+                try:
+                    validate(Path(output), sound_format)
+                    if fingerprint(Path(source)) != entry['source_sha256'] or fingerprint(Path(output)) != entry['sha256']:
+                        status = "Fingerabdruck"
+                except (OSError, ValueError) as e:
+                    status = str(e)
+            if status != "ok":
+                failed += 1
+            print(f"{status:<12} {sound_format}  {source} ({', '.join(keys)})")
+        print(f"{len(jobs) - failed} von {len(jobs)} Sounds aktuell")
+
+exit(1 if failed > 0 else 0)
@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+
+"""
+Abtastung des Nummernschalters unter CPU-Last mit und ohne Leistungsprofil messen.
+Der Decoder-Thread tastet während eines Wählvorgangs alle 1ms ab; gemessen werden die Abstände zwischen zwei
+Abtastungen (p50, p99, Maximum) und die Anzahl der Abstände über 2ms (dabei können Impulse verloren gehen).
+Last: je CPU zwei Prozesse mit Endlosschleife (Nice 0, wie z.B. ein Update im Hintergrund).
+Mit Leistungsprofil: cpufreq unter --sysfs (ohne cpufreq nur die Priorität) und SCHED_FIFO für den Decoder.
+Simuliertes GPIO (tests/fake/RPi), benötigt root bzw. CAP_SYS_NICE.
+
+Aufruf: sudo python3 tests/benchmark-performance.py [--seconds 5] [--load 2] [--sysfs /sys/devices/system/cpu/cpufreq]
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+from pathlib import Path
+from time import perf_counter_ns, sleep
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+sys.path.insert(0, str(Path(__file__).resolve().parent / "fake"))
+
+from RPi import GPIO
+
+from lib.performance import PerformancePolicy
+from lib.rotarydial import RotaryDial
+
+PIN_NSI = 23
+PIN_NSA = 24
+
+samples: list[int] = []
+_input = GPIO.input
+
+
+def timed_input(pin: int) -> int:
+    """GPIO.input mit Zeitstempel je Abtastung (NSA wird in jedem Durchlauf gelesen)"""
+    if pin == PIN_NSA:
+        samples.append(perf_counter_ns())
+    return _input(pin)
+
+
+def percentile(values: list[float], p: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def measure(dial: RotaryDial, seconds: float) -> dict:
+    """Wählvorgang ohne Impulse (NSA offen): Decoder tastet ununterbrochen ab"""
+    samples.clear()
+    dial.start_dialing()
+    sleep(seconds)
+    dial.end_dialing()
+    sleep(0.01)
+    intervals = sorted((b - a) / 1e6 for a, b in zip(samples, samples[1:]))
+    return {
+        'samples': len(samples),
+        'p50': percentile(intervals, 0.5),
+        'p99': percentile(intervals, 0.99),
+        'max': intervals[-1],
+        'late': sum(1 for interval in intervals if interval > 2),
+    }
+
+
+def report(label: str, result: dict) -> None:
+    print(f"{label:<24} {result['samples']:>8} {result['p50']:>8.3f} {result['p99']:>8.3f} {result['max']:>8.2f} "
+          f"{result['late']:>8}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Nummernschalter unter Last mit und ohne Leistungsprofil")
+    parser.add_argument('--seconds', type=float, default=5, help="Messdauer je Variante")
+    parser.add_argument('--load', type=int, default=2, help="Lastprozesse je CPU")
+    parser.add_argument('--sysfs', default="/sys/devices/system/cpu/cpufreq", help="cpufreq-Verzeichnis")
+    args = parser.parse_args()
+
+    GPIO.setmode(GPIO.BCM)
+    GPIO.input = timed_input
+    dial = RotaryDial(PIN_NSI, PIN_NSA, receive_number_callback=lambda number: None, name="rotarydial")
+    loop = asyncio.new_event_loop()
+    policy = PerformancePolicy(loop, root=Path(args.sysfs), idle_delay=0)
+    policy.add_threads('dial', lambda: [dial.native_id])
+    policy.start()
+
+    cpus = len(os.sched_getaffinity(0))
+    print(f"{cpus} CPU(s), {args.load * cpus} Lastprozesse, {args.seconds:.0f}s je Variante\n")
+    print(f"{'Abstand in ms':<24} {'Anzahl':>8} {'p50':>8} {'p99':>8} {'max':>8} {'> 2ms':>8}")
+    report("ohne Last", measure(dial, args.seconds))
+
+    load = [
+        subprocess.Popen([sys.executable, '-c', "while True: pass"])
+        for _ in range(args.load * cpus)
+    ]
+    try:
+        sleep(0.5)
+        report("Last", measure(dial, args.seconds))
+        policy.update("benchmark", True)
+        report("Last + Leistungsprofil", measure(dial, args.seconds))
+        print(f"\nUmschalten auf aktiv: {policy.switch_seconds * 1000:.2f}ms, "
+              f"Decoder-Priorität {os.sched_getparam(dial.native_id).sched_priority}")
+        policy.update("benchmark", False)
+    finally:
+        for process in load:
+            process.kill()
+            process.wait()
+        policy.close()
+        loop.close()
+        GPIO.cleanup()
+
+
+main()
@@ -0,0 +1,197 @@
+#!/usr/bin/python3
+
+"""
+CPU-Bedarf je zusätzlichem Telefon in einem Prozess messen.
+Für 1..N Telefone wird jeweils ein eigener Prozess gestartet, der die Telefone mit simuliertem GPIO
+(tests/fake/RPi) und simuliertem linphonec (tests/fake/linphonec) in einer gemeinsamen Event-Loop betreibt:
+- Ruhe: alle Telefone aufgelegt
+- Aktiv: alle Telefone wählen gleichzeitig eine Kurzwahl, telefonieren kurz und legen wieder auf
+Benötigt aplay und sox (Wiedergabe auf ALSA-Gerät `null`).
+
+Aufruf: python3 tests/benchmark-phones.py [-n 4] [--idle 10] [--active 10]
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+from configparser import ConfigParser
+from os import times
+from pathlib import Path
+from time import monotonic, sleep
+
+REPO = Path(__file__).resolve().parent.parent
+FAKE = Path(__file__).resolve().parent / "fake"
+sys.path.insert(0, str(REPO))
+sys.path.insert(0, str(FAKE))
+
+# Pins der simulierten Telefone: je Telefon nsi, nsa, gabel
+PINS_PER_PHONE = 3
+FIRST_PIN = 2
+
+
+def cpu_seconds() -> float:
+    """CPU-Zeit des Prozesses inkl. beendeter Kindprozesse"""
+    t = times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def build_config(count: int, data_dir: str) -> ConfigParser:
+    config = ConfigParser()
+    config.read(REPO / "support" / "config-example.ini")
+    for key, path in config['Sounds'].items():
+        config.set('Sounds', key, str(REPO / "sounds" / Path(path).name))
+    for key, path in config['Ringtones'].items():
+        config.set('Ringtones', key, str(REPO / "sounds" / Path(path).name))
+    config.set('Network', 'wifi_test_host', '127.0.0.1')
+    config.set('Metrics', 'listen', '')
+    config.set('Storage', 'data_dir', data_dir)
+    config.set('SIP', 'host', '127.0.0.1')
+    config.set('SIP', 'dnd_from', '0')
+    config.set('SIP', 'dnd_to', '0')
+    config.set('SIP', 'linphonec', str(FAKE / "linphonec"))
+    config['Audio'] = {'speaker': 'null', 'earpiece': 'null'}
+
+    names = [f"telefon{i + 1}" for i in range(count)]
+    config['Phones'] = {'names': ", ".join(names)}
+    for i, name in enumerate(names):
+        pin = FIRST_PIN + i * PINS_PER_PHONE
+        config[f'{name}.Pins'] = {'nsi': str(pin), 'nsa': str(pin + 1), 'gabel': str(pin + 2)}
+    return config
+
+
+def dial_digit(GPIO, pin_nsi: int, pin_nsa: int, digit: int) -> None:
+    """Nummernschalter simulieren: NSA schließt, `digit` Impulse (60ms offen, 40ms geschlossen)"""
+    GPIO.set_input(pin_nsa, 0)
+    sleep(0.05)
+    for _ in range(digit or 10):
+        GPIO.set_input(pin_nsi, 0)
+        sleep(0.06)
+        GPIO.set_input(pin_nsi, 1)
+        sleep(0.04)
+    GPIO.set_input(pin_nsa, 1)
+    sleep(0.05)
+
+
+def call_cycles(GPIO, phone, until: float) -> int:
+    """Abheben, Kurzwahl 01 wählen, kurz telefonieren, auflegen - bis `until`"""
+    pin_nsi = phone.config['Pins'].getint('nsi')
+    pin_nsa = phone.config['Pins'].getint('nsa')
+    calls = 0
+    while monotonic() < until:
+        GPIO.set_input(phone.hook_pin, 0)
+        sleep(0.3)
+        dial_digit(GPIO, pin_nsi, pin_nsa, 0)
+        dial_digit(GPIO, pin_nsi, pin_nsa, 1)
+        sleep(1)
+        GPIO.set_input(phone.hook_pin, 1)
+        sleep(0.5)
+        calls += 1
+    return calls
+
+
+async def worker(count: int, idle: float, active: float) -> dict:
+    from RPi import GPIO
+    from lib.eventlog import events, WARNING
+    from lib.metrics import Registry
+    from lib.netwatch import NetworkWatch
+    from lib.phone import PiPhone
+    from lib.phoneconfig import phone_configs
+    from lib.sdnotify import SystemdNotifier
+
+    events.configure(output_level=WARNING)
+    loop = asyncio.get_running_loop()
+    events.attach(loop)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        config = build_config(count, data_dir)
+        phones = []
+        network_watch = NetworkWatch(loop, on_change=lambda: [phone.on_network_change() for phone in phones])
+        GPIO.setmode(GPIO.BCM)
+        for (name, phone_config) in phone_configs(config).items():
+            phones.append(PiPhone(
+                loop, name, phone_config,
+                registry=Registry(), notifier=SystemdNotifier(loop), network_watch=network_watch
+            ))
+        await asyncio.gather(*(phone.start() for phone in phones))
+        await asyncio.sleep(1)  # Bootsounds ausklingen lassen
+
+        started = cpu_seconds()
+        await asyncio.sleep(idle)
+        cpu_idle = cpu_seconds() - started
+
+        started = cpu_seconds()
+        until = monotonic() + active
+        calls = await asyncio.gather(*(asyncio.to_thread(call_cycles, GPIO, phone, until) for phone in phones))
+        cpu_active = cpu_seconds() - started
+
+        for phone in phones:
+            phone.request_terminate()
+            if phone.linphone is not None:
+                phone.linphone.terminate()
+        network_watch.close()
+
+    return {
+        'phones': count,
+        'threads': threading.active_count(),
+        'cpu_idle': cpu_idle / idle,
+        'cpu_active': cpu_active / active,
+        'calls': sum(calls),
+        'connected': all(phone.is_connected for phone in phones),
+    }
+
+
+def probe_target() -> socket.socket | None:
+    """Ziel für die WLAN-Prüfung der Telefone (127.0.0.1:80), sonst laufen alle Telefone ohne linphonec"""
+    try:
+        server = socket.create_server(('127.0.0.1', 80))
+    except OSError as e:
+        print(f"Hinweis: Port 80 nicht verfügbar ({e}), Telefone laufen ohne linphonec.")
+        return None
+
+    def accept() -> None:
+        while True:
+            server.accept()[0].close()
+
+    threading.Thread(target=accept, daemon=True).start()
+    return server
+
+
+argparser = argparse.ArgumentParser(description='CPU-Bedarf je zusätzlichem Telefon in einem Prozess messen')
+argparser.add_argument('-n', '--phones', type=int, default=4, help='Maximale Anzahl Telefone (Standard: %(default)s)')
+argparser.add_argument('--idle', type=float, default=10, help='Messdauer Ruhe in s (Standard: %(default)s)')
+argparser.add_argument('--active', type=float, default=10, help='Messdauer Aktiv in s (Standard: %(default)s)')
+argparser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+args = argparser.parse_args()
+
+if args.worker is not None:
+    print(json.dumps(asyncio.run(worker(args.worker, args.idle, args.active))))
+    sys.exit(0)
+
+server = probe_target()
+print(f"{'Telefone':>8} {'Threads':>8} {'CPU Ruhe':>10} {'CPU Aktiv':>10} {'Δ Ruhe':>8} {'Δ Aktiv':>8} {'Anrufe':>7}")
+previous = None
+for count in range(1, args.phones + 1):
+    result = subprocess.run(
+        [sys.executable, __file__, '--worker', str(count), '--idle', str(args.idle), '--active', str(args.active)],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        print(result.stdout, result.stderr)
+        sys.exit(1)
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+
+    delta_idle = stats['cpu_idle'] - previous['cpu_idle'] if previous is not None else stats['cpu_idle']
+    delta_active = stats['cpu_active'] - previous['cpu_active'] if previous is not None else stats['cpu_active']
+    print(
+        f"{count:>8} {stats['threads']:>8} {stats['cpu_idle']:>9.2%} {stats['cpu_active']:>9.2%}"
+        f" {delta_idle:>7.2%} {delta_active:>7.2%} {stats['calls']:>7}"
+    )
+    previous = stats
+
+if server is not None:
+    server.close()
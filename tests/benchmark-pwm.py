@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+
+"""
+CPU-Bedarf von Software-PWM (RPi.GPIO, bisheriges Nachtlicht) und Hardware-PWM (/sys/class/pwm) vergleichen.
+Je Variante wird die CPU-Zeit dieses Prozesses (inkl. PWM-Thread von RPi.GPIO) über die Messdauer erfasst:
+- Ruhe: keine LED aktiv (Referenz)
+- Konstant: LED mit fester Helligkeit
+- Sonnenaufgang: Helligkeitsverlauf in der Event-Loop, auf die Messdauer verkürzt
+Auf dem Raspberry Pi ausführen; Hardware-PWM benötigt z.B. dtoverlay=pwm-2chan,pin=18,func=2,pin2=19,func2=2.
+
+Aufruf: sudo python3 tests/benchmark-pwm.py [--pin 18] [--duty 50] [--seconds 10]
+"""
+
+import argparse
+import asyncio
+import sys
+from os import times
+from pathlib import Path
+from time import sleep
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from RPi import GPIO
+
+from lib.effects import Ramp
+from lib.led import Led
+from lib.pwm import PwmOutput, SoftwarePwm, SysfsPwm
+
+
+def cpu_seconds() -> float:
+    t = times()
+    return t.user + t.system
+
+
+def measure_constant(output: PwmOutput | None, duty: float, seconds: float) -> float:
+    if output is not None:
+        output.set(duty, Led.FREQUENCY)
+    started = cpu_seconds()
+    sleep(seconds)
+    used = cpu_seconds() - started
+    if output is not None:
+        output.off()
+    return used / seconds
+
+
+async def measure_ramp(output: PwmOutput, duty: float, seconds: float) -> float:
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+    output.set(0, Led.FREQUENCY)
+    started = cpu_seconds()
+    Ramp(loop.call_later, output, seconds, duty, on_done=lambda: done.set_result(None)).start()
+    await done
+    used = cpu_seconds() - started
+    output.off()
+    return used / seconds
+
+
+argparser = argparse.ArgumentParser(description='CPU-Bedarf von Software- und Hardware-PWM vergleichen')
+argparser.add_argument('--pin', type=int, default=18, help='GPIO (BCM) mit Hardware-PWM-Kanal (Standard: %(default)s)')
+argparser.add_argument('--duty', type=float, default=50, help='Helligkeit in Prozent (Standard: %(default)s)')
+argparser.add_argument('--seconds', type=float, default=10, help='Messdauer je Variante in s (Standard: %(default)s)')
+argparser.add_argument('--sysfs', type=Path, default=Path("/sys/class/pwm"), help='sysfs-Pfad (Standard: %(default)s)')
+args = argparser.parse_args()
+
+GPIO.setmode(GPIO.BCM)
+GPIO.setwarnings(False)
+
+results = {'Ruhe': {'konstant': measure_constant(None, 0, args.seconds)}}
+
+software = SoftwarePwm(args.pin, Led.FREQUENCY)
+results['Software-PWM'] = {
+    'konstant': measure_constant(software, args.duty, args.seconds),
+    'sonnenaufgang': asyncio.run(measure_ramp(software, args.duty, args.seconds)),
+}
+GPIO.cleanup(args.pin)
+
+try:
+    hardware = SysfsPwm(args.pin, Led.FREQUENCY, root=args.sysfs)
+except (KeyError, OSError) as e:
+    print(f"Hinweis: Hardware-PWM an GPIO {args.pin} nicht verfügbar ({e!r}).")
+else:
+    results['Hardware-PWM'] = {
+        'konstant': measure_constant(hardware, args.duty, args.seconds),
+        'sonnenaufgang': asyncio.run(measure_ramp(hardware, args.duty, args.seconds)),
+    }
+
+print(f"GPIO {args.pin}, {Led.FREQUENCY} Hz, Duty {args.duty:.0f}%, je {args.seconds:.0f}s")
+print(f"{'Variante':<14} {'Konstant':>10} {'Sonnenaufgang':>14}")
+for name, result in results.items():
+    ramp = f"{result['sonnenaufgang']:.2%}" if 'sonnenaufgang' in result else "-"
+    print(f"{name:<14} {result['konstant']:>9.2%} {ramp:>14}")
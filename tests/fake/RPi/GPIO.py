@@ -0,0 +1,81 @@
+"""
+Simuliertes RPi.GPIO für Benchmarks und Tests ohne Raspberry Pi.
+Eingänge werden mit `set_input()` gesetzt, registrierte Flanken-Callbacks laufen im aufrufenden Thread.
+"""
+
+BCM = 11
+BOARD = 10
+IN = 1
+OUT = 0
+PUD_UP = 22
+PUD_DOWN = 21
+RISING = 31
+FALLING = 32
+BOTH = 33
+
+_levels: dict[int, int] = {}
+_callbacks: dict[int, callable] = {}
+
+
+def setmode(mode: int) -> None:
+    pass
+
+
+def setwarnings(enabled: bool) -> None:
+    pass
+
+
+def setup(pin: int, mode: int, pull_up_down: int = PUD_UP, initial: int | None = None) -> None:
+    _levels.setdefault(pin, 0 if pull_up_down == PUD_DOWN else 1)
+
+
+def input(pin: int) -> int:
+    return _levels.get(pin, 1)
+
+
+def output(pin: int, value: bool) -> None:
+    _levels[pin] = int(bool(value))
+
+
+def add_event_detect(pin: int, edge: int, callback: callable = None, bouncetime: int | None = None) -> None:
+    _callbacks[pin] = callback
+
+
+def remove_event_detect(pin: int) -> None:
+    _callbacks.pop(pin, None)
+
+
+def cleanup(channel: int | None = None) -> None:
+    if channel is None:
+        _callbacks.clear()
+    else:
+        _callbacks.pop(channel, None)
+
+
+def set_input(pin: int, value: int) -> None:
+    """Simulation: Pegel eines Eingangs ändern und ggf. Flanken-Callback auslösen"""
+    if _levels.get(pin) == value:
+        return
+    _levels[pin] = value
+    callback = _callbacks.get(pin)
+    if callback is not None:
+        callback(pin)
+
+
+class PWM:
+    def __init__(self, pin: int, frequency: float):
+        self.pin = pin
+        self.frequency = frequency
+        self.duty_cycle = 0
+
+    def start(self, duty_cycle: float) -> None:
+        self.duty_cycle = duty_cycle
+
+    def ChangeDutyCycle(self, duty_cycle: float) -> None:
+        self.duty_cycle = duty_cycle
+
+    def ChangeFrequency(self, frequency: float) -> None:
+        self.frequency = frequency
+
+    def stop(self) -> None:
+        self.duty_cycle = 0
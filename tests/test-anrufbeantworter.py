@@ -0,0 +1,145 @@
+#!/usr/bin/python3
+
+"""
+Aufzeichnung des Anrufbeantworters prüfen: linphonec wird durch einen Thread ersetzt, der WAV in die FIFO schreibt,
+sox durch ein Python-Skript, das die Rohdaten (optional gebremst) in die Zieldatei kopiert.
+- Schneller Encoder: alle Daten kommen an, der Puffer bleibt unter seiner festen Größe
+- Langsamer Encoder (unter 10x Echtzeit): der Schreiber (linphonec) wird nie gebremst, überzählige Daten werden verworfen
+- Encoder startet nicht oder bricht ab: Daten werden bis zum Ende verworfen, ohne Absturzbericht in der Event-Loop
+
+Aufruf: python3 tests/test-anrufbeantworter.py
+"""
+
+import asyncio
+import struct
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from time import monotonic, sleep
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.voicemail import Mailbox, Recorder
+
+RATE = 16000
+SECONDS = 10
+SPEED = 10  # Schreiber läuft 10x schneller als Echtzeit
+BUFFER = 16 * 1024
+
+ENCODER = """
+import sys, time
+delay = float(sys.argv[1])
+with open(sys.argv[-1], 'wb') as output:
+    while chunk := sys.stdin.buffer.read(4096):
+        output.write(chunk)
+        time.sleep(delay)
+"""
+
+
+def wav_writer(path: Path, seconds: float, durations: list) -> None:
+    """Wie linphonec: Header mit unbekannter Länge, danach 20ms-Pakete (im Zeitraffer)"""
+    started = monotonic()
+    with open(path, 'wb') as fifo:
+        fifo.write(b"RIFF" + struct.pack('<I', 0) + b"WAVE")
+        fifo.write(b"fmt " + struct.pack('<IHHIIHH', 16, 1, 1, RATE, RATE * 2, 2, 16))
+        fifo.write(b"LIST" + struct.pack('<I', 4) + b"INFO")  # Zusätzlicher Chunk vor den Daten
+        fifo.write(b"data" + struct.pack('<I', 0))
+        frame = bytes(range(256)) * (RATE * 2 // 50 // 256) + bytes(RATE * 2 // 50 % 256)
+        for _ in range(int(seconds * 50)):
+            fifo.write(frame)
+            fifo.flush()
+            sleep(0.02 / SPEED)
+    durations.append(monotonic() - started)
+
+
+async def record(directory: Path, delay: float) -> Recorder:
+    loop = asyncio.get_running_loop()
+    encoder = directory / "encoder.py"
+    encoder.write_text(ENCODER)
+    recorder = Recorder(
+        loop, directory / "record.fifo", directory / f"message-{delay}.raw",
+        buffer_size=BUFFER, encoder=f"{sys.executable} {encoder} {delay}"
+    )
+    recorder.start()
+
+    # Puffergröße während der Aufzeichnung beobachten
+    largest = 0
+    durations = []
+    writer = threading.Thread(target=wav_writer, args=(recorder.fifo, SECONDS, durations))
+    writer.start()
+    while writer.is_alive():
+        largest = max(largest, len(recorder._buffer))
+        await asyncio.sleep(0.001)
+    recorder.stop()
+    await recorder.finished
+
+    assert largest <= BUFFER, largest
+    assert recorder.rate == RATE and recorder.channels == 1
+    print(
+        f"     Encoder {delay * 1000:.0f}ms/4KiB: {recorder.seconds:.1f}s aufgezeichnet, {recorder.bytes_dropped} Bytes"
+        f" verworfen, Puffer max. {largest} Bytes, Schreiber {durations[0] * 1000:.0f}ms"
+    )
+    return recorder
+
+
+async def record_failing(directory: Path, encoder: str) -> Recorder:
+    """Aufzeichnung mit defektem Encoder: Schreiber läuft durch, `finished` wird trotzdem erfüllt"""
+    recorder = Recorder(asyncio.get_running_loop(), directory / "record.fifo", directory / "defekt.raw", encoder=encoder)
+    recorder.start()
+    writer = threading.Thread(target=wav_writer, args=(recorder.fifo, 1, []))
+    writer.start()
+    while writer.is_alive():
+        await asyncio.sleep(0.01)
+    recorder.stop()
+    await asyncio.wait_for(recorder.finished, timeout=5)
+    assert recorder._read_fd is None and not recorder.fifo.exists()
+    assert recorder.bytes_dropped > 0
+    return recorder
+
+
+async def main() -> None:
+    crashes = []
+    asyncio.get_running_loop().set_exception_handler(lambda loop, context: crashes.append(context))
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+
+        recorder = await record(directory, 0)
+        assert recorder.bytes_dropped == 0
+        assert recorder.output.stat().st_size == RATE * 2 * SECONDS
+        print("OK   Schneller Encoder")
+
+        recorder = await record(directory, 0.05)
+        assert recorder.bytes_dropped > 0
+        assert recorder.output.stat().st_size == RATE * 2 * SECONDS - recorder.bytes_dropped
+        print("OK   Langsamer Encoder")
+
+        # Ohne Daten (Anrufer legt vor Beginn der Aufzeichnung auf)
+        recorder = Recorder(asyncio.get_running_loop(), directory / "record.fifo", directory / "leer.raw")
+        recorder.start()
+        recorder.stop()
+        assert await recorder.finished is None and not recorder.fifo.exists()
+        print("OK   Keine Daten")
+
+        recorder = await record_failing(directory, "/nonexistent-sox")
+        assert recorder.finished.result() is None and recorder.bytes_dropped == recorder.bytes_recorded
+        assert not crashes, crashes
+        print("OK   Encoder nicht gestartet: Daten verworfen, kein Absturzbericht")
+
+        aborting = directory / "abbruch.py"
+        aborting.write_text("import sys\nsys.stdin.buffer.read(4096)\n")
+        recorder = await record_failing(directory, f"{sys.executable} {aborting}")
+        assert not crashes, crashes
+        print(f"OK   Encoder abgebrochen: {recorder.bytes_dropped} Bytes verworfen, kein Absturzbericht")
+
+        mailbox = Mailbox(directory / "data")
+        path = mailbox.path_for("+49 891234", "ogg")
+        path.write_bytes(b"")
+        mailbox.add(path)
+        assert Mailbox(directory / "data").new_count == 1 == mailbox.new_count
+        mailbox.mark_heard(mailbox.new_messages()[0])
+        assert mailbox.new_count == 0 and len(list((mailbox.directory / "old").iterdir())) == 1
+        print("OK   Postfach")
+
+
+asyncio.run(main())
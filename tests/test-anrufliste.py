@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+
+"""
+Anrufliste prüfen: Suche nach `since` auf einer Datei, deren Zeilen nur ungefähr nach Gesprächsende sortiert sind
+(überlappende Anrufe mehrerer Telefone, Uhr nach NTP-Abgleich zurückgestellt), muss dieselben Anrufe liefern wie
+ein vollständiges Durchlesen. Dazu verpasste und abgewiesene Anrufe (Nicht stören, Whitelist) getrennt zählen.
+
+Aufruf: python3 tests/test-anrufliste.py
+"""
+
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.cdr import CallRecord, MAX_DISORDER, read_records
+
+START = 1_780_000_000
+
+
+def record(end: int, duration: int, direction: str = "in", answered: bool = True, reason: str | None = None) -> str:
+    call = CallRecord(direction, f"0{end % 1000:03d}", start=end - duration)
+    call.end = end
+    call.answer = end - duration + 5 if answered else None
+    call.reason = reason
+    return call.to_line()
+
+
+def main() -> None:
+    rng = random.Random(1)
+    lines, ends = [], []
+    now = START
+    for n in range(20000):
+        now += rng.randint(60, 3600)
+        end = now
+        if n % 7 == 0:
+            end -= rng.randint(1, 4 * 3600)  # Zweites Telefon: Gespräch endete früher, später angehängt
+        if n == 12000:
+            now -= 6 * 3600  # Uhr nach NTP-Abgleich sechs Stunden zurückgestellt
+        lines.append(record(end, rng.randint(10, 600)))
+        ends.append(end)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "calls.jsonl"
+        path.write_text("".join(lines))
+        assert any(b < a for a, b in zip(ends, ends[1:])), "Testdaten sind sortiert"
+
+        # Suche gegen vollständiges Durchlesen
+        started = time.perf_counter()
+        for since in rng.sample(range(START, now), 200):
+            expected = sorted(end for end in ends if end >= since)
+            found = sorted(call.end for call in read_records(path, since=since))
+            assert found == expected, (since, len(found), len(expected))
+        elapsed = (time.perf_counter() - started) / 200
+        print(f"OK   since auf {len(lines)} unsortierten Zeilen wie vollständiges Durchlesen "
+              f"({elapsed * 1000:.1f}ms je Abfrage, Spanne {MAX_DISORDER // 3600}h)")
+
+        # Verpasst und abgewiesen
+        path.write_text("".join([
+            record(START + 10, 60),
+            record(START + 20, 30, answered=False),
+            record(START + 30, 0, answered=False, reason="dnd"),
+            record(START + 40, 0, answered=False, reason="whitelist"),
+            record(START + 50, 0, answered=False, reason="offhook"),
+            record(START + 60, 40, answered=False, reason="voicemail"),
+            record(START + 70, 0, direction="out", answered=False, reason="offline"),
+        ]))
+        calls = list(read_records(path))
+        missed = [call.end - START for call in calls if call.missed]
+        rejected = [call.end - START for call in calls if call.rejected]
+        assert missed == [20, 60], missed
+        assert rejected == [30, 40, 50], rejected
+        print("OK   Verpasst: nicht angenommen und Anrufbeantworter, abgewiesen: Nicht stören, Whitelist, abgehoben")
+
+
+main()
@@ -0,0 +1,441 @@
+#!/usr/bin/python3
+
+"""
+Dauerlauf: PiPhone auf einer virtuellen Uhr über Wochen betreiben, um Lecks und Fehler zu finden,
+die erst nach langer Laufzeit auftreten (nicht eingesammelte Prozesse, Threads, Dateideskriptoren, Speicher).
+
+Die Event-Loop überspringt Wartezeiten, in denen nichts passiert: Timer (Wähl-Timeout, Gesprächsdauer,
+Nachtlicht, Sonnenaufgang, Watchdog) laufen in virtueller Zeit, ebenso `datetime.now()` in lib/phone.py.
+Was echte Zeit braucht (Nummernschalter, Gabel, linphonec antwortet), läuft in Echtzeit-Abschnitten.
+Simuliertes GPIO (tests/fake/RPi) und linphonec (tests/fake/linphonec), WLAN-Prüfung gegen einen lokalen Server.
+
+Je Tag (zufällig, aber reproduzierbar per --seed): eingehende Anrufe (angenommen, nicht angenommen, Gegenseite legt
+auf), ausgehende Anrufe per Nummernschalter, ungültige Nummern, WLAN-Ausfälle, abends Nachtmodus per Kurzwahl,
+morgens Aufwachlicht. Jeden Tag um 3 Uhr werden Threads, Kindprozesse (inkl. Zombies), Dateideskriptoren und RSS
+erfasst; am Ende werden Zuwachs je Tag ausgegeben und Obergrenzen geprüft.
+Benötigt aplay und sox (Wiedergabe auf ALSA-Gerät `null`).
+
+Aufruf: python3 tests/test-dauerlauf.py [--days 14] [--seed 1]
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import random
+import selectors
+import sys
+import tempfile
+import threading
+from configparser import ConfigParser
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from signal import SIGUSR1, SIGUSR2
+from time import monotonic, sleep
+
+REPO = Path(__file__).resolve().parent.parent
+FAKE = Path(__file__).resolve().parent / "fake"
+sys.path.insert(0, str(REPO))
+sys.path.insert(0, str(FAKE))
+
+from RPi import GPIO
+
+import lib.phone
+from lib.callstate import CallState
+from lib.eventlog import events, WARNING
+from lib.metrics import Registry
+from lib.netwatch import NetworkWatch
+from lib.phone import PiPhone
+from lib.sdnotify import SystemdNotifier
+
+QUANTUM = 0.002  # So lange (echte Zeit) wird auf I/O gewartet, bevor die Uhr zum nächsten Timer springt
+START = datetime(2026, 3, 2)  # Montag, 0 Uhr
+WIFI_PORT = 18080
+
+# Erlaubter Zuwachs nach dem ersten Tag (Einschwingen: Thread-Pool, Caches)
+LIMITS = {'threads': 2, 'children': 2, 'zombies': 1, 'fds': 4, 'rss_kb': 4096}
+
+
+class VirtualClock:
+    """Virtuelle Zeit = echte Zeit + übersprungene Wartezeiten"""
+
+    offset: float = 0.0
+    realtime_sections: int = 0  # > 0: keine Zeitsprünge
+    loop: asyncio.AbstractEventLoop | None = None
+    started: float = 0.0
+
+    def now(self) -> datetime:
+        return START + timedelta(seconds=self.loop.time() - self.started)
+
+    @contextmanager
+    def realtime(self):
+        """Echtzeit-Abschnitt: Nummernschalter, Gabel, Antworten von linphonec abwarten"""
+        self.realtime_sections += 1
+        try:
+            yield
+        finally:
+            self.realtime_sections -= 1
+
+
+class WarpSelector(selectors.DefaultSelector):
+    """Kurz auf I/O warten; passiert nichts, die Uhr bis zum nächsten Timer vorstellen statt zu schlafen"""
+
+    def __init__(self, clock: VirtualClock):
+        super().__init__()
+        self.clock = clock
+
+    def select(self, timeout: float | None = None):
+        if self.clock.realtime_sections > 0 or timeout is None or timeout <= QUANTUM:
+            return super().select(timeout)
+        ready = super().select(QUANTUM)
+        if not ready:
+            self.clock.offset += timeout - QUANTUM
+        return ready
+
+
+class VirtualLoop(asyncio.SelectorEventLoop):
+    def __init__(self, clock: VirtualClock):
+        super().__init__(WarpSelector(clock))
+        self.clock = clock
+
+    def time(self) -> float:
+        return super().time() + self.clock.offset
+
+
+clock = VirtualClock()
+
+
+class VirtualDatetime(datetime):
+    """datetime.now() in lib/phone.py (Nachtmodus, Klingelsperre) folgt der virtuellen Uhr"""
+
+    @classmethod
+    def now(cls, tz=None) -> datetime:
+        return clock.now()
+
+
+def build_config(data_dir: str) -> ConfigParser:
+    config = ConfigParser()
+    config.read(REPO / "support" / "config-example.ini")
+    for key, path in config['Sounds'].items():
+        config.set('Sounds', key, str(REPO / "sounds" / Path(path).name))
+    for key, path in config['Ringtones'].items():
+        config.set('Ringtones', key, str(REPO / "sounds" / Path(path).name))
+    config.set('Network', 'wifi_test_host', '127.0.0.1')
+    config.set('Network', 'wifi_test_port', str(WIFI_PORT))
+    config.set('Metrics', 'listen', '')
+    config.set('Storage', 'data_dir', data_dir)
+    config.set('SIP', 'host', '127.0.0.1')
+    config.set('SIP', 'linphonec', str(FAKE / "linphonec"))
+    config.set('Misc', 'night_light_pin', '18')
+    config.set('Misc', 'wake_light_pin', '19')
+    config.set('Misc', 'pwm_backend', 'software')
+    config['Audio'] = {'speaker': 'null', 'earpiece': 'null'}
+    return config
+
+
+def measure(collect: bool = True) -> dict:
+    """Ressourcen des Prozesses: Threads, Kindprozesse (davon Zombies), Dateideskriptoren, RSS"""
+    if collect:
+        gc.collect()  # Zyklische Referenzen (auch auf Popen-Objekte) freigeben
+    pid = os.getpid()
+    children = zombies = 0
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        fields = stat.rsplit(')', 1)[1].split()
+        if int(fields[1]) == pid:
+            children += 1
+            zombies += fields[0] == 'Z'
+    rss_kb = 0
+    for line in Path("/proc/self/status").read_text().splitlines():
+        if line.startswith("VmRSS:"):
+            rss_kb = int(line.split()[1])
+    return {
+        'threads': threading.active_count(),
+        'children': children,
+        'zombies': zombies,
+        'fds': len(os.listdir("/proc/self/fd")),
+        'rss_kb': rss_kb,
+    }
+
+
+def slope(values: list[float]) -> float:
+    """Zuwachs je Tag (lineare Regression)"""
+    n = len(values)
+    if n < 2:
+        return 0.0
+    mean_x = (n - 1) / 2
+    mean_y = sum(values) / n
+    return (sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values))
+            / sum((x - mean_x) ** 2 for x in range(n)))
+
+
+class Soak:
+    phone: PiPhone
+    rng: random.Random
+    server: asyncio.Server | None = None
+    counts: dict[str, int]
+    max_zombies: int = 0  # Nach jedem Ablauf ohne gc.collect() gezählt: nicht eingesammelte Wiedergabeprozesse
+
+    def __init__(self, phone: PiPhone, seed: int):
+        self.phone = phone
+        self.rng = random.Random(seed)
+        self.counts = {}
+
+    def count(self, what: str) -> None:
+        self.counts[what] = self.counts.get(what, 0) + 1
+
+    async def until(self, condition: callable, what: str, timeout: float = 5) -> None:
+        """In Echtzeit warten, bis `condition()` zutrifft"""
+        with clock.realtime():
+            deadline = monotonic() + timeout
+            while not condition():
+                if monotonic() > deadline:
+                    raise AssertionError(f"{clock.now():%a %d.%m. %H:%M}: Timeout: {what} (Zustand {self.phone.state.state.value})")
+                await asyncio.sleep(0.005)
+
+    async def sleep_until(self, when: datetime) -> None:
+        seconds = (when - clock.now()).total_seconds()
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+
+    def state(self, *states: CallState) -> callable:
+        return lambda: self.phone.state.is_in(*states)
+
+    # WLAN-Prüfung
+
+    async def start_wifi(self) -> None:
+        async def accept(reader, writer) -> None:
+            writer.close()
+        self.server = await asyncio.start_server(accept, '127.0.0.1', WIFI_PORT, reuse_address=True)
+
+    async def wifi_flap(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+        self.phone.on_network_change()
+        await self.until(lambda: not self.phone.is_connected, "WLAN getrennt")
+        await asyncio.sleep(self.rng.uniform(30, 3600))
+        await self.start_wifi()
+        self.phone.on_network_change()
+        await self.until(self.linphonec_ready, "linphonec nach WLAN-Ausfall", timeout=10)
+        self.count("wlan_ausfall")
+
+    def linphonec_ready(self) -> bool:
+        return self.phone.telephony_available() and self.phone.linphone.line_received
+
+    # Gabel und Nummernschalter
+
+    async def hook(self, off_hook: bool) -> None:
+        with clock.realtime():
+            GPIO.set_input(self.phone.hook_pin, 0 if off_hook else 1)
+            await asyncio.sleep(0.05)
+
+    def dial_digits(self, digits: str) -> None:
+        """Thread: Impulse wie in tests/benchmark-phones.py"""
+        pin_nsi = self.phone.config['Pins'].getint('nsi')
+        pin_nsa = self.phone.config['Pins'].getint('nsa')
+        for digit in digits:
+            GPIO.set_input(pin_nsa, 0)
+            sleep(0.05)
+            for _ in range(int(digit) or 10):
+                GPIO.set_input(pin_nsi, 0)
+                sleep(0.06)
+                GPIO.set_input(pin_nsi, 1)
+                sleep(0.04)
+            GPIO.set_input(pin_nsa, 1)
+            sleep(0.05)
+
+    async def dial(self, digits: str) -> None:
+        with clock.realtime():
+            await asyncio.to_thread(self.dial_digits, digits)
+
+    # Abläufe
+
+    async def incoming_call(self) -> None:
+        """Anruf von außen: angenommen (Auflegen hier oder Gegenseite) oder nicht angenommen"""
+        await self.until(self.linphonec_ready, "linphonec bereit")
+        os.kill(self.phone.linphone.linphone.pid, SIGUSR1)
+        try:
+            await self.until(self.state(CallState.RINGING), "Klingeln", timeout=1)
+        except AssertionError:
+            if self.phone.manual_dnd or self.phone.state.is_in(CallState.IDLE):
+                self.count("anruf_abgewiesen")  # Klingelsperre
+                return
+            raise
+
+        if self.rng.random() < 0.3:
+            await asyncio.sleep(self.rng.uniform(5, 40))
+            os.kill(self.phone.linphone.linphone.pid, SIGUSR2)
+            await self.until(self.state(CallState.IDLE), "Klingeln endet")
+            self.count("anruf_verpasst")
+            return
+
+        await asyncio.sleep(self.rng.uniform(2, 15))
+        await self.hook(off_hook=True)
+        await self.until(self.state(CallState.IN_CALL), "Gespräch angenommen")
+        await asyncio.sleep(self.rng.uniform(30, 1800))
+        if self.rng.random() < 0.5:
+            os.kill(self.phone.linphone.linphone.pid, SIGUSR2)
+            await self.until(self.state(CallState.BUSY), "Besetztton nach Auflegen der Gegenseite")
+            await asyncio.sleep(self.rng.uniform(1, 10))
+        await self.hook(off_hook=False)
+        await self.until(self.state(CallState.IDLE), "Aufgelegt")
+        self.count("anruf_angenommen")
+
+    async def outgoing_call(self) -> None:
+        """Kurzwahl wählen, telefonieren (ggf. bis zur maximalen Gesprächsdauer), auflegen"""
+        await self.until(self.linphonec_ready, "linphonec bereit")
+        await self.hook(off_hook=True)
+        await self.until(self.state(CallState.DIALING), "Wählen")
+        await self.dial(self.rng.choice(["01", "02", "03"]))
+        await self.until(self.state(CallState.IN_CALL), "Gespräch")
+        await asyncio.sleep(self.rng.uniform(30, 1200))
+        await self.hook(off_hook=False)
+        await self.until(self.state(CallState.IDLE), "Aufgelegt")
+        self.count("anruf_ausgehend")
+
+    async def invalid_number(self) -> None:
+        """Ungültige Nummer wählen oder Wähl-Timeout abwarten, dann auflegen"""
+        await self.hook(off_hook=True)
+        await self.until(self.state(CallState.DIALING), "Wählen")
+        if self.rng.random() < 0.5:
+            await self.dial("999999")
+        else:
+            await asyncio.sleep(120)  # Wähl-Timeout
+        await self.until(self.state(CallState.BUSY), "Besetztton")
+        await asyncio.sleep(self.rng.uniform(1, 10))
+        await self.hook(off_hook=False)
+        await self.until(self.state(CallState.IDLE), "Aufgelegt")
+        self.count("ungueltig")
+
+    async def night_mode(self) -> None:
+        """Kurzwahl 11 (enable-night-mode); Aufwachlicht läuft am nächsten Morgen über die Timer"""
+        await self.hook(off_hook=True)
+        await self.until(self.state(CallState.DIALING), "Wählen")
+        await self.dial("11")
+        await self.until(self.state(CallState.BUSY), "Kurzbefehl ausgeführt", timeout=10)
+        await self.hook(off_hook=False)
+        await self.until(self.state(CallState.IDLE), "Aufgelegt")
+        if self.phone.night_light_timer is None:
+            raise AssertionError("Nachtmodus nicht aktiv")
+        self.count("nachtmodus")
+
+    async def day(self, day: datetime) -> None:
+        """Ereignisse eines Tages zwischen 8 und 19:30 Uhr, abends Nachtmodus"""
+        actions = (
+            [self.incoming_call] * self.rng.randint(2, 6)
+            + [self.outgoing_call] * self.rng.randint(1, 4)
+            + [self.invalid_number] * self.rng.randint(0, 1)
+            + [self.wifi_flap] * self.rng.randint(0, 1)
+        )
+        times = sorted(self.rng.uniform(8, 19) for _ in actions)
+        self.rng.shuffle(actions)
+        for hour, action in zip(times, actions):
+            await self.sleep_until(day + timedelta(hours=hour))
+            await action()
+            self.max_zombies = max(self.max_zombies, measure(collect=False)['zombies'])
+
+        await self.sleep_until(day + timedelta(hours=19, minutes=30))
+        if self.phone.night_light_timer is not None:
+            raise AssertionError("Nachtmodus vom Vortag noch aktiv")
+        await self.night_mode()
+        await self.sleep_until(day + timedelta(hours=21))
+        await self.incoming_call()  # Nachtmodus: abgewiesen
+
+
+async def main(days: int, seed: int) -> None:
+    loop = asyncio.get_running_loop()
+    clock.loop = loop
+    clock.started = loop.time()
+    lib.phone.datetime = VirtualDatetime
+
+    events.configure(output_level=WARNING)
+    events.attach(loop)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        GPIO.setmode(GPIO.BCM)
+        network_watch = NetworkWatch(loop, on_change=lambda: None)
+        phone = PiPhone(
+            loop, "default", build_config(data_dir),
+            registry=Registry(), notifier=SystemdNotifier(loop), network_watch=network_watch
+        )
+        soak = Soak(phone, seed)
+        await soak.start_wifi()
+        with clock.realtime():
+            await phone.start()
+        start_threads = sorted(thread.name for thread in threading.enumerate())
+
+        # Zwei Töne im Hörer nacheinander (Wählton -> Besetztton): der erste Wiedergabeprozess wird beendet und
+        # eingesammelt, die Wiedergabe über den Lautsprecher läuft weiter
+        speaker = phone.audio.play_speaker(phone.config['Sounds']['ring'], repeat=True)
+        first = phone.audio.play_earpiece(phone.config['Sounds']['waehlen_frei'], repeat=True)
+        second = phone.audio.play_earpiece(phone.config['Sounds']['waehlen_besetzt'], repeat=True)
+        earpiece_ok = first.returncode is not None and second.poll() is None and speaker.poll() is None
+        phone.audio.stop_earpiece()
+        phone.audio.stop_speaker()
+
+        samples = []
+        started = monotonic()
+        for n in range(days):
+            day = START + timedelta(days=n)
+            await soak.sleep_until(day + timedelta(hours=3))
+            samples.append(measure())
+            await soak.day(day)
+        await soak.sleep_until(START + timedelta(days=days, hours=3))
+        samples.append(measure())
+        elapsed = monotonic() - started
+
+        phone.request_terminate()
+        if phone.linphone is not None:
+            phone.linphone.terminate()
+        soak.server.close()
+        network_watch.close()
+        GPIO.cleanup()
+
+    print(f"{days} Tage in {elapsed:.0f}s ({days * 86400 / elapsed:.0f}x), {phone.state.transitions} Zustandswechsel")
+    print("     " + ", ".join(f"{what} {n}" for what, n in sorted(soak.counts.items())))
+    print(f"     {'Tag':>4} " + " ".join(f"{key:>8}" for key in LIMITS))
+    for n, sample in enumerate(samples):
+        print(f"     {n:>4} " + " ".join(f"{sample[key]:>8}" for key in LIMITS))
+
+    # Erster Tag: Einschwingen (Thread-Pool, Caches), danach begrenzt
+    failed = False
+    settled = samples[1:]
+    for key, limit in LIMITS.items():
+        values = [sample[key] for sample in settled]
+        growth = max(values) - values[0]
+        ok = growth <= limit
+        failed |= not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {key:<8} Zuwachs {slope(values):+.1f}/Tag, max. {growth:+} (Grenze {limit:+})")
+
+    ok = soak.max_zombies <= LIMITS['zombies']
+    failed |= not ok
+    print(f"{'OK  ' if ok else 'FAIL'} zombies  nach Abläufen max. {soak.max_zombies} (Grenze {LIMITS['zombies']})")
+
+    # Nach dem Start nur die dauerhaften Threads (Event-Loop, Nummernschalter, Ausgabe von linphonec),
+    # Hilfsthreads des Startvorgangs sind beendet
+    ok = start_threads == ['MainThread', 'linphone-default', 'rotarydial-default']
+    failed |= not ok
+    print(f"{'OK  ' if ok else 'FAIL'} threads  nach dem Start {len(start_threads)}: {', '.join(start_threads)}")
+
+    failed |= not earpiece_ok
+    print(f"{'OK  ' if earpiece_ok else 'FAIL'} Hörer    neuer Ton beendet den vorherigen, Lautsprecher läuft weiter")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description="PiPhone-Dauerlauf auf virtueller Uhr")
+    argparser.add_argument('--days', type=int, default=14, help="Simulierte Tage (Standard: %(default)s)")
+    argparser.add_argument('--seed', type=int, default=1, help="Startwert für die Abläufe (Standard: %(default)s)")
+    args = argparser.parse_args()
+
+    runner = asyncio.Runner(loop_factory=lambda: VirtualLoop(clock))
+    with runner:
+        runner.run(main(args.days, args.seed))
@@ -0,0 +1,104 @@
+#!/usr/bin/python3
+
+"""
+Wählen im Gespräch (DTMF) prüfen: simuliertes GPIO aus tests/fake, simuliertes linphonec, echte Event-Loop.
+Gemessen wird die Latenz vom Ende des letzten Impulses einer Ziffer bis die Ziffer an linphonec gesendet ist,
+außerdem dass der Nummernschalter zwischen den Ziffern nicht abtastet.
+
+Aufruf: python3 tests/test-dtmf.py
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from time import monotonic_ns, sleep
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent / "fake"))
+
+from RPi import GPIO
+
+from lib.callstate import CallStateMachine
+from lib.linphone import Linphone
+from lib.rotarydial import RotaryDial
+
+NSI = 23
+NSA = 24
+DIGITS = "1590372"
+TAIL_MS = 20  # Nach dem letzten Impuls läuft die Scheibe noch so lange, bis NSA öffnet
+
+
+def dial_digit(digit: int) -> int:
+    """Eine Ziffer mit 10 Impulsen/s (60ms offen, 40ms geschlossen), liefert das Ende des letzten Impulses"""
+    GPIO.set_input(NSA, 0)
+    sleep(0.1)  # Aufziehen
+    for pulse in range(digit or 10):
+        if pulse > 0:
+            sleep(0.04)
+        GPIO.set_input(NSI, 0)
+        sleep(0.06)
+        GPIO.set_input(NSI, 1)
+        last_pulse = monotonic_ns()
+    sleep(TAIL_MS / 1000)
+    GPIO.set_input(NSA, 1)
+    return last_pulse
+
+
+async def main() -> None:
+    loop = asyncio.get_running_loop()
+    GPIO.setmode(GPIO.BCM)
+    state = CallStateMachine(loop)
+
+    ready = asyncio.Event()
+    linphone = Linphone(
+        hostname="127.0.0.1", username="test", password="test",
+        on_boot=state.threadsafe(ready.set), on_incoming_call=lambda *_: None, on_hang_up=lambda *_: None,
+        verbose=False, binary=str(Path(__file__).resolve().parent / "fake" / "linphonec")
+    )
+    await asyncio.wait_for(ready.wait(), timeout=5)
+
+    sent = []
+
+    def receive_dtmf(digit: str) -> None:
+        linphone.send_dtmf(digit)
+        sent.append((digit, monotonic_ns()))
+
+    numbers = []
+    dial = RotaryDial(NSI, NSA, numbers.append, receive_dtmf_callback=state.threadsafe(receive_dtmf))
+    dial.start_dtmf()
+
+    latencies = []
+    for digit in DIGITS:
+        # Zwischen den Ziffern: Decoder schläft
+        samples = dial.samples
+        await asyncio.sleep(0.3)
+        assert dial.samples == samples, "Nummernschalter tastet zwischen den Ziffern ab"
+
+        last_pulse = await asyncio.to_thread(dial_digit, int(digit))
+        await asyncio.sleep(0.1)
+        assert sent and sent[-1][0] == digit, (digit, sent)
+        latencies.append((sent[-1][1] - last_pulse) / 1e6)
+
+    assert [digit for digit, _ in sent] == list(DIGITS) and numbers == []
+    print(f"OK   {len(DIGITS)} Ziffern als DTMF gesendet: {DIGITS}")
+    print(f"     Letzter Impuls bis gesendet: Ø {sum(latencies) / len(latencies):.1f}ms, "
+          f"min. {min(latencies):.1f}ms, max. {max(latencies):.1f}ms (davon {TAIL_MS}ms Auslauf der Scheibe)")
+    assert max(latencies) < TAIL_MS + 50, latencies
+
+    # Nach dem Gespräch: keine DTMF mehr, Wählen funktioniert wieder normal
+    dial.end_dtmf()
+    await asyncio.to_thread(dial_digit, 4)
+    await asyncio.sleep(0.1)
+    assert len(sent) == len(DIGITS)
+    dial.start_dialing()
+    await asyncio.to_thread(dial_digit, 4)
+    await asyncio.sleep(0.1)
+    dial.end_dialing()
+    assert numbers == ["4"], numbers
+    print("OK   Nach dem Gespräch: normales Wählen")
+
+    linphone.terminate()
+    print(state.wakeups.report())
+
+
+asyncio.run(main())
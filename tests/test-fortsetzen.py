@@ -0,0 +1,170 @@
+#!/usr/bin/python3
+
+"""
+Fortsetzen nach Neustart prüfen: Nachtmodus und Schlafmusik werden gespeichert, ein neues PiPhone mit demselben
+data_dir (Neustart des Dienstes, Reboot, Stromausfall) stellt den Zustand anhand der Uhrzeit wieder her.
+Die Uhr in lib/phone.py ist fest eingestellt, Zeitzone Europe/Berlin mit Umstellung auf Sommerzeit in der
+Nacht vom 28. auf den 29.03.2026. Simuliertes GPIO (tests/fake/RPi), Wiedergabe über tests/fake oder sox.
+
+Aufruf: python3 tests/test-fortsetzen.py
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from configparser import ConfigParser
+from datetime import datetime
+from pathlib import Path
+
+os.environ['TZ'] = 'Europe/Berlin'
+time.tzset()
+
+REPO = Path(__file__).resolve().parent.parent
+FAKE = Path(__file__).resolve().parent / "fake"
+sys.path.insert(0, str(REPO))
+sys.path.insert(0, str(FAKE))
+
+from RPi import GPIO
+
+import lib.phone
+from lib.effects import Ramp
+from lib.eventlog import events, WARNING
+from lib.metrics import Registry
+from lib.netwatch import NetworkWatch
+from lib.phone import PiPhone
+from lib.phoneconfig import DEFAULT_PHONE
+from lib.sdnotify import SystemdNotifier
+
+SUNRISE = 30 * 60
+clock = datetime(2026, 3, 28, 22, 0)
+
+
+class FixedDatetime(datetime):
+    """datetime.now() in lib/phone.py: fest eingestellte lokale Uhrzeit"""
+
+    @classmethod
+    def now(cls, tz=None) -> datetime:
+        return clock
+
+
+def build_config(data_dir: str) -> ConfigParser:
+    config = ConfigParser()
+    config.read(REPO / "support" / "config-example.ini")
+    for key, path in config['Sounds'].items():
+        config.set('Sounds', key, str(REPO / "sounds" / Path(path).name))
+    config.set('Sounds', 'sleep_music', str(REPO / "sounds" / "ring-05.mp3"))
+    config.set('Storage', 'data_dir', data_dir)
+    config.set('Misc', 'night_light_pin', '18')
+    config.set('Misc', 'wake_light_pin', '19')
+    config.set('Misc', 'pwm_backend', 'software')
+    config.set('Misc', 'sunrise_minutes', str(SUNRISE // 60))
+    config.set('Misc', 'wake_up_times', '6:30,6:30,6:30,6:30,6:30,7:30,7:30')
+    config['Audio'] = {'speaker': 'null', 'earpiece': 'null'}
+    return config
+
+
+def restart(loop: asyncio.AbstractEventLoop, data_dir: str, at: datetime) -> tuple[PiPhone, float]:
+    """Neues Telefon wie nach einem Neustart: GPIO einrichten, Zustand wiederherstellen (wie in start())"""
+    global clock
+    clock = at
+    started = time.perf_counter()
+    phone = PiPhone(
+        loop, DEFAULT_PHONE, build_config(data_dir),
+        registry=Registry(), notifier=SystemdNotifier(loop), network_watch=NETWORK_WATCH
+    )
+    phone.setup_gpio()
+    phone.restore_state()
+    return phone, (time.perf_counter() - started) * 1000
+
+
+def stop(phone: PiPhone) -> None:
+    phone.request_terminate()
+    phone.audio.stop_speaker()
+    if phone.sleep_music_task is not None:
+        phone.sleep_music_task.cancel()
+
+
+def timer_in(phone: PiPhone) -> float:
+    return phone.night_light_timer.when() - phone.loop.time()
+
+
+async def main() -> None:
+    global NETWORK_WATCH
+    loop = asyncio.get_running_loop()
+    lib.phone.datetime = FixedDatetime
+    events.configure(output_level=WARNING)
+    GPIO.setmode(GPIO.BCM)
+    NETWORK_WATCH = NetworkWatch(loop, on_change=lambda: None)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        state = Path(data_dir) / "state.json"
+
+        # Erster Start: Bootsound und Blinken, Nachtmodus am Samstag 22:00 (MEZ) bis Sonntag 7:30 (MESZ)
+        phone, _ = restart(loop, data_dir, datetime(2026, 3, 28, 22, 0))
+        assert phone.first_boot and phone.led.wake_light.frequency == phone.led.BLINK_FREQUENCY
+        phone.announce_boot()
+        phone.start_night_mode()
+        assert phone.wake_up_time.isoformat() == "2026-03-29T07:30:00+02:00", phone.wake_up_time
+        # 22:00 MEZ bis 7:30 MESZ sind 8,5 Stunden (nicht 9,5), davon 30 Minuten Sonnenaufgang
+        assert abs(timer_in(phone) - (8 * 3600)) < 1, timer_in(phone)
+        saved = json.loads(state.read_text())
+        assert saved['manual_dnd'] and saved['wake_up'] == "2026-03-29T07:30:00+02:00", saved
+        writes = phone.state_file.writes
+        phone.save_state()
+        assert phone.state_file.writes == writes, "Unveränderter Zustand erneut geschrieben"
+        assert [path.name for path in Path(data_dir).iterdir() if path.name.startswith(".")] == []
+        stop(phone)
+        print("OK   Nachtmodus über die Zeitumstellung: Sonnenaufgang nach 8h, Zustand gespeichert")
+
+        # Neustart nachts (nach der Umstellung): ohne Bootsound und Blinken, Timer nach Uhrzeit
+        phone, restore_ms = restart(loop, data_dir, datetime(2026, 3, 29, 3, 30))
+        assert not phone.first_boot and phone.led.wake_light.duty == 0
+        assert phone.manual_dnd and phone.led.night_light.duty == phone.led.night_light_duty
+        assert abs(timer_in(phone) - 3.5 * 3600) < 1, timer_in(phone)
+        stop(phone)
+        print(f"OK   Neustart um 3:30: Nachtlicht an, Sonnenaufgang in 3,5h, wiederhergestellt in {restore_ms:.1f}ms")
+
+        # Neustart mitten im Sonnenaufgang: Helligkeit entsprechend, Ende zwei Stunden nach der Aufwachzeit
+        phone, _ = restart(loop, data_dir, datetime(2026, 3, 29, 7, 15))
+        # Gleiche Helligkeit wie ohne Neustart: Gammakurve des Sonnenaufgangs zur Hälfte
+        led = phone.led
+        uninterrupted = Ramp(loop.call_later, led.wake_light, SUNRISE, led.wake_light_duty).duty(0.5)
+        assert abs(led.wake_light.duty - uninterrupted) < 0.01, (led.wake_light.duty, uninterrupted)
+        uninterrupted = Ramp(loop.call_later, led.night_light, SUNRISE, 100, start_duty=led.night_light_duty).duty(0.5)
+        assert abs(led.night_light.duty - uninterrupted) < 0.01, (led.night_light.duty, uninterrupted)
+        assert abs(timer_in(phone) - (15 * 60 + PiPhone.WAKE_LIGHT_SECONDS)) < 1, timer_in(phone)
+        stop(phone)
+        print("OK   Neustart um 7:15: Sonnenaufgang zur Hälfte, Aufwachlicht bis 9:30")
+
+        # Neustart nach Ende des Nachtmodus: Nicht stören aus, Zustand bereinigt
+        phone, _ = restart(loop, data_dir, datetime(2026, 3, 29, 10, 0))
+        assert not phone.manual_dnd and phone.night_light_timer is None and phone.led.night_light.duty == 0
+        assert json.loads(state.read_text())['wake_up'] is None
+        stop(phone)
+        print("OK   Neustart um 10:00: Nachtmodus abgelaufen")
+
+        # Schlafmusik: nach Neustart an derselben Stelle fortsetzen
+        phone, _ = restart(loop, data_dir, datetime(2026, 3, 29, 20, 0))
+        phone.sleep_music_task = asyncio.create_task(phone.start_sleep_music())
+        await asyncio.sleep(0.1)
+        assert json.loads(state.read_text())['sleep_music_started'] is not None
+        args = phone.audio._speaker_tone_subprocess.args
+        assert 'trim' not in args, args  # Neu gestartet: von Anfang an, ohne Versatz
+        saved = json.loads(state.read_text())
+        state.write_text(json.dumps({**saved, 'sleep_music_started': saved['sleep_music_started'] - 42}))
+        stop(phone)
+        phone, _ = restart(loop, data_dir, datetime(2026, 3, 29, 20, 1))
+        await asyncio.sleep(0.1)
+        args = phone.audio._speaker_tone_subprocess.args
+        assert phone.manual_dnd and 'trim' in args and float(args[args.index('trim') + 1]) >= 42, args
+        stop(phone)
+        print("OK   Schlafmusik nach Neustart ab Sekunde 42 fortgesetzt")
+
+    NETWORK_WATCH.close()
+    GPIO.cleanup()
+
+
+asyncio.run(main())
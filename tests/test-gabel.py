@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+
+"""
+Entprellung des Gabelkontakts und Flash-Erkennung prüfen (simuliertes GPIO aus tests/fake, echte Event-Loop).
+Der Kontakt prellt bei jedem Wechsel einige Millisekunden, gemessen wird die Latenz ab der ersten Flanke.
+
+Aufruf: python3 tests/test-gabel.py
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent / "fake"))
+
+from RPi import GPIO
+
+from lib.callstate import CallStateMachine
+from lib.hookswitch import HookSwitch
+
+PIN = 15
+BOUNCE = (0.0015, 0.001, 0.002, 0.0005)  # Abstände der Prellflanken in s
+
+
+async def set_level(level: int, bounce: bool = True) -> None:
+    """Pegel wechseln, vorher prellen (aus einem Thread, wie die Flanken-Callbacks von RPi.GPIO)"""
+    def edges() -> None:
+        from time import sleep
+        if bounce:
+            for delay in BOUNCE:
+                GPIO.set_input(PIN, level)
+                sleep(delay)
+                GPIO.set_input(PIN, 1 - level)
+                sleep(delay)
+        GPIO.set_input(PIN, level)
+    await asyncio.to_thread(edges)
+
+
+async def main() -> None:
+    loop = asyncio.get_running_loop()
+    GPIO.setmode(GPIO.BCM)
+    state = CallStateMachine(loop)
+    events = []
+    flash = [True]
+    hook = HookSwitch(PIN, state, events.append, flash_enabled=lambda: flash[0])
+    assert hook.on_hook
+
+    # Abheben mit Prellen: genau ein Ereignis, Latenz = Prelldauer + debounce_ms
+    await set_level(0)
+    await asyncio.sleep(0.1)
+    assert events == [HookSwitch.OFF_HOOK], events
+    assert not hook.on_hook
+    print(f"OK   Abheben, Latenz {hook.last_latency_ns / 1e6:.1f}ms, {hook.edges} Flanken")
+    assert hook.last_latency_ns < 60e6
+
+    # Flash: 200ms aufgelegt
+    await set_level(1)
+    await asyncio.sleep(0.2)
+    await set_level(0)
+    await asyncio.sleep(0.1)
+    assert events[-1] == HookSwitch.FLASH and not hook.on_hook, events
+    print("OK   Flash")
+
+    # Zu kurz (30ms): kein Ereignis
+    await set_level(1, bounce=False)
+    await asyncio.sleep(0.03)
+    await set_level(0, bounce=False)
+    await asyncio.sleep(0.1)
+    assert len(events) == 2 and not hook.on_hook, events
+    print("OK   Unterbrechung ignoriert")
+
+    # Prellen ohne Pegelwechsel (Erschütterung): kein Ereignis
+    glitches = hook.glitches
+    GPIO.set_input(PIN, 1)
+    GPIO.set_input(PIN, 0)
+    await asyncio.sleep(0.1)
+    assert len(events) == 2 and hook.glitches == glitches + 1, events
+    print("OK   Erschütterung ignoriert")
+
+    # Auflegen mit Flash-Erkennung: Ereignis nach flash_max_ms
+    await set_level(1)
+    await asyncio.sleep(0.4)
+    assert len(events) == 2 and not hook.on_hook
+    await asyncio.sleep(0.3)
+    assert events[-1] == HookSwitch.ON_HOOK and hook.on_hook, events
+    print(f"OK   Auflegen im Gespräch, Latenz {hook.last_latency_ns / 1e6:.0f}ms")
+
+    # Auflegen ohne Flash-Erkennung: sofort
+    flash[0] = False
+    await set_level(0)
+    await asyncio.sleep(0.1)
+    await set_level(1)
+    await asyncio.sleep(0.1)
+    assert events[-2:] == [HookSwitch.OFF_HOOK, HookSwitch.ON_HOOK] and hook.on_hook, events
+    print(f"OK   Auflegen, Latenz {hook.last_latency_ns / 1e6:.1f}ms")
+
+    print(state.wakeups.report())
+
+
+asyncio.run(main())
@@ -0,0 +1,248 @@
+#!/usr/bin/python3
+
+"""
+Gegensprechanlage prüfen: mehrere Telefone auf Loopback (127.0.0.1) finden sich per Multicast und rufen sich direkt
+an. Aufnahme und Wiedergabe sind durch Python-Prozesse ersetzt (Sinuston in Echtzeit bzw. Schreiben in eine Datei).
+Gemessen werden Erkennung, Verbindungsaufbau (Einladung bis Gegenstelle klingelt) und Annahme bis erstes Audio.
+Danach zwei PiPhones in einer Event-Loop: Wählen der Durchwahl, Klingeln, Annahme, Auflegen, Klingelsperre
+(simuliertes GPIO aus tests/fake, Wiedergabe benötigt aplay und sox).
+
+Aufruf: python3 tests/test-intercom.py
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+from configparser import ConfigParser
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+sys.path.insert(0, str(Path(__file__).resolve().parent / "fake"))
+
+from RPi import GPIO
+
+from lib.callstate import CallState
+from lib.eventlog import events, WARNING
+from lib.hookswitch import HookSwitch
+from lib.intercom import Intercom, Peer
+from lib.metrics import Registry
+from lib.netwatch import NetworkWatch
+from lib.phone import PiPhone
+from lib.sdnotify import SystemdNotifier
+
+GROUP_PORT = 55071
+RATE = 16000
+
+# Sinuston 440 Hz (S16_BE mono) in Echtzeit, je 20ms
+CAPTURE = [sys.executable, '-c', f"""
+import math, struct, sys, time
+rate, n, started = {RATE}, 0, time.monotonic()
+while True:
+    frame = struct.pack('>320h', *(int(8000 * math.sin(2 * math.pi * 440 * (n + i) / rate)) for i in range(320)))
+    sys.stdout.buffer.write(frame)
+    sys.stdout.buffer.flush()
+    n += 320
+    time.sleep(max(0.0, started + n / rate - time.monotonic()))
+"""]
+
+
+def playback(path: Path) -> list[str]:
+    return [sys.executable, '-c', f"""
+import os, sys
+with open({str(path)!r}, 'wb', buffering=0) as file:
+    while data := os.read(0, 65536):
+        file.write(data)
+"""]
+
+
+class Station:
+    """Intercom mit aufgezeichneten Ereignissen"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, name: str, extension: str, directory: Path):
+        self.events = []
+        self.intercom = Intercom(
+            loop, name, extension,
+            on_incoming_call=lambda caller, call_id: self.record('incoming', caller, call_id),
+            on_connected=lambda call_id: self.record('connected', call_id),
+            on_hang_up=lambda call_id: self.record('hang_up', call_id),
+            group_port=GROUP_PORT, port=0, interface="127.0.0.1", rate=RATE
+        )
+        self.intercom.capture = CAPTURE
+        self.intercom.playback = playback(directory / f"{name}.raw")
+
+    def record(self, event: str, *args) -> None:
+        self.events.append((event, time.perf_counter(), *args))
+
+    def last(self, event: str) -> tuple | None:
+        return next((entry for entry in reversed(self.events) if entry[0] == event), None)
+
+
+async def until(condition: callable, timeout: float = 3) -> float:
+    """Warten, bis die Bedingung erfüllt ist, liefert die Wartezeit in ms"""
+    started = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - started > timeout:
+            raise AssertionError("Zeitüberschreitung")
+        await asyncio.sleep(0.0005)
+    return (time.perf_counter() - started) * 1000
+
+
+async def stations(loop: asyncio.AbstractEventLoop, directory: Path) -> None:
+    a = Station(loop, "flur", "91", directory)
+    b = Station(loop, "kueche", "92", directory)
+    c = Station(loop, "keller", "93", directory)
+    a.intercom.start()
+    b.intercom.start()
+    await until(lambda: a.intercom.find("92") is not None and b.intercom.find("91") is not None)
+
+    # Neues Telefon fragt beim Start nach: alle bekannt ohne auf die nächste Ankündigung zu warten
+    started = time.perf_counter()
+    c.intercom.start()
+    await until(lambda: len(c.intercom.current_peers()) == 2 and a.intercom.find("93") and b.intercom.find("93"))
+    print(f"OK   Drei Telefone erkannt nach {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    # Anruf 91 -> 92: klingelt, wird angenommen, Audio in beide Richtungen
+    started = time.perf_counter()
+    call_id = a.intercom.call("92")
+    await until(lambda: b.last('incoming') is not None)
+    ringing_ms = (b.last('incoming')[1] - started) * 1000
+    await until(lambda: a.intercom.calls[call_id].setup_seconds is not None)
+    assert b.last('incoming')[2:] == ("91", call_id), b.events
+    setup_ms = a.intercom.calls[call_id].setup_seconds * 1000
+
+    b.intercom.answer(call_id)
+    await until(lambda: a.last('connected') is not None)
+    await until(lambda: a.intercom.calls[call_id].audio_seconds is not None
+                and b.intercom.calls[call_id].audio_seconds is not None)
+    audio_ms = max(a.intercom.calls[call_id].audio_seconds, b.intercom.calls[call_id].audio_seconds) * 1000
+    await asyncio.sleep(1)
+    for station in (a, b):
+        call = station.intercom.calls[call_id]
+        assert call.packets_received >= 40 and call.packets_lost == 0, (call.packets_received, call.packets_lost)
+    print(f"OK   Verbindungsaufbau: klingelt nach {ringing_ms:.1f}ms (Einladung bis Antwort {setup_ms:.1f}ms), "
+          f"erstes Audio {audio_ms:.0f}ms nach Annahme")
+    assert setup_ms < 50, setup_ms
+
+    # Gegenstelle legt auf
+    started = time.perf_counter()
+    b.intercom.hangup(call_id)
+    await until(lambda: a.last('hang_up') is not None)
+    assert not a.intercom.calls and not b.intercom.calls
+    received = (directory / "kueche.raw").stat().st_size
+    assert received >= 40 * 640, received
+    print(f"OK   Gespräch beendet nach {(a.last('hang_up')[1] - started) * 1000:.1f}ms, "
+          f"{received // 640} Pakete bei 92 abgespielt")
+
+    # Abweisen (besetzt)
+    call_id = a.intercom.call("93")
+    await until(lambda: c.last('incoming') is not None)
+    c.intercom.hangup(call_id)
+    await until(lambda: a.last('hang_up')[2] == call_id)
+    print("OK   Abgewiesener Anruf endet beim Anrufer")
+
+    # Abmelden: Durchwahl sofort unbekannt, Anruf endet sofort
+    c.intercom.close()
+    await until(lambda: a.intercom.find("93") is None and b.intercom.find("93") is None)
+    call_id = a.intercom.call("93")
+    await until(lambda: a.last('hang_up')[2] == call_id)
+    print("OK   Abgemeldetes Telefon nicht mehr erreichbar")
+
+    # Gegenstelle antwortet nicht: nach den Wiederholungen beendet
+    a.intercom.peers["94"] = Peer("tot", "dachboden", "94", ("127.0.0.1", 9), lifetime=90)
+    started = time.perf_counter()
+    call_id = a.intercom.call("94")
+    await until(lambda: a.last('hang_up')[2] == call_id, timeout=5)
+    print(f"OK   Keine Antwort: Anruf nach {time.perf_counter() - started:.1f}s beendet")
+
+    a.intercom.close()
+    b.intercom.close()
+
+
+def build_config(name: str, extension: str, pins: tuple[int, int, int], data_dir: str) -> ConfigParser:
+    config = ConfigParser()
+    config.read(REPO / "support" / "config-example.ini")
+    for key, path in config['Sounds'].items():
+        config.set('Sounds', key, str(REPO / "sounds" / Path(path).name))
+    config.remove_section('Ringtones')
+    config.set('Storage', 'data_dir', data_dir)
+    config.set('Storage', 'resume', 'false')
+    config.set('SIP', 'dnd_from', '0')
+    config.set('SIP', 'dnd_to', '0')
+    config.set('Pins', 'gabel', str(pins[0]))
+    config.set('Pins', 'nsi', str(pins[1]))
+    config.set('Pins', 'nsa', str(pins[2]))
+    config['Audio'] = {'speaker': 'null', 'earpiece': 'null'}
+    config['Intercom'] = {
+        'enabled': 'true', 'extension': extension, 'port': '0', 'group_port': str(GROUP_PORT),
+        'interface': '127.0.0.1', 'rate': str(RATE)
+    }
+    return config
+
+
+async def phones(loop: asyncio.AbstractEventLoop, directory: Path) -> None:
+    network_watch = NetworkWatch(loop, on_change=lambda: None)
+    registry = Registry()
+    flur, kueche = (
+        PiPhone(
+            loop, name, build_config(name, extension, pins, str(directory / name)),
+            registry=registry, notifier=SystemdNotifier(loop), network_watch=network_watch
+        )
+        for name, extension, pins in (("flur", "91", (15, 23, 24)), ("kueche", "92", (13, 5, 6)))
+    )
+    for phone in (flur, kueche):
+        phone.setup_gpio()
+        phone.intercom.capture = CAPTURE
+        phone.intercom.playback = playback(directory / f"phone-{phone.name}.raw")
+        phone.intercom.start()
+    await until(lambda: flur.intercom.find("92") is not None and kueche.intercom.find("91") is not None)
+
+    # Abheben, Durchwahl wählen: klingelt in der Küche, Annahme über die Steuerung
+    flur.hook_event(HookSwitch.OFF_HOOK)
+    assert flur.state.is_in(CallState.DIALING)
+    started = time.perf_counter()
+    flur.receive_number("92")
+    ringing_ms = await until(lambda: kueche.state.is_in(CallState.RINGING))
+    kueche.remote_answer()
+    await until(lambda: flur.current_call is not None and flur.current_call.answer is not None)
+    assert flur.snapshot()['call']['internal'] and kueche.snapshot()['call']['contact'] == "flur"
+    print(f"OK   PiPhone: 92 gewählt, Küche klingelt nach {ringing_ms:.1f}ms, Gespräch verbunden "
+          f"nach {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    # Auflegen im Flur: Küche hört Besetztton
+    await asyncio.sleep(0.2)
+    flur.hook_event(HookSwitch.ON_HOOK)
+    await until(lambda: kueche.state.is_in(CallState.BUSY))
+    assert flur.state.is_in(CallState.IDLE)
+    kueche.state.transition(CallState.IDLE)
+    print("OK   PiPhone: Auflegen beendet das Gespräch auf beiden Seiten")
+
+    # Klingelsperre in der Küche: Anruf wird abgewiesen, Flur hört Besetztton
+    kueche.manual_dnd = True
+    flur.hook_event(HookSwitch.OFF_HOOK)
+    flur.receive_number("92")
+    await until(lambda: flur.state.is_in(CallState.BUSY))
+    assert kueche.state.is_in(CallState.IDLE) and not kueche.intercom.calls
+    print("OK   PiPhone: Klingelsperre weist interne Anrufe ab")
+
+    flur.hook_event(HookSwitch.ON_HOOK)
+    for phone in (flur, kueche):
+        phone.intercom.close()
+        phone.request_terminate()
+        phone.audio.stop_earpiece()
+        phone.audio.stop_speaker()
+    network_watch.close()
+
+
+async def main() -> None:
+    loop = asyncio.get_running_loop()
+    events.configure(output_level=WARNING)
+    GPIO.setmode(GPIO.BCM)
+    with tempfile.TemporaryDirectory() as tmp:
+        await stations(loop, Path(tmp))
+        await phones(loop, Path(tmp))
+    GPIO.cleanup()
+
+
+asyncio.run(main())
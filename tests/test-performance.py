@@ -0,0 +1,205 @@
+#!/usr/bin/python3
+
+"""
+Leistungsprofil prüfen: cpufreq als nachgebildetes sysfs in einem temporären Verzeichnis (zwei Policies wie bei
+big.LITTLE, der Pi Zero 2 W hat eine), zwei PiPhones teilen sich ein Profil. Abheben schaltet sofort auf aktiv
+(Governor, Mindesttakt, SCHED_FIFO für den Nummernschalter), erst wenn beide Telefone aufgelegt sind und
+`idle_delay` verstrichen ist, zurück in Ruhe; Beenden stellt den Zustand vom Start wieder her. Dazu: Telefon schon
+während des Starts aktiv, beendete Audioprozesse werden vergessen (Thread-ID kann neu vergeben werden).
+Simuliertes GPIO (tests/fake/RPi), Wiedergabe benötigt aplay und sox, Prioritäten benötigen root bzw. CAP_SYS_NICE.
+
+Aufruf: sudo python3 tests/test-performance.py
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from configparser import ConfigParser
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+sys.path.insert(0, str(Path(__file__).resolve().parent / "fake"))
+
+from RPi import GPIO
+
+from lib.callstate import CallState
+from lib.eventlog import events, ERROR
+from lib.hookswitch import HookSwitch
+from lib.metrics import Registry
+from lib.netwatch import NetworkWatch
+from lib.performance import PerformancePolicy, process_threads
+from lib.phone import PiPhone
+from lib.sdnotify import SystemdNotifier
+
+IDLE_DELAY = 0.2
+
+
+def fake_cpufreq(root: Path) -> None:
+    for name, cpus in (("policy0", "0 1"), ("policy2", "2 3")):
+        policy = root / name
+        policy.mkdir(parents=True)
+        for file, value in {
+            'affected_cpus': cpus,
+            'cpuinfo_min_freq': "600000",
+            'cpuinfo_max_freq': "1000000",
+            'scaling_available_governors': "conservative ondemand userspace powersave performance schedutil",
+            'scaling_governor': "ondemand",
+            'scaling_min_freq': "600000",
+        }.items():
+            (policy / file).write_text(f"{value}\n")
+
+
+def cpufreq(root: Path) -> set[tuple[str, str]]:
+    """Governor und Mindesttakt aller Policies (alle gleich eingestellt -> ein Eintrag)"""
+    return {
+        ((policy / 'scaling_governor').read_text().strip(), (policy / 'scaling_min_freq').read_text().strip())
+        for policy in root.glob("policy*")
+    }
+
+
+def scheduler(tid: int) -> tuple[int, int]:
+    return os.sched_getscheduler(tid), os.sched_getparam(tid).sched_priority
+
+
+def build_config(pins: tuple[int, int, int], data_dir: str) -> ConfigParser:
+    config = ConfigParser()
+    config.read(REPO / "support" / "config-example.ini")
+    for key, path in config['Sounds'].items():
+        config.set('Sounds', key, str(REPO / "sounds" / Path(path).name))
+    config.remove_section('Ringtones')
+    config.set('Storage', 'data_dir', data_dir)
+    config.set('Storage', 'resume', 'false')
+    config.set('Pins', 'gabel', str(pins[0]))
+    config.set('Pins', 'nsi', str(pins[1]))
+    config.set('Pins', 'nsa', str(pins[2]))
+    config['Audio'] = {'speaker': 'null', 'earpiece': 'null'}
+    return config
+
+
+async def main() -> None:
+    loop = asyncio.get_running_loop()
+    events.configure(output_level=ERROR)
+    GPIO.setmode(GPIO.BCM)
+    network_watch = NetworkWatch(loop, on_change=lambda: None)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "cpufreq"
+        fake_cpufreq(root)
+        policy = PerformancePolicy(loop, root=root, idle_delay=IDLE_DELAY)
+        registry = Registry()
+        policy.register(registry)
+        flur, kueche = (
+            PiPhone(
+                loop, name, build_config(pins, str(Path(tmp) / name)),
+                registry=registry, notifier=SystemdNotifier(loop), network_watch=network_watch,
+                performance=policy
+            )
+            for name, pins in (("flur", (15, 23, 24)), ("kueche", (13, 5, 6)))
+        )
+        for phone in (flur, kueche):
+            phone.setup_gpio()
+        policy.start()
+        assert cpufreq(root) == {("powersave", "600000")}, cpufreq(root)
+        normal = scheduler(flur.dial.native_id)
+        print("OK   Start: Ruhe (powersave)")
+
+        # Abheben: sofort aktiv, Nummernschalter mit Echtzeitpriorität (Wählton läuft als Audioprozess)
+        started = time.perf_counter()
+        flur.hook_event(HookSwitch.OFF_HOOK)
+        switch_ms = (time.perf_counter() - started) * 1000
+        assert flur.state.is_in(CallState.DIALING) and policy.active
+        assert cpufreq(root) == {("performance", "1000000")}, cpufreq(root)
+        assert scheduler(flur.dial.native_id) == (os.SCHED_FIFO, 20), scheduler(flur.dial.native_id)
+        assert scheduler(kueche.dial.native_id) == (os.SCHED_FIFO, 20)
+        tone = flur.audio.pids()
+        assert tone and all(scheduler(tid) == (os.SCHED_FIFO, 10) for tid in process_threads(tone[0]))
+        print(f"OK   Abheben: performance, 1 GHz, Nummernschalter SCHED_FIFO, Wählton SCHED_FIFO "
+              f"(Hook-Ereignis {switch_ms:.1f}ms, davon Umschalten {policy.switch_seconds * 1000:.2f}ms)")
+
+        # Audioprozess nach Gesprächsbeginn: wird bei call_connected nachgezogen
+        worker = subprocess.Popen([sys.executable, '-c', "import time; time.sleep(30)"])
+        policy.add_threads('audio', lambda: process_threads(worker.pid) if worker.poll() is None else [])
+        flur.state.transition(CallState.IN_CALL)
+        flur.call_connected()
+        assert scheduler(worker.pid) == (os.SCHED_FIFO, 10), scheduler(worker.pid)
+        print("OK   Gespräch: neuer Audioprozess angehoben")
+
+        # Audioprozess endet im Gespräch: seine Thread-ID wird beim nächsten Abgleich vergessen
+        ended = subprocess.Popen([sys.executable, '-c', "import time; time.sleep(30)"])
+        policy.add_threads('audio', lambda: process_threads(ended.pid) if ended.poll() is None else [])
+        policy.refresh()
+        assert ended.pid in policy.boosted
+        ended.kill()
+        ended.wait()
+        policy.refresh()
+        assert ended.pid not in policy.boosted and worker.pid in policy.boosted
+        print("OK   Beendeter Audioprozess vergessen")
+
+        # Zweites Telefon abgehoben und wieder aufgelegt: bleibt aktiv, solange der Flur telefoniert
+        kueche.hook_event(HookSwitch.OFF_HOOK)
+        kueche.hook_event(HookSwitch.ON_HOOK)
+        await asyncio.sleep(IDLE_DELAY * 2)
+        assert policy.active and cpufreq(root) == {("performance", "1000000")}
+        print("OK   Ein Telefon aufgelegt: weiterhin aktiv")
+
+        # Auflegen: erst nach idle_delay in Ruhe, kurzes Wiederabheben verlängert
+        flur.hook_event(HookSwitch.ON_HOOK)
+        assert policy.active
+        await asyncio.sleep(IDLE_DELAY / 2)
+        flur.hook_event(HookSwitch.OFF_HOOK)
+        flur.hook_event(HookSwitch.ON_HOOK)
+        await asyncio.sleep(IDLE_DELAY * 0.75)
+        assert policy.active
+        await asyncio.sleep(IDLE_DELAY)
+        assert not policy.active and cpufreq(root) == {("powersave", "600000")}, cpufreq(root)
+        assert scheduler(flur.dial.native_id) == normal and scheduler(worker.pid) == normal
+        assert policy.switches == 1, policy.switches  # Wiederabheben innerhalb idle_delay ist kein Wechsel
+        assert 'piphone_performance_switches_total 1' in registry.render(), registry.render()
+        print(f"OK   Aufgelegt: nach {IDLE_DELAY}s zurück auf powersave und normale Priorität")
+
+        # Beenden während aktiv: Zustand vom Start
+        flur.hook_event(HookSwitch.OFF_HOOK)
+        policy.close()
+        assert cpufreq(root) == {("ondemand", "600000")}, cpufreq(root)
+        assert scheduler(flur.dial.native_id) == normal
+        print("OK   Beenden: ondemand wie beim Start")
+
+        # Governor nicht verfügbar: Mindesttakt wird trotzdem gesetzt
+        for path in root.glob("policy*/scaling_available_governors"):
+            path.write_text("ondemand powersave\n")
+        fallback = PerformancePolicy(loop, root=root, idle_delay=0, dial_priority=0)
+        fallback.start()
+        fallback.update("flur", True)
+        assert cpufreq(root) == {("powersave", "1000000")}, cpufreq(root)
+        fallback.close()
+        print("OK   Governor nicht verfügbar: nur Mindesttakt angehoben")
+
+        # Hörer schon während des Starts abgehoben (vor start()): sofort aktiv, start() schaltet nicht zurück
+        early_root = Path(tmp) / "cpufreq-start"
+        fake_cpufreq(early_root)
+        early = PerformancePolicy(loop, root=early_root, idle_delay=0, dial_priority=0, audio_priority=0)
+        early.update("flur", True)
+        assert cpufreq(early_root) == {("performance", "1000000")}, cpufreq(early_root)
+        early.start()
+        assert early.active and cpufreq(early_root) == {("performance", "1000000")}, cpufreq(early_root)
+        early.update("flur", False)
+        assert cpufreq(early_root) == {("powersave", "600000")}, cpufreq(early_root)
+        early.close()
+        assert cpufreq(early_root) == {("ondemand", "600000")}, cpufreq(early_root)
+        print("OK   Aktiv während des Starts: Takt sofort angehoben, beim Beenden Zustand von vorher")
+
+        worker.kill()
+        worker.wait()
+        for phone in (flur, kueche):
+            phone.request_terminate()
+            phone.audio.stop_earpiece()
+            phone.audio.stop_speaker()
+    network_watch.close()
+    GPIO.cleanup()
+
+
+asyncio.run(main())
@@ -0,0 +1,181 @@
+#!/usr/bin/python3
+
+"""
+Hardware-PWM-Backend gegen einen simulierten sysfs-Baum (/sys/class/pwm) und Sonnenaufgang mit virtueller Uhr prüfen.
+Läuft ohne Raspberry Pi (simuliertes GPIO aus tests/fake).
+
+Aufruf: python3 tests/test-pwm.py
+"""
+
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from time import sleep
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent / "fake"))
+
+from lib.effects import Ramp
+from lib.led import Led
+from lib.pwm import SoftwarePwm, SysfsPwm, create_pwm
+
+
+def fake_sysfs(root: Path, exported: bool = False) -> Path:
+    """pwmchip0 mit zwei Kanälen; `exported`: Kanalverzeichnisse existieren bereits"""
+    chip = root / "pwmchip0"
+    chip.mkdir(parents=True)
+    (chip / "export").write_text("")
+    (chip / "npwm").write_text("2\n")
+    if exported:
+        for channel in (0, 1):
+            export_channel(chip, channel)
+    return chip
+
+
+def export_channel(chip: Path, channel: int) -> None:
+    directory = chip / f"pwm{channel}"
+    directory.mkdir()
+    for name in ("period", "duty_cycle", "enable"):
+        (directory / name).write_text("0\n")
+
+
+def read(chip: Path, channel: int, name: str) -> int:
+    return int((chip / f"pwm{channel}" / name).read_text())
+
+
+class VirtualClock:
+    """call_later-Ersatz: Timer werden gesammelt und mit advance() ausgelöst"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.timers = []
+
+    def call_later(self, delay: float, handler: callable, *args):
+        timer = Timer(self.now + delay, handler, args)
+        self.timers.append(timer)
+        return timer
+
+    def advance(self, seconds: float) -> None:
+        until = self.now + seconds
+        while (due := sorted((t for t in self.timers if not t.cancelled and t.when <= until), key=lambda t: t.when)):
+            timer = due[0]
+            self.timers.remove(timer)
+            self.now = timer.when
+            timer.handler(*timer.args)
+        self.now = until
+
+
+class Timer:
+    def __init__(self, when: float, handler: callable, args: tuple):
+        self.when = when
+        self.handler = handler
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+def test_sysfs_channel() -> None:
+    with tempfile.TemporaryDirectory() as root:
+        chip = fake_sysfs(Path(root), exported=True)
+        pwm = SysfsPwm(18, 8000, root=Path(root))
+        assert read(chip, 0, "period") == 125000
+        assert read(chip, 0, "enable") == 0
+
+        pwm.set(50)
+        assert read(chip, 0, "duty_cycle") == 62500
+        assert read(chip, 0, "enable") == 1
+
+        # Frequenzwechsel (Blinken): duty_cycle darf nie größer als period sein
+        pwm.set(50, 1)
+        assert read(chip, 0, "period") == 1_000_000_000
+        assert read(chip, 0, "duty_cycle") == 500_000_000
+
+        pwm.off()
+        assert read(chip, 0, "enable") == 0
+        assert read(chip, 0, "duty_cycle") == 0
+
+        # GPIO 19 -> Kanal 1
+        SysfsPwm(19, 8000, root=Path(root)).set(100)
+        assert read(chip, 1, "duty_cycle") == read(chip, 1, "period") == 125000
+
+
+def test_export() -> None:
+    with tempfile.TemporaryDirectory() as root:
+        chip = fake_sysfs(Path(root))
+
+        # Kernel legt das Kanalverzeichnis nach dem Export verzögert an
+        def kernel() -> None:
+            while (chip / "export").read_text() != "1":
+                sleep(0.005)
+            sleep(0.05)
+            export_channel(chip, 1)
+
+        thread = threading.Thread(target=kernel)
+        thread.start()
+        SysfsPwm(13, 8000, root=Path(root))
+        thread.join()
+        assert read(chip, 1, "period") == 125000
+
+        # Ohne Kernel: Fehler, create_pwm() weicht auf Software-PWM aus
+        assert isinstance(create_pwm(12, 8000, root=Path(root)), SoftwarePwm)
+
+
+def test_fallback() -> None:
+    with tempfile.TemporaryDirectory() as root:
+        fake_sysfs(Path(root), exported=True)
+        assert isinstance(create_pwm(18, 8000, root=Path(root)), SysfsPwm)
+        assert isinstance(create_pwm(17, 8000, root=Path(root)), SoftwarePwm)  # Kein PWM-Kanal an GPIO 17
+        assert isinstance(create_pwm(18, 8000, root=Path(root), backend="software"), SoftwarePwm)
+    assert isinstance(create_pwm(18, 8000, root=Path("/nonexistent")), SoftwarePwm)
+
+
+def test_ramp() -> None:
+    with tempfile.TemporaryDirectory() as root:
+        chip = fake_sysfs(Path(root), exported=True)
+        pwm = SysfsPwm(18, 8000, root=Path(root))
+        clock = VirtualClock()
+        done = []
+        ramp = Ramp(clock.call_later, pwm, 30 * 60, 80, on_done=lambda: done.append(clock.now)).start()
+        assert ramp.steps == Ramp.MAX_STEPS
+
+        duties = []
+        for _ in range(60):
+            clock.advance(30)
+            duties.append(pwm.duty)
+        assert duties == sorted(duties), "Helligkeit muss monoton steigen"
+        assert abs(duties[29] - 80 * 0.5 ** 2.2) < 1, f"Gammakurve: {duties[29]}"
+        assert duties[-1] == 80 and len(done) == 1 and abs(done[0] - 30 * 60) < 0.001
+        assert read(chip, 0, "duty_cycle") == 100000
+        assert not ramp.running
+
+
+def test_led_sunrise() -> None:
+    with tempfile.TemporaryDirectory() as root:
+        chip = fake_sysfs(Path(root), exported=True)
+        led = Led(18, 20, 19, 100, verbose=False, pwm_root=Path(root))
+        clock = VirtualClock()
+
+        led.night_light_on()
+        led.wake_light_blink()
+        assert read(chip, 1, "period") == 1_000_000_000
+        led.wake_light_off()
+        led.sunrise(clock.call_later, 10 * 60)
+        assert read(chip, 1, "period") == 125000
+        assert len(led.ramps) == 2
+
+        clock.advance(5 * 60)
+        assert 20 < led.night_light.duty < 100 and 0 < led.wake_light.duty < 100
+
+        # Abschalten während des Sonnenaufgangs beendet die Verläufe
+        led.wake_light_off()
+        clock.advance(10 * 60)
+        assert led.wake_light.duty == 0 and read(chip, 1, "enable") == 0
+        assert led.night_light.duty == 100 and len(led.ramps) == 0
+
+
+for test in (test_sysfs_channel, test_export, test_fallback, test_ramp, test_led_sunrise):
+    test()
+    print(f"OK   {test.__name__}")
@@ -0,0 +1,182 @@
+#!/usr/bin/python3
+
+"""
+Soundkarten-Hotplug prüfen: /proc/asound wird in einem temporären Verzeichnis nachgebildet, uevents des Kernels
+werden direkt übergeben, linphonec ist simuliert (tests/fake/linphonec), GPIO ebenfalls (tests/fake/RPi).
+- Karten, Wiedergabe/Aufnahme und native Formate werden einmal gelesen
+- USB-Karte entfernt: Zustand `audio` meldet sie als fehlend
+- USB-Karte wieder erkannt (auch mit neuem Index oder zwischen zwei Scans neu eingesteckt): abgebrochene Wiedergabe
+  startet neu, linphonec wechselt in unter einer Sekunde auf die Karte
+Benötigt aplay (Wiedergabe auf ALSA-Gerät `null`).
+
+Aufruf: python3 tests/test-soundkarten.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from configparser import ConfigParser
+from pathlib import Path
+from time import perf_counter
+
+REPO = Path(__file__).resolve().parent.parent
+FAKE = Path(__file__).resolve().parent / "fake"
+sys.path.insert(0, str(REPO))
+sys.path.insert(0, str(FAKE))
+
+from RPi import GPIO
+
+from lib.eventlog import events, WARNING
+from lib.metrics import Registry
+from lib.netwatch import NetworkWatch
+from lib.phone import PiPhone
+from lib.sdnotify import SystemdNotifier
+from lib.sounddevices import SoundDevices
+
+SETTLE = 0.2
+LINPHONE_CARDS = "ALSA: default device,ALSA: snd_rpi_hifiberry_dac,ALSA: USB Audio Device"
+
+USB = (
+    " {index} [Device         ]: USB-Audio - USB Audio Device\n"
+    "                      C-Media Electronics Inc. USB Audio Device at usb-3f980000.usb-1.2, full speed\n"
+)
+DAC = (
+    " 1 [sndrpihifiberry]: RPi-simple - snd_rpi_hifiberry_dac\n"
+    "                      snd_rpi_hifiberry_dac\n"
+)
+STREAM = """C-Media Electronics Inc. USB Audio Device at usb-3f980000.usb-1.2, full speed : USB Audio
+
+Playback:
+  Status: Stop
+  Interface 1
+    Altset 1
+    Format: S16_LE
+    Channels: 2
+    Endpoint: 0x01 (1 OUT) (ADAPTIVE)
+    Rates: 48000, 44100
+    Bits: 16
+
+Capture:
+  Status: Stop
+  Interface 2
+    Altset 1
+    Format: S16_LE
+    Channels: 1
+    Endpoint: 0x82 (2 IN) (ADAPTIVE)
+    Rates: 48000, 44100
+    Bits: 16
+"""
+
+
+def write_asound(root: Path, usb: int | None) -> None:
+    """/proc/asound mit HifiBerry (Karte 1) und optional der USB-Karte unter Index `usb`"""
+    cards = DAC if usb is None else "".join(sorted([USB.format(index=usb), DAC], key=lambda card: card.split()[0]))
+    (root / "cards").write_text(cards)
+    pcm = "01-00: HifiBerry DAC HiFi pcm5102a-hifi-0 : HifiBerry DAC HiFi pcm5102a-hifi-0 : playback 1\n"
+    if usb is not None:
+        pcm = f"{usb:02}-00: USB Audio : USB Audio : playback 1 : capture 1\n" + pcm
+    (root / "pcm").write_text(pcm)
+    for card in root.glob("card[0-9]*"):
+        (card / "stream0").unlink()
+        card.rmdir()
+    if usb is not None:
+        (root / f"card{usb}").mkdir()
+        (root / f"card{usb}" / "stream0").write_text(STREAM)
+
+
+def uevent(action: str, index: int) -> bytes:
+    devpath = f"/devices/platform/soc/3f980000.usb/usb1/1-1/1-1.2/1-1.2:1.0/sound/card{index}"
+    return f"{action}@{devpath}\0ACTION={action}\0DEVPATH={devpath}\0SUBSYSTEM=sound\0SEQNUM=1\0".encode()
+
+
+def build_config(data_dir: str) -> ConfigParser:
+    config = ConfigParser()
+    config.read(REPO / "support" / "config-example.ini")
+    for key, path in config['Sounds'].items():
+        config.set('Sounds', key, str(REPO / "sounds" / Path(path).name))
+    config.set('Metrics', 'listen', '')
+    config.set('Storage', 'data_dir', data_dir)
+    config.set('SIP', 'host', '127.0.0.1')
+    config.set('SIP', 'linphonec', str(FAKE / "linphonec"))
+    config['Audio'] = {'speaker': 'null', 'earpiece': '', 'earpiece_card': 'USB Audio Device'}
+    return config
+
+
+async def replug(phone: PiPhone, devices: SoundDevices, root: Path, switched: list, old: int, new: int,
+                 gap: float) -> float:
+    """USB-Karte entfernen und nach `gap` Sekunden (neu aufgezählt als `new`) wieder einstecken"""
+    tone = phone.audio.play_earpiece(phone.config['Sounds']['waehlen_frei'], repeat=True)
+    devices.uevent(uevent("remove", old))
+    write_asound(root, None)
+    tone.kill()  # Wiedergabe bricht mit der Karte ab
+    await asyncio.sleep(gap)
+    if gap > SETTLE:
+        assert phone.snapshot()['audio'] == {'earpiece': False}, phone.snapshot()['audio']
+
+    switched.clear()
+    write_asound(root, new)
+    plugged = perf_counter()
+    devices.uevent(uevent("add", new))
+    for _ in range(200):
+        if switched:
+            break
+        await asyncio.sleep(0.005)
+    assert switched == [2], switched
+    assert phone.snapshot()['audio'] == {'earpiece': True}
+    reopened = phone.audio._earpiece_tone_subprocess
+    assert reopened is not tone and reopened.poll() is None, "Wiedergabe nicht neu gestartet"
+    phone.audio.stop_earpiece()
+    return perf_counter() - plugged
+
+
+async def main() -> None:
+    loop = asyncio.get_running_loop()
+    events.configure(output_level=WARNING)
+    os.environ['PIPHONE_FAKE_SOUNDCARDS'] = LINPHONE_CARDS
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "asound"
+        root.mkdir()
+        write_asound(root, 0)
+
+        devices = SoundDevices(loop, root=root, settle=SETTLE)
+        usb = devices.find("USB Audio Device")
+        assert usb is not None and usb.id == "Device" and usb.playback and usb.capture
+        assert usb.native['playback'] == {'format': ["S16_LE"], 'channels': ["2"], 'rates': ["48000", "44100"]}
+        assert usb.native['capture']['channels'] == ["1"]
+        assert devices.find("sndrpihifiberry").playback and not devices.find("sndrpihifiberry").capture
+        print(f"OK   {len(devices.cards)} Karten erkannt: " + ", ".join(card.name for card in devices.cards.values()))
+
+        GPIO.setmode(GPIO.BCM)
+        network_watch = NetworkWatch(loop, on_change=lambda: None)
+        phone = PiPhone(
+            loop, "default", build_config(tmp),
+            registry=Registry(), notifier=SystemdNotifier(loop), network_watch=network_watch, sound_devices=devices
+        )
+        assert phone.audio.earpiece_device == "plughw:CARD=Device", phone.audio.earpiece_device
+        phone.audio.earpiece_device = "null"  # Wiedergabe ohne echte Soundkarte
+
+        phone.start_linphonec()
+        await asyncio.wait_for(phone.linphone_ready.wait(), timeout=5)
+        switched = []
+        use_soundcard = phone.linphone.use_soundcard
+        phone.linphone.use_soundcard = lambda index: (switched.append(index), use_soundcard(index))
+
+        timings = [
+            await replug(phone, devices, root, switched, old=0, new=0, gap=0.5),
+            await replug(phone, devices, root, switched, old=0, new=2, gap=0.5),  # Neuer Index
+            await replug(phone, devices, root, switched, old=2, new=2, gap=0.05),  # Zwischen zwei Scans
+        ]
+        assert phone.soundcard_index == 2 and devices.hotplugs == 6, (phone.soundcard_index, devices.hotplugs)
+        print("OK   3x neu eingesteckt, linphonec umgeschaltet nach " +
+              ", ".join(f"{seconds * 1000:.0f}ms" for seconds in timings) + f" (davon {SETTLE * 1000:.0f}ms Wartezeit)")
+        assert max(timings) < 1, timings
+
+        phone.linphone.terminate()
+        devices.close()
+        network_watch.close()
+        GPIO.cleanup()
+
+
+asyncio.run(main())
@@ -0,0 +1,127 @@
+#!/usr/bin/python3
+
+"""
+Aufbereitung der Sounds prüfen (soundprep.py, benötigt sox): Quelldateien mit falschem Format und Stille am Anfang
+werden in das Format von Lautsprecher bzw. Hörer gewandelt, die Stille entfernt, der Spitzenpegel normalisiert.
+Danach: Prüfung beim Start von PiPhone (Manifest, O(1) je Sound) erkennt geänderte Quellen und Ergebnisse,
+`soundprep.py check` vergleicht die Fingerabdrücke.
+
+Aufruf: python3 tests/test-soundprep.py
+"""
+
+import math
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import wave
+from array import array
+from configparser import ConfigParser
+from pathlib import Path
+from time import perf_counter_ns
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+from lib.soundassets import configured_sounds, device_format, sound_role, validate, Manifest, SoundFormat
+
+SILENCE_MS = 300
+LEVEL = -1.0
+
+
+def write_source(path: Path, rate: int = 8000, seconds: float = 0.5, amplitude: float = 0.3) -> None:
+    """Sinus 440 Hz, mono 16 Bit, mit Stille am Anfang"""
+    silence = int(rate * SILENCE_MS / 1000)
+    samples = [0] * silence + [
+        int(32767 * amplitude * math.sin(2 * math.pi * 440 * n / rate)) for n in range(int(rate * seconds))
+    ]
+    with wave.open(str(path), 'wb') as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(rate)
+        file.writeframes(struct.pack(f'<{len(samples)}h', *samples))
+
+
+def peak_db(path: Path) -> float:
+    with wave.open(str(path), 'rb') as file:
+        width = file.getsampwidth()
+        data = file.readframes(file.getnframes())
+    samples = array({2: 'h', 4: 'i'}[width], data)
+    return 20 * math.log10(max(abs(sample) for sample in samples) / (1 << (width * 8 - 1)))
+
+
+def soundprep(config: Path, *arguments: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, str(REPO / "soundprep.py"), '-c', str(config), *arguments], capture_output=True, text=True
+    )
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        write_source(directory / "frei.wav")
+        write_source(directory / "ring.wav", amplitude=0.05)
+
+        config = ConfigParser()
+        config['Audio'] = {
+            'sound_manifest': str(directory / "native" / "manifest.json"),
+            'speaker_format': 'S32_LE:48000:2',
+            'earpiece_format': 'S16_LE:44100:2',
+        }
+        config['Sounds'] = {'waehlen_frei': str(directory / "frei.wav"), 'ring': str(directory / "ring.wav")}
+        config_path = directory / "config.ini"
+        with open(config_path, 'w') as file:
+            config.write(file)
+
+        result = soundprep(config_path)
+        print(result.stdout, end="")
+        assert result.returncode == 0, result.stderr
+        manifest = Manifest.load(directory / "native" / "manifest.json")
+        assert len(manifest.entries) == 2
+
+        for section, key, source in configured_sounds(config):
+            sound_format = device_format(config, sound_role(section, key))
+            output, status = manifest.lookup(source, sound_format)
+            assert status == "ok", (key, status)
+            duration = validate(Path(output), sound_format)
+            entry = manifest.entries[Manifest.key(source, sound_format)]
+            assert abs(entry['trimmed_ms'] - SILENCE_MS) < 20, entry
+            assert abs(duration - 0.5) < 0.02, duration
+            assert abs(peak_db(Path(output)) - LEVEL) < 0.2, peak_db(Path(output))
+        print(f"OK   Format von Lautsprecher/Hörer, {SILENCE_MS}ms Stille entfernt, Spitzenpegel {LEVEL} dBFS")
+
+        # Unveränderte Sounds werden nicht erneut gewandelt
+        result = soundprep(config_path)
+        assert result.returncode == 0 and result.stdout.count("aktuell") == 2, result.stdout
+        assert soundprep(config_path, 'check').returncode == 0
+        print("OK   Zweiter Lauf: nichts zu tun, check ohne Fehler")
+
+        # Prüfung beim Start: Manifest mit vielen Einträgen, Zeit je Sound unabhängig von der Größe
+        source = str(directory / "frei.wav")
+        earpiece = SoundFormat.parse('S16_LE:44100:2')
+        entry = manifest.entries[Manifest.key(source, earpiece)]
+        for n in range(10000):
+            manifest.entries[Manifest.key(f"/opt/piphone/sounds/{n}.mp3", earpiece)] = entry
+        started = perf_counter_ns()
+        for _ in range(1000):
+            manifest.lookup(source, earpiece)
+        print(f"OK   Prüfung beim Start: {(perf_counter_ns() - started) / 1000 / 1000:.1f}µs je Sound"
+              f" bei {len(manifest.entries)} Einträgen")
+
+        # Quelle geändert: veraltet, Originaldatei wird verwendet; Ergebnis verändert: check schlägt fehl
+        os.utime(source, ns=(0, 0))
+        assert manifest.lookup(source, earpiece) == (None, "veraltet")
+        result = soundprep(config_path)
+        assert result.returncode == 0 and result.stdout.count("aufbereitet") == 1, result.stdout
+        output = Path(Manifest.load(manifest.path).lookup(source, earpiece)[0])
+        stat = output.stat()
+        with open(output, 'r+b') as file:
+            file.seek(-2, os.SEEK_END)
+            file.write(b"\x01\x02")
+        os.utime(output, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert soundprep(config_path, 'check').returncode == 1
+        print("OK   Geänderte Quelle neu aufbereitet, verändertes Ergebnis erkannt")
+
+
+main()
@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+
+"""
+Steuerung prüfen: fehlerhafte Anfragen (falsche Typen, ungültige Werte, Fehler im Telefon) werden mit
+{"ok": false, "error": ...} beantwortet, die Verbindung bleibt bestehen und nimmt weitere Anfragen an.
+Dazu ein Laufzeitprofil auf Anforderung. Zwei PiPhones mit simuliertem GPIO (tests/fake/RPi), Socket in einem
+temporären Verzeichnis.
+
+Aufruf: python3 tests/test-steuerung.py
+"""
+
+import asyncio
+import json
+import sys
+import tempfile
+from configparser import ConfigParser
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+sys.path.insert(0, str(Path(__file__).resolve().parent / "fake"))
+
+from RPi import GPIO
+
+from lib.control import ControlServer
+from lib.eventlog import events, ERROR
+from lib.metrics import Registry
+from lib.netwatch import NetworkWatch
+from lib.phone import PiPhone
+from lib.profiler import Profiler
+from lib.sdnotify import SystemdNotifier
+
+
+def build_config(pins: tuple[int, int, int], data_dir: str) -> ConfigParser:
+    config = ConfigParser()
+    config.read(REPO / "support" / "config-example.ini")
+    for key, path in config['Sounds'].items():
+        config.set('Sounds', key, str(REPO / "sounds" / Path(path).name))
+    config.remove_section('Ringtones')
+    config.set('Storage', 'data_dir', data_dir)
+    config.set('Storage', 'resume', 'false')
+    config.set('Pins', 'gabel', str(pins[0]))
+    config.set('Pins', 'nsi', str(pins[1]))
+    config.set('Pins', 'nsa', str(pins[2]))
+    config['Audio'] = {'speaker': 'null', 'earpiece': 'null'}
+    return config
+
+
+async def main() -> None:
+    loop = asyncio.get_running_loop()
+    events.configure(output_level=ERROR)
+    GPIO.setmode(GPIO.BCM)
+    network_watch = NetworkWatch(loop, on_change=lambda: None)
+    crashes = []
+    loop.set_exception_handler(lambda loop, context: crashes.append(context))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = Registry()
+        phones = [
+            PiPhone(
+                loop, name, build_config(pins, str(Path(tmp) / name)),
+                registry=registry, notifier=SystemdNotifier(loop), network_watch=network_watch
+            )
+            for name, pins in (("flur", (15, 23, 24)), ("kueche", (13, 5, 6)))
+        ]
+        for phone in phones:
+            phone.setup_gpio()
+        phones[0].remote_answer = lambda: 1 / 0  # Unerwarteter Fehler im Telefon
+
+        control = ControlServer(phones, registry, profiler=lambda: Profiler(report_dir=Path(tmp)))
+        socket_path = Path(tmp) / "control.sock"
+        await control.start(str(socket_path))
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+
+        async def request(message: dict) -> dict:
+            writer.write(json.dumps(message).encode() + b"\n")
+            await writer.drain()
+            line = await asyncio.wait_for(reader.readline(), timeout=2)
+            assert line, f"Verbindung getrennt nach {message}"
+            return json.loads(line)
+
+        malformed = [
+            ({'id': 1, 'cmd': 'state', 'phone': [1]}, "phone"),
+            ({'id': 2, 'cmd': 'state', 'phone': {'a': 1}}, "phone"),
+            ({'id': 3, 'cmd': 'dial', 'phone': 7, 'number': "01"}, "phone"),
+            ({'id': 4, 'cmd': 'profile', 'seconds': [1]}, "seconds"),
+            ({'id': 5, 'cmd': 'profile', 'seconds': "10"}, "seconds"),
+            ({'id': 6, 'cmd': 'profile', 'seconds': True}, "seconds"),
+            ({'id': 7, 'cmd': 'profile', 'seconds': -1}, "seconds"),
+            ({'id': 8, 'cmd': 'profile', 'seconds': float('inf')}, "seconds"),
+            ({'id': 9, 'cmd': 'profile', 'seconds': float('nan')}, "seconds"),
+            ({'id': 10, 'cmd': 'answer', 'phone': "flur"}, "ZeroDivisionError"),
+            ({'id': 11, 'cmd': ['state']}, "Unbekannter Befehl"),
+        ]
+        for message, expected in malformed:
+            response = await request(message)
+            assert response['id'] == message['id'] and not response['ok'], response
+            assert expected in response['error'], response
+        print(f"OK   {len(malformed)} fehlerhafte Anfragen mit Fehler beantwortet")
+
+        response = await request({'id': 12, 'cmd': 'state', 'phone': "kueche"})
+        assert response['ok'] and response['result']['state'] == "idle", response
+        assert len(control.clients) == 1 and not crashes, crashes
+        print("OK   Verbindung bleibt bestehen, kein Absturzbericht")
+
+        # Profiler wird erst bei der ersten Messung erzeugt
+        response = await request({'id': 13, 'cmd': 'profile', 'seconds': 0.2})
+        assert response['ok'], response
+        await asyncio.sleep(0.5)
+        assert Path(response['result']['report']).exists(), response
+        print("OK   Profil auf Anforderung erstellt")
+
+        writer.close()
+        control.close()
+        for phone in phones:
+            phone.request_terminate()
+    network_watch.close()
+    GPIO.cleanup()
+
+
+asyncio.run(main())